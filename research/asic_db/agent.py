@@ -51,7 +51,7 @@ class IdsInput(BaseModel):
 
 def _fields_by_index(indices: List[int]) -> str:
     rows = [session_mapping.get(str(i)) for i in indices if str(i) in session_mapping]
-    payload = {str(r): gs.get_product_fields(r, headers) for r in rows if r}
+    payload = {str(r): fields for r, fields in gs.get_rows([r for r in rows if r], headers).items()}
     return json.dumps(payload, ensure_ascii=False)
 
 get_fields_tool = StructuredTool.from_function(
@@ -1,40 +1,42 @@
 import os
+import sys
 import gspread
 from oauth2client.service_account import ServiceAccountCredentials
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# лимитер / повторы / TTL-кэш строк листа – salesbot/sheet_cache.py (общий с v1, asic_db)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "salesbot"))
+from sheet_cache import CACHE_TTL, CachedSheet  # noqa: E402
+from sheets_client import retrying  # noqa: E402
+
 basedir = os.path.dirname(os.path.abspath(__file__))
 
-class GoogleSheets:
-    def __init__(self):
+class GoogleSheets(CachedSheet):
+    def __init__(self, ttl: float = CACHE_TTL):
         creds = ServiceAccountCredentials.from_json_keyfile_name(
             f"{basedir}/technologydynamicsasiccalc-76e05fa1a200.json"
         )
         self.client = gspread.authorize(creds)
         self.sheet_id = os.getenv("GOOGLE_SHEET_ID")
-
-    def _open_sheet(self):
-        return self.client.open_by_key(self.sheet_id)
+        # лист открывается один раз: open_by_key – отдельный запрос к API
+        super().__init__(retrying(self.client.open_by_key, self.sheet_id).sheet1, ttl)
 
     def get_products_name(self) -> dict[int, str]:
-        sheet = self._open_sheet().sheet1
-        values = sheet.get("A2:A10000")
-        return {
-            idx: row[0] 
-            for idx, row in enumerate(values, start=2) 
-            if row and row[0].strip()
-        }
+        def _load():
+            values = self.sheet.get("A2:A")
+            return {
+                idx: row[0]
+                for idx, row in enumerate(values, start=2)
+                if row and row[0].strip()
+            }
+        return self._cached("names", _load)
 
     def get_product_info(self, row_number: int) -> dict[str, str]:
-        ws = self._open_sheet().sheet1
-        headers = ws.get("A1:Z1")[0]
-        row = ws.get(f"A{row_number}:Z{row_number}")[0]
-        row += [""] * (len(headers) - len(row))
-        return dict(zip(headers, row))
+        return self.get_rows([row_number])[int(row_number)]
 
 if __name__ == "__main__":
     g = GoogleSheets()
     #print(g.get_products_name())
-    #print(g.get_product_info(90))
\ No newline at end of file
+    #print(g.get_product_info(90))
@@ -54,10 +54,7 @@ def get_fields_by_index(indices: List[int]) -> str:
     else:
         rows = [session_mapping[i] for i in indices if i in session_mapping]
 
-    headers = list(gs.col_letter.keys())
-    result: Dict[str, Dict[str, str]] = {}
-    for row in rows:
-        result[str(row)] = gs.get_product_fields(row, headers)
+    result = {str(row): fields for row, fields in gs.get_rows(rows, gs.headers).items()}
     return json.dumps(result, ensure_ascii=False)
 
 
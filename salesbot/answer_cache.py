@@ -0,0 +1,256 @@
+"""
+Answer-Cache
+────────────
+Кэш черновиков Catalog-Agent для повторяющихся вопросов по каталогу.
+
+•  Ключ – нормализованный вопрос + каталожные сущности (brand / model /
+   condition / budget / hash_rate) + версия каталога. Записи лежат в
+   asic:v{n}:answers (HASH id → JSON) и удаляются вместе с версией
+   (gc_versions) – после sync старые черновики не читаются.
+•  Похожие формулировки («сколько стоит с19» / «какая цена на S19?») –
+   локальный TF-IDF по хэшированным char-3-граммам и словам, косинус
+   ≥ ANSWER_CACHE_SIMILARITY; сравниваются только записи с теми же
+   сущностями, так что S19 и S21 не склеиваются.
+•  Индекс похожести живёт в snapshot.memo() – сбрасывается pub/sub'ом
+   публикации новой версии вместе с остальным снапшотом.
+•  Кэшируются только вопросы с brand или model: «а цена какая?»,
+   «сколько стоит 3?» без них зависят от контекста сессии и всегда идут
+   в агента.
+•  Если агент сохранил index→row mapping сессии (store_mapping), он
+   кэшируется с черновиком и восстанавливается при попадании.
+
+Счётчики – answer_stats / answer_report().
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+import zlib
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+from redis_cache import (
+    aload_session_mapping,
+    astore_session_mapping,
+    load_session_mapping,
+    r,
+    snapshot,
+    store_session_mapping,
+    vkey,
+)
+
+ANSWER_CACHE = os.getenv("ANSWER_CACHE", "1") == "1"
+SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.85"))
+# страховка, если каталог долго не меняется: черновики версии живут не дольше TTL
+ANSWER_TTL = int(os.getenv("ANSWER_CACHE_TTL", "21600"))
+
+KEY_ANSWERS = "answers"
+ENTITY_KEYS = ("brand", "model", "condition", "budget", "hash_rate")
+# без хотя бы одной из них вопрос не самостоятелен – не кэшируется
+ANCHOR_KEYS = ("brand", "model")
+DIMS = 1 << 18
+# черновики, которые нельзя отдавать повторно
+_BAD_DRAFT = ("Agent stopped", "Action:", "Observation:")
+_FILLER = {"а", "и", "ну", "пожалуйста", "подскажите", "скажите", "подскажи", "скажи",
+           "мне", "вас", "у", "в", "на", "можно", "бы", "хотел", "хотела", "хочу", "узнать",
+           "какая", "какой", "наличии"}
+# синонимы одного вопроса → одно слово («почём», «сколько стоит», «стоимость» – цена)
+_CANON = [
+    (re.compile(r"\b(?:сколько\s+сто\w*|по\s?ч[её]м|стоимост\w*|цен\w*|price|прайс\w*)"), "цена"),
+    (re.compile(r"\b(?:асик\w*|asic\w*|майнер\w*|аппарат\w*)"), "асики"),
+]
+
+answer_stats: Counter = Counter()
+
+
+# ── нормализация и векторы ──────────────────────────────────────────
+def normalize(question: str) -> str:
+    text = question.casefold().replace("ё", "е")
+    for pattern, word in _CANON:
+        text = pattern.sub(word, text)
+    words = re.findall(r"[\w+]+", text)
+    return " ".join(w for w in words if w not in _FILLER)
+
+
+def entity_signature(entities: Dict[str, Any]) -> str:
+    picked = {k: normalize(str(entities[k])) for k in ENTITY_KEYS if entities.get(k)}
+    return json.dumps(picked, ensure_ascii=False, sort_keys=True)
+
+
+def _features(text: str) -> Counter:
+    feats: Counter = Counter()
+    for word in text.split():
+        feats[zlib.crc32(b"w:" + word.encode()) % DIMS] += 1
+        padded = f" {word} "
+        for i in range(len(padded) - 2):
+            feats[zlib.crc32(padded[i:i + 3].encode()) % DIMS] += 1
+    return feats
+
+
+def anchored(entities: Dict[str, Any]) -> bool:
+    return any(entities.get(k) for k in ANCHOR_KEYS)
+
+
+def _entry_id(text: str, signature: str) -> str:
+    return hashlib.blake2b(f"{text}\0{signature}".encode(), digest_size=12).hexdigest()
+
+
+class AnswerIndex:
+    """Черновики одной версии: точный id → запись, плюс TF-IDF внутри группы сущностей."""
+
+    def __init__(self, version: int | None) -> None:
+        self.version = version
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self.buckets: Dict[str, List[Tuple[str, Counter]]] = {}
+        self.df: Counter = Counter()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, version: int | None) -> "AnswerIndex":
+        index = cls(version)
+        if version is not None:
+            for entry_id, raw in r.hgetall(vkey(version, KEY_ANSWERS)).items():
+                index.add(entry_id, json.loads(raw))
+        return index
+
+    def add(self, entry_id: str, entry: Dict[str, Any]) -> None:
+        feats = _features(entry["q"])
+        with self._lock:
+            if entry_id in self.entries:
+                return
+            self.entries[entry_id] = entry
+            self.buckets.setdefault(entry["sig"], []).append((entry_id, feats))
+            self.df.update(feats.keys())
+
+    def _weights(self, feats: Counter) -> Dict[int, float]:
+        n = len(self.entries)
+        return {f: tf * (math.log((1 + n) / (1 + self.df[f])) + 1) for f, tf in feats.items()}
+
+    def nearest(self, text: str, signature: str) -> Tuple[Dict[str, Any] | None, float]:
+        with self._lock:
+            candidates = list(self.buckets.get(signature, ()))
+            if not candidates:
+                return None, 0.0
+            query = self._weights(_features(text))
+            qnorm = math.sqrt(sum(w * w for w in query.values())) or 1.0
+            best, best_score = None, 0.0
+            for entry_id, feats in candidates:
+                weights = self._weights(feats)
+                dot = sum(w * weights.get(f, 0.0) for f, w in query.items())
+                norm = math.sqrt(sum(w * w for w in weights.values())) or 1.0
+                score = dot / (qnorm * norm)
+                if score > best_score:
+                    best, best_score = self.entries[entry_id], score
+            return best, best_score
+
+
+def _index(version: int) -> AnswerIndex:
+    return snapshot.memo("answer_index", AnswerIndex.load, version)
+
+
+# ── API ──────────────────────────────────────────────────────────────
+def lookup(question: str, entities: Dict[str, Any], version: int | None) -> Dict[str, Any] | None:
+    """Запись {q, sig, draft, mapping} версии `version` – точная или похожая, иначе None."""
+    if version is None or not anchored(entities):
+        return None
+    text, signature = normalize(question), entity_signature(entities)
+    entry_id = _entry_id(text, signature)
+    index = _index(version)
+    entry = index.entries.get(entry_id)
+    if entry is None:
+        raw = r.hget(vkey(version, KEY_ANSWERS), entry_id)     # записал другой процесс
+        if raw:
+            entry = json.loads(raw)
+            index.add(entry_id, entry)
+    if entry is not None:
+        answer_stats["exact"] += 1
+        return entry
+    entry, score = index.nearest(text, signature)
+    if entry is not None and score >= SIMILARITY:
+        answer_stats["near"] += 1
+        return entry
+    answer_stats["misses"] += 1
+    return None
+
+
+def store(question: str, entities: Dict[str, Any], version: int | None, draft: str,
+          mapping: Dict[int, int] | None = None) -> bool:
+    text = (draft or "").strip()
+    if version is None or not text or not anchored(entities) or any(m in text for m in _BAD_DRAFT):
+        answer_stats["skipped"] += 1
+        return False
+    q, signature = normalize(question), entity_signature(entities)
+    entry = {"q": q, "sig": signature, "draft": text,
+             "mapping": {str(i): row for i, row in (mapping or {}).items()}}
+    entry_id = _entry_id(q, signature)
+    key = vkey(version, KEY_ANSWERS)
+    pipe = r.pipeline()
+    pipe.hset(key, entry_id, json.dumps(entry, ensure_ascii=False))
+    pipe.expire(key, ANSWER_TTL)
+    pipe.execute()
+    _index(version).add(entry_id, entry)
+    answer_stats["stored"] += 1
+    return True
+
+
+def cached_draft(question: str, entities: Dict[str, Any], session_id: str,
+                 run: Callable[[], str]) -> str:
+    """
+    Черновик из кэша (с восстановлением mapping сессии) или run() с записью
+    результата. Версия пинится один раз на вызов. Без brand / model – просто run().
+    """
+    if not ANSWER_CACHE:
+        return run()
+    if not anchored(entities):          # «а цена какая?» – ответ зависит от сессии
+        answer_stats["unanchored"] += 1
+        return run()
+    version = snapshot.version()
+    hit = lookup(question, entities, version)
+    if hit is not None:
+        if hit["mapping"]:
+            store_session_mapping(session_id, {int(i): int(row) for i, row in hit["mapping"].items()})
+        return hit["draft"]
+
+    before = load_session_mapping(session_id)
+    draft = run()
+    after = load_session_mapping(session_id)
+    store(question, entities, version, draft, after if after != before else None)
+    return draft
+
+
+async def acached_draft(question: str, entities: Dict[str, Any], session_id: str,
+                        arun: Callable[[], Awaitable[str]]) -> str:
+    """cached_draft() для gateway: поиск / запись индекса – в пуле потоков."""
+    if not ANSWER_CACHE:
+        return await arun()
+    if not anchored(entities):          # «а цена какая?» – ответ зависит от сессии
+        answer_stats["unanchored"] += 1
+        return await arun()
+    version = await snapshot.aversion()
+    hit = await asyncio.to_thread(lookup, question, entities, version)
+    if hit is not None:
+        if hit["mapping"]:
+            await astore_session_mapping(
+                session_id, {int(i): int(row) for i, row in hit["mapping"].items()})
+        return hit["draft"]
+
+    before = await aload_session_mapping(session_id)
+    draft = await arun()
+    after = await aload_session_mapping(session_id)
+    await asyncio.to_thread(store, question, entities, version, draft,
+                            after if after != before else None)
+    return draft
+
+
+def answer_report() -> Dict[str, Any]:
+    """{exact, near, misses, stored, skipped, unanchored, hit_rate}."""
+    hits = answer_stats["exact"] + answer_stats["near"]
+    total = hits + answer_stats["misses"]
+    return {**{k: answer_stats[k] for k in ("exact", "near", "misses", "stored", "skipped", "unanchored")},
+            "hit_rate": round(hits / total, 3) if total else 0.0}
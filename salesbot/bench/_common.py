@@ -0,0 +1,140 @@
+"""
+Общие утилиты для бенчмарков salesbot/bench
+───────────────────────────────────────────
+•  кладёт salesbot/ и корень репозитория в sys.path – модули импортируют
+   друг друга и как `redis_cache`, и как `salesbot.…`;
+•  local_redis() – Redis-«заглушка»: fakeredis, если установлен, иначе
+   локальный REDIS_URL (по умолчанию redis://localhost:6379/15);
+•  CountingRedis – считает round trip'ы и добавляет искусственный RTT,
+   чтобы разница между N×GET и одним MGET была видна и на localhost.
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import time
+from typing import Any, Dict, List
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SALESBOT = os.path.dirname(HERE)
+ROOT = os.path.dirname(SALESBOT)
+for _p in (SALESBOT, ROOT):
+    if _p not in sys.path:
+        sys.path.insert(0, _p)
+
+os.environ.setdefault("REDIS_URL", "redis://localhost:6379/15")
+
+HEADERS: List[str] = [
+    "Модель", "Производитель", "Линейка", "Состояние",
+    "Хэшрейт", "Потребление", "Цена продажи",
+]
+BRANDS = {
+    "Bitmain": ["Antminer S19", "Antminer S19 Pro", "Antminer S21", "Antminer T21"],
+    "WhatsMiner": ["WhatsMiner M30S++", "WhatsMiner M50S", "WhatsMiner M60"],
+    "Canaan": ["Avalon A1346", "Avalon A1466"],
+}
+CONDITIONS = ["новый", "бу", "восстановленный"]
+
+
+def local_redis(decode_responses: bool = True):
+    return local_redis_pair()[0 if decode_responses else 1]
+
+
+def local_redis_pair():
+    """(текстовый, бинарный) клиенты к одной и той же базе."""
+    try:
+        import fakeredis
+        server = fakeredis.FakeServer()
+        return (fakeredis.FakeRedis(server=server, decode_responses=True),
+                fakeredis.FakeRedis(server=server))
+    except ImportError:
+        import redis
+        url = os.environ["REDIS_URL"]
+        return redis.from_url(url, decode_responses=True), redis.from_url(url)
+
+
+def fake_catalog(n: int) -> Dict[int, Dict[str, str]]:
+    """n строк листа в виде {row: {header: value}} (row начинается с 2)."""
+    series = [(b, s) for b, ss in BRANDS.items() for s in ss]
+    out: Dict[int, Dict[str, str]] = {}
+    for i in range(n):
+        brand, model = series[i % len(series)]
+        th = 90 + (i * 7) % 180
+        out[i + 2] = {
+            "Модель": f"{model} {th}T",
+            "Производитель": brand,
+            "Линейка": model.split()[-1] if brand != "Bitmain" else model.split()[1],
+            "Состояние": CONDITIONS[i % len(CONDITIONS)],
+            "Хэшрейт": f"{th} TH/s",
+            "Потребление": f"{th * 30} W",
+            "Цена продажи": f"{800 + (i * 53) % 4200} $",
+        }
+    return out
+
+
+class CountingRedis:
+    """Прокси над redis-клиентом: каждый вызов команды = 1 round trip."""
+
+    def __init__(self, client: Any, rtt: float = 0.0005) -> None:
+        self._client = client
+        self.rtt = rtt
+        self.round_trips = 0
+
+    def _hit(self) -> None:
+        self.round_trips += 1
+        if self.rtt:
+            time.sleep(self.rtt)
+
+    def pipeline(self, *args, **kwargs) -> "_CountingPipeline":
+        return _CountingPipeline(self, self._client.pipeline(*args, **kwargs))
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._client, name)
+        if not callable(attr):
+            return attr
+
+        def _call(*args, **kwargs):
+            self._hit()
+            return attr(*args, **kwargs)
+
+        return _call
+
+
+class _CountingPipeline:
+    """Команды копятся локально, round trip – только на execute()."""
+
+    def __init__(self, owner: CountingRedis, pipe: Any) -> None:
+        self._owner = owner
+        self._pipe = pipe
+
+    def execute(self, *args, **kwargs):
+        self._owner._hit()
+        return self._pipe.execute(*args, **kwargs)
+
+    def __enter__(self) -> "_CountingPipeline":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._pipe.reset()
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._pipe, name)
+        if not callable(attr):
+            return attr
+
+        def _queue(*args, **kwargs):
+            attr(*args, **kwargs)
+            return self
+
+        return _queue
+
+
+def timed(fn, *args, repeat: int = 5, **kwargs) -> float:
+    """Лучшее из `repeat` время вызова, мс."""
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(*args, **kwargs)
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000
@@ -0,0 +1,83 @@
+"""
+Answer-cache: похожие формулировки и инвалидация при sync
+────────────────────────────────────────────────────────
+    python salesbot/bench/bench_answer_cache.py [--similarity 0.85]
+
+Кладёт черновики для «канонических» вопросов в answer_cache (Redis –
+_common.local_redis_pair(), каталог – fake_catalog), затем спрашивает
+перефразировки (должны попасть) и вопросы про другие модели / бренды
+(не должны). Вопросы без brand / model («какие асики есть?», «а цена
+какая?») зависят от сессии – не пишутся и не находятся. После публикации новой версии каталога те же вопросы обязаны
+промахнуться – черновики старой версии не читаются.
+"""
+
+import argparse
+
+from _common import HEADERS, fake_catalog, local_redis_pair
+
+import answer_cache
+import redis_cache
+from salesbot.subagents.intent_rules import catalog_entities
+
+STORED = {
+    "Сколько стоит Antminer S19?": "S19 95T – 1 200 $ …",
+    "какие асики есть?": "Bitmain (4), WhatsMiner (3), Canaan (2). Какой бренд интересует?",
+    "цена на Whatsminer M50S бу": "M50S бу – 1 050 $ …",
+}
+# (вопрос, должен ли попасть)
+PROBES = [
+    ("сколько стоит antminer s19", True),
+    ("Подскажите, сколько стоит Antminer S19?", True),
+    ("а сколько стоит Antminer S19 ?", True),
+    ("какие асики есть", False),
+    ("Какие асики есть в наличии?", False),
+    ("цена Whatsminer M50S бу?", True),
+    ("Сколько стоит Antminer S21?", False),
+    ("Сколько стоит Antminer S19 новый?", False),
+    ("цена на Whatsminer M50S новый", False),
+    ("какие модели Bitmain есть?", False),
+    ("а цена какая?", False),
+    ("сколько стоит 3?", False),
+]
+
+
+def probe(version):
+    got = []
+    for q, expected in PROBES:
+        hit = answer_cache.lookup(q, catalog_entities(q), version)
+        got.append((q, expected, hit is not None))
+    return got
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--similarity", type=float, default=answer_cache.SIMILARITY)
+    args = ap.parse_args()
+    answer_cache.SIMILARITY = args.similarity
+
+    base, base_bin = local_redis_pair()
+    redis_cache.r, redis_cache.r_bin = base, base_bin
+    answer_cache.r = base
+    redis_cache.cache_catalog(HEADERS, fake_catalog(200), fmt="json")
+    redis_cache.snapshot.check_interval = 0
+
+    version = redis_cache.snapshot.version()
+    for q, draft in STORED.items():
+        answer_cache.store(q, catalog_entities(q), version, draft)
+
+    print(f"version {version}: similarity ≥ {args.similarity}")
+    ok = 0
+    for q, expected, hit in probe(version):
+        ok += hit == expected
+        print(f"  {'✓' if hit == expected else '✗'} {'hit ' if hit else 'miss'} {q!r}")
+    print(f"correct: {ok}/{len(PROBES)}")
+
+    redis_cache.cache_catalog(HEADERS, fake_catalog(201), fmt="json")
+    new_version = redis_cache.snapshot.version()
+    stale = sum(hit for _, _, hit in probe(new_version))
+    print(f"after sync (version {new_version}): stale hits {stale} (ожидается 0)")
+    print("stats:", answer_cache.answer_report())
+
+
+if __name__ == "__main__":
+    main()
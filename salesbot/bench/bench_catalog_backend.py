@@ -0,0 +1,70 @@
+"""
+Redis vs локальный SQLite-снапшот каталога
+──────────────────────────────────────────
+    python salesbot/bench/bench_catalog_backend.py [--rows 3000] [--rtt 0.0005]
+
+Один и тот же каталог пишется в Redis (stage → build_indexes → publish) и в
+SQLite (write_catalog), затем одни и те же читатели catalog_index /
+redis_cache гоняются с CATALOG_BACKEND=redis и =sqlite. Для Redis
+добавляется искусственный RTT (CountingRedis), чтобы localhost не прятал
+сетевой hop. Версия не передаётся – читатели берут её сами (снапшот
+процесса / meta файла), как в инструментах.
+"""
+
+import argparse
+import os
+import tempfile
+
+from _common import HEADERS, CountingRedis, fake_catalog, local_redis_pair, timed
+
+import catalog_index
+import redis_cache
+from catalog_sqlite import write_catalog
+
+QUERIES = {
+    "load_rows_many(10)": lambda: redis_cache.load_rows_many(range(2, 12)),
+    "filter_rows": lambda: catalog_index.filter_rows(brand="bitmain", condition="бу"),
+    "group_counts": lambda: catalog_index.group_counts("series", {"brand": "bitmain"}),
+    "range_rows": lambda: catalog_index.range_rows("price", 1000, 2000, limit=10),
+    "search_rows": lambda: catalog_index.search_rows("вотсмайнер м50с"),
+}
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=3000)
+    ap.add_argument("--rtt", type=float, default=0.0005, help="искусственный RTT Redis, сек")
+    args = ap.parse_args()
+
+    text, binary = local_redis_pair()
+    text.flushdb()
+    redis_cache.r, redis_cache.r_bin = text, binary
+    catalog_index.r = text
+    records = fake_catalog(args.rows)
+    redis_cache.CATALOG_FORMAT = "json"
+    version, _ = redis_cache.stage_catalog(HEADERS, records)
+    catalog_index.build_indexes(records, version)
+    redis_cache.publish_version(version)
+
+    path = os.path.join(tempfile.mkdtemp(), "catalog.sqlite")
+    write_catalog(HEADERS, records, version, path)
+    redis_cache.CATALOG_SQLITE = path
+    print(f"{args.rows} rows, sqlite file {os.path.getsize(path) / 1024:.0f} KiB")
+
+    counting = CountingRedis(text, rtt=args.rtt)
+    print(f"{'query':<20} | {'redis ms':>9} | {'sqlite ms':>9}")
+    for name, fn in QUERIES.items():
+        redis_cache.CATALOG_BACKEND = "redis"
+        redis_cache.r = catalog_index.r = counting
+        redis_cache.snapshot.clear()
+        fn()
+        ms_redis = timed(fn, repeat=20)
+
+        redis_cache.CATALOG_BACKEND = "sqlite"
+        fn()
+        ms_sqlite = timed(fn, repeat=20)
+        print(f"{name:<20} | {ms_redis:>9.3f} | {ms_sqlite:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+json vs hash vs packed: память Redis и время декодирования
+──────────────────────────────────────────────────────────
+    python salesbot/bench/bench_catalog_format.py [--base 100] [--scales 1 10 100]
+
+Для каждого размера каталога пишет его во всех форматах redis_cache и
+печатает MEMORY USAGE (если стенд-ин её поддерживает), размер полезной
+нагрузки, полное чтение каталога и выборку 10 строк.
+"""
+
+import argparse
+import json
+
+from _common import HEADERS, fake_catalog, local_redis_pair, timed
+
+import redis_cache
+
+
+def payload_bytes(fmt, headers, records) -> int:
+    if fmt == "packed":
+        return len(redis_cache.PackedCatalog.encode(headers, records))
+    if fmt == "hash":
+        return sum(len(k.encode()) + len(str(v).encode())
+                   for data in records.values() for k, v in data.items())
+    return sum(len(json.dumps(data, ensure_ascii=False).encode()) for data in records.values())
+
+
+def full_read():
+    return redis_cache.load_rows_many(int(row) for row in redis_cache.load_rows())
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--base", type=int, default=100, help="строк в «сегодняшнем» каталоге")
+    ap.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100])
+    args = ap.parse_args()
+
+    redis_cache.r, redis_cache.r_bin = local_redis_pair()
+    print("msgpack:", "yes" if redis_cache.msgpack else "no (JSON fallback)")
+    print(f"{'rows':>7} {'fmt':>7} | {'MEMORY':>10} {'payload':>10} {'B/row':>6} | "
+          f"{'full ms':>8} {'10 rows ms':>10}")
+
+    for scale in args.scales:
+        records = fake_catalog(args.base * scale)
+        sample = list(records)[:: max(1, len(records) // 10)][:10]
+        for fmt in redis_cache.FORMATS:
+            redis_cache.r.flushdb()
+            redis_cache.CATALOG_FORMAT = fmt
+            redis_cache.cache_catalog(HEADERS, records, fmt)
+
+            mem = redis_cache.catalog_memory()["bytes"]
+            payload = payload_bytes(fmt, HEADERS, records)
+            full_ms = timed(full_read, repeat=3)
+            few_ms = timed(redis_cache.load_rows_many, sample, repeat=3)
+            mem_s = f"{mem / 1024:>9.1f}K" if mem is not None else f"{'n/a':>10}"
+            print(f"{len(records):>7} {fmt:>7} | {mem_s} {payload / 1024:>9.1f}K "
+                  f"{(mem or payload) / len(records):>6.0f} | {full_ms:>8.2f} {few_ms:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
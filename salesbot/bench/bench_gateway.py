@@ -0,0 +1,169 @@
+"""
+Gateway: пропускная способность процесса на фейковой модели
+──────────────────────────────────────────────────────────
+    python salesbot/bench/bench_gateway.py [--sessions 200] [--turns 5] [--latency 0.5]
+    python salesbot/bench/bench_gateway.py --connect 127.0.0.1:8765 …   # живой gateway
+
+Без --connect поднимает gateway.Gateway в этом же процессе: оркестратор
+dispatch-режима на фейковой чат-модели (ответ через `latency` сек., токены
+потоком) – меряется сам процесс, а не OpenAI. Реплики сценария не ходят в
+каталог, поэтому Redis не нужен (кэш LLM выключен).
+
+`sessions` клиентов параллельно ведут по `turns` реплик через `connections`
+TCP-соединений; печатает реплик/сек, p50/p95 латентности и ttft, ошибки и
+проверку «одна реплика на сессию одновременно».
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+from typing import Any, Dict, List
+
+os.environ.setdefault("LLM_CACHE_AGENTS", "")
+
+import _common  # noqa: F401 – sys.path
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from salesbot.gateway import Gateway, SessionRegistry
+from salesbot.orchestrator import build_orchestrator
+
+DIALOG = ["Здравствуйте!", "дорого", "где вы находитесь?", "мой номер +7 912 345-67-89", "спасибо"]
+ANSWER = "Понял вас! Сейчас всё подскажу и подберу вариант под ваш бюджет."
+
+
+class SlowChatModel(FakeListChatModel):
+    """Фейковая модель: ждёт latency (asyncio.sleep), отвечает по типу промпта."""
+
+    latency: float = 0.5
+
+    def _answer(self, messages) -> str:
+        text = " ".join(str(m.content) for m in messages)
+        if "NLU-модуль" in text:
+            return '{"intent":"objection","entities":{}}' if "дорого" in text else \
+                '{"intent":"presentation","entities":{}}'
+        if "proper nouns" in text or "entities" in text.lower():
+            return "NONE"
+        return ANSWER
+
+    def _call(self, messages, stop=None, run_manager=None, **kwargs) -> str:
+        time.sleep(self.latency)
+        return self._answer(messages)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        await asyncio.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self._answer(messages)))])
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.latency)
+        for word in self._answer(messages).split(" "):
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=word + " "))
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+
+class Client:
+    """Одно TCP-соединение, по нему – реплики разных сессий вперемешку."""
+
+    def __init__(self, reader, writer) -> None:
+        self.reader, self.writer = reader, writer
+        self.waiting: Dict[str, asyncio.Future] = {}
+        self.first_token: Dict[str, float] = {}
+        self._pump = asyncio.create_task(self._read())
+
+    async def _read(self) -> None:
+        while True:
+            line = await self.reader.readline()
+            if not line:
+                return
+            msg = json.loads(line)
+            sid = msg.get("session")
+            if "token" in msg:
+                self.first_token.setdefault(sid, time.perf_counter())
+                continue
+            fut = self.waiting.pop(sid, None)
+            if fut and not fut.done():
+                fut.set_result(msg)
+
+    async def ask(self, sid: str, message: str) -> Dict[str, Any]:
+        fut = asyncio.get_running_loop().create_future()
+        self.waiting[sid] = fut
+        self.first_token.pop(sid, None)
+        t0 = time.perf_counter()
+        self.writer.write((json.dumps({"session": sid, "message": message, "stream": True},
+                                      ensure_ascii=False) + "\n").encode())
+        await self.writer.drain()
+        reply = await fut
+        reply["_wall_ms"] = (time.perf_counter() - t0) * 1000
+        if sid in self.first_token:
+            reply["_ttft_ms"] = (self.first_token[sid] - t0) * 1000
+        return reply
+
+
+def _pct(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+async def run(args) -> None:
+    server = None
+    if args.connect:
+        host, port = args.connect.rsplit(":", 1)
+    else:
+        llm = SlowChatModel(responses=[ANSWER], latency=args.latency)
+        registry = SessionRegistry(lambda sid: build_orchestrator(sid, mode="dispatch", llm=llm))
+        gateway = Gateway(registry)
+        server = await gateway.serve("127.0.0.1", 0)
+        host, port = server.sockets[0].getsockname()[:2]
+
+    clients = []
+    for _ in range(args.connections):
+        reader, writer = await asyncio.open_connection(host, int(port), limit=1 << 20)
+        clients.append(Client(reader, writer))
+
+    replies: List[Dict[str, Any]] = []
+
+    async def _session(i: int) -> None:
+        client = clients[i % len(clients)]
+        for t in range(args.turns):
+            replies.append(await client.ask(f"load-{i}", DIALOG[t % len(DIALOG)]))
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(_session(i) for i in range(args.sessions)))
+    wall = time.perf_counter() - t0
+
+    errors = [r for r in replies if "error" in r]
+    lat = [r["_wall_ms"] for r in replies if "error" not in r]
+    ttft = [r["_ttft_ms"] for r in replies if "_ttft_ms" in r]
+    print(f"sessions {args.sessions} × turns {args.turns} over {args.connections} connections, "
+          f"fake latency {args.latency}s/call")
+    print(f"turns/s {len(replies) / wall:.1f}   wall {wall:.2f}s   errors {len(errors)}")
+    print(f"latency ms  p50 {statistics.median(lat) if lat else 0:.0f}  p95 {_pct(lat, 0.95):.0f}   "
+          f"ttft ms  p50 {statistics.median(ttft) if ttft else 0:.0f}  p95 {_pct(ttft, 0.95):.0f}")
+    if errors:
+        print("  first error:", errors[0])
+    if server is not None:
+        print("gateway:", gateway.stats())
+        server.close()
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sessions", type=int, default=200)
+    ap.add_argument("--turns", type=int, default=5)
+    ap.add_argument("--connections", type=int, default=10)
+    ap.add_argument("--latency", type=float, default=0.5, help="задержка фейковой модели на вызов, сек")
+    ap.add_argument("--connect", help="host:port уже запущенного gateway")
+    asyncio.run(run(ap.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
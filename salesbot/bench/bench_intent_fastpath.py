@@ -0,0 +1,99 @@
+"""
+Fast-path intent: доля реплик без LLM и точность правил
+───────────────────────────────────────────────────────
+    python salesbot/bench/bench_intent_fastpath.py [--min-confidence 0.85]
+
+Гоняет subagents/intent_rules.classify() по размеченному набору типичных
+реплик клиентов. Печатает hit rate (реплики, решённые правилами – им не
+нужен LLM-вызов classify_intent), точность на них и промахи; затем сверяет
+сущности catalog_entities() (цифры модели не должны читаться бюджетом).
+"""
+
+import argparse
+from collections import Counter
+
+import _common  # noqa: F401 – sys.path
+
+from subagents.intent_rules import MIN_CONFIDENCE, catalog_entities, classify
+
+# (реплика, ожидаемый intent)
+CORPUS = [
+    ("Привет.", "greeting"),
+    ("Здравствуйте!", "greeting"),
+    ("добрый вечер", "greeting"),
+    ("Спасибо большое!", "greeting"),
+    ("ок, спасибо, пока", "greeting"),
+    ("hi", "greeting"),
+    ("+7 (912) 345-67-89", "schedule_call"),
+    ("89123456789", "schedule_call"),
+    ("мой номер 8 912 345 67 89", "schedule_call"),
+    ("пишите в тг @miner_ivan", "schedule_call"),
+    ("t.me/asic_buyer", "schedule_call"),
+    ("ivan.petrov@mail.ru", "schedule_call"),
+    ("Позвоните мне завтра в 11", "schedule_call"),
+    ("Сколько стоит S19?", "catalog_query"),
+    ("почём M30S++ новый?", "catalog_query"),
+    ("цена на антмайнер S21 XP", "catalog_query"),
+    ("скиньте прайс", "catalog_query"),
+    ("Привет, какая цена на Whatsminer M50S бу?", "catalog_query"),
+    ("какие асики есть?", "catalog_query"),
+    ("Меня интересует Antminer S19 с хешрейтом 120 TH/s.", "catalog_query"),
+    ("что есть до 1 500 000 ₽?", "catalog_query"),
+    ("S19 или M30S, что лучше?", "catalog_query"),
+    ("сколько стоит доставка в Иркутск?", "presentation"),
+    ("Где вы находитесь? Какой у вас график работы?", "presentation"),
+    ("кто вы такие вообще", "presentation"),
+    ("дорого", "objection"),
+    ("слишком высокая цена", "objection"),
+    ("а он шумит сильно?", "objection"),
+    ("окупится ли за год?", "objection"),
+    ("какая гарантия?", "objection"),
+    ("дорого, перезвоните через месяц +79123456789", "objection"),
+    ("расскажите анекдот", "other"),
+]
+
+# (реплика, ожидаемые сущности целиком)
+ENTITY_PROBES = [
+    ("Здравствуйте, интересует S19k pro", {"model": "S19k pro"}),
+    ("нужен L7 9500k", {"model": "L7", "budget": "9500k"}),
+    ("S19 за 150к", {"model": "S19", "budget": "150к"}),
+    ("что есть до 1 500 000 ₽?", {"budget": "1 500 000 ₽"}),
+]
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--min-confidence", type=float, default=MIN_CONFIDENCE)
+    args = ap.parse_args()
+
+    hits = correct = 0
+    by_rule: Counter = Counter()
+    wrong = []
+    for text, expected in CORPUS:
+        out = classify(text)
+        if out["confidence"] < args.min_confidence:
+            continue
+        hits += 1
+        by_rule[out["rule"]] += 1
+        if out["intent"] == expected:
+            correct += 1
+        else:
+            wrong.append((text, expected, out))
+
+    n = len(CORPUS)
+    print(f"replies: {n}   fast-path hits: {hits} ({hits / n:.0%})   "
+          f"precision on hits: {correct}/{hits}   by rule: {dict(by_rule)}")
+    for text, expected, out in wrong:
+        print(f"  ✗ {text!r}: expected {expected}, got {out}")
+
+    ok = 0
+    for text, expected in ENTITY_PROBES:
+        got = catalog_entities(text)
+        ok += got == expected
+        if got != expected:
+            print(f"  ✗ entities {text!r}: expected {expected}, got {got}")
+    print(f"entity probes: {ok}/{len(ENTITY_PROBES)}")
+
+
+if __name__ == "__main__":
+    main()
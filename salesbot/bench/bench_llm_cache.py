@@ -0,0 +1,81 @@
+"""
+LLM-кэш: сколько completion'ов экономит точный кэш ответов
+─────────────────────────────────────────────────────────
+    python salesbot/bench/bench_llm_cache.py [--turns 200] [--max 50] [--latency 0.2]
+
+Фейковая чат-модель (FakeListChatModel + счётчик вызовов и задержка) гоняет
+поток типичных реплик через тот же PROMPT, что и intent-детектор, без кэша и
+с RedisCompletionCache (Redis – _common.local_redis()). Печатает реальные
+вызовы модели, hit rate, вытеснения LRU и wall time; проверяет, что ответы с
+кэшем совпадают с ответами без него.
+"""
+
+import argparse
+import random
+import time
+
+from _common import local_redis
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from llm_cache import RedisCompletionCache, cache_report
+from subagents.intent import PROMPT
+
+REPLIES = [
+    "привет", "какие асики есть?", "Сколько стоит S19?", "дорого", "спасибо",
+    "где вы находитесь?", "почём M30S++ новый?", "а он шумит сильно?",
+]
+
+
+class CountingChatModel(FakeListChatModel):
+    """Ответ детерминирован по входу (как temperature=0); считает вызовы."""
+
+    calls: int = 0
+    latency: float = 0.0
+
+    def _call(self, messages, stop=None, run_manager=None, **kwargs) -> str:
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return f'{{"intent":"other","entities":{{}},"echo":{len(messages[-1].content)}}}'
+
+
+def run(model, turns):
+    answers = []
+    t0 = time.perf_counter()
+    for msg in turns:
+        answers.append(model.invoke(PROMPT.format_messages(input=msg)).content)
+    return answers, time.perf_counter() - t0
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--turns", type=int, default=200)
+    ap.add_argument("--max", type=int, default=50, help="LLM_CACHE_MAX для прогона")
+    ap.add_argument("--latency", type=float, default=0.02, help="задержка фейковой модели, сек")
+    ap.add_argument("--unique", type=float, default=0.3, help="доля уникальных реплик в потоке")
+    args = ap.parse_args()
+    random.seed(1)
+
+    turns = [random.choice(REPLIES) if random.random() > args.unique else f"вопрос #{i}"
+             for i in range(args.turns)]
+
+    plain = CountingChatModel(responses=["-"], latency=args.latency)
+    base, wall_plain = run(plain, turns)
+
+    cache = RedisCompletionCache("bench", max_entries=args.max, client=local_redis())
+    cache.clear()
+    cached = CountingChatModel(responses=["-"], latency=args.latency, cache=cache)
+    out, wall_cached = run(cached, turns)
+    cache.clear()
+
+    assert out == base, "ответы с кэшем разошлись с ответами модели"
+    st = cache_report()["bench"]
+    print(f"{'variant':<8} | {'turns':>5} {'llm calls':>9} {'hit rate':>8} {'evicted':>7} | {'wall s':>6}")
+    print(f"{'plain':<8} | {len(turns):>5} {plain.calls:>9} {'-':>8} {'-':>7} | {wall_plain:>6.2f}")
+    print(f"{'cached':<8} | {len(turns):>5} {cached.calls:>9} {st['hit_rate']:>8} {st['evicted']:>7} "
+          f"| {wall_cached:>6.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+N×load_row vs load_rows_many (Lua, 1 RTT)
+─────────────────────────────────────────
+    python salesbot/bench/bench_load_rows_many.py [--rtt 0.0005]
+
+Печатает round trip'ы и wall time на одно обращение при росте числа
+запрошенных индексов. Чтение идёт через Lua-скрипт, поэтому для
+fakeredis нужен extra `fakeredis[lua]`.
+"""
+
+import argparse
+
+from _common import HEADERS, CountingRedis, fake_catalog, local_redis_pair, timed
+
+import redis_cache
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rtt", type=float, default=0.0005, help="искусственный RTT, сек")
+    args = ap.parse_args()
+
+    base, base_bin = local_redis_pair()
+    catalog = fake_catalog(1000)
+    redis_cache.r, redis_cache.r_bin = base, base_bin
+    redis_cache.cache_catalog(HEADERS, catalog, fmt="json")
+
+    counting = CountingRedis(base, rtt=args.rtt)
+    redis_cache.r = counting
+
+    print(f"{'N':>6} | {'GET rt':>7} {'GET ms':>9} | {'MGET rt':>7} {'MGET ms':>9}")
+    for n in (1, 10, 50, 100, 500, 1000):
+        rows = list(catalog)[:n]
+
+        counting.round_trips = 0
+        redis_cache.load_row(rows[0])
+        counting.round_trips = 0
+        [redis_cache.load_row(row) for row in rows]
+        rt_single = counting.round_trips
+        ms_single = timed(lambda: [redis_cache.load_row(row) for row in rows], repeat=3)
+
+        counting.round_trips = 0
+        redis_cache.load_rows_many(rows)
+        rt_many = counting.round_trips
+        ms_many = timed(redis_cache.load_rows_many, rows, repeat=3)
+
+        print(f"{n:>6} | {rt_single:>7} {ms_single:>9.2f} | {rt_many:>7} {ms_many:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
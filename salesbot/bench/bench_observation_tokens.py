@@ -0,0 +1,46 @@
+"""
+Размер observation каталожных инструментов, в токенах
+─────────────────────────────────────────────────────
+    python salesbot/bench/bench_observation_tokens.py [--rows 100]
+
+Сравнивает полный JSON с fields / compact / limit на фейковом каталоге.
+"""
+
+import argparse
+
+from _common import HEADERS, fake_catalog, local_redis_pair
+
+import redis_cache
+import tools_catalog
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=100)
+    args = ap.parse_args()
+
+    redis_cache.r, redis_cache.r_bin = local_redis_pair()
+    records = fake_catalog(args.rows)
+    redis_cache.cache_catalog(HEADERS, records)
+    redis_cache.snapshot.clear()
+    rows = list(records)
+    few = ["Модель", "Цена продажи", "Хэшрейт"]
+
+    cases = [
+        ("list_all_products", lambda: tools_catalog.list_all_products()),
+        ("list_all_products compact", lambda: tools_catalog.list_all_products(compact=True)),
+        ("list_all_products limit=20", lambda: tools_catalog.list_all_products(limit=20, compact=True)),
+        ("get_fields_by_index all", lambda: tools_catalog.get_fields_by_index(rows)),
+        ("  + fields", lambda: tools_catalog.get_fields_by_index(rows, fields=few)),
+        ("  + fields + compact", lambda: tools_catalog.get_fields_by_index(rows, fields=few, compact=True)),
+        ("  + fields + compact + limit=7",
+         lambda: tools_catalog.get_fields_by_index(rows, fields=few, compact=True, limit=7)),
+    ]
+    print(f"{'case':<34} {'tokens':>8} {'chars':>8}")
+    for name, call in cases:
+        out = call()
+        print(f"{name:<34} {tools_catalog.count_tokens(out):>8} {len(out):>8}")
+
+
+if __name__ == "__main__":
+    main()
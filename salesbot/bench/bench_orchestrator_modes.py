@@ -0,0 +1,54 @@
+"""
+Оркестратор: react vs dispatch – LLM-вызовы и латентность на реплику
+───────────────────────────────────────────────────────────────────
+    python salesbot/bench/bench_orchestrator_modes.py [--modes react dispatch] [--repeat 1] [--stream]
+
+Один и тот же сценарий диалога прогоняется через build_orchestrator(mode=…)
+в новой сессии на каждый режим (нужны OPENAI_API_KEY и Redis с каталогом –
+как для run_cli). Печатает по режимам: LLM-вызовов на реплику (считает
+orchestrator.llm_calls – колбэк на модели, видит и sub-агентов, и
+EntityMemory), среднюю латентность, time-to-first-token (--stream) и
+маршрут каждой реплики для dispatch.
+"""
+
+import argparse
+
+import _common  # noqa: F401 – sys.path
+
+from salesbot.orchestrator import MODES, build_orchestrator, run_turn, turn_report
+
+DIALOG = [
+    "Здравствуйте!",
+    "Сколько стоит Antminer S19?",
+    "дорого",
+    "где вы находитесь и есть ли доставка в Иркутск?",
+    "какие асики есть до 1 500 000 ₽?",
+    "мой номер +7 912 345-67-89",
+    "спасибо",
+]
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    ap.add_argument("--repeat", type=int, default=1, help="прогонов сценария на режим")
+    ap.add_argument("--stream", action="store_true", help="стриминг финального ответа, меряет ttft")
+    args = ap.parse_args()
+
+    for mode in args.modes:
+        for _ in range(args.repeat):
+            agent = build_orchestrator(mode=mode)
+            for msg in DIALOG:
+                run_turn(agent, msg, on_token=(lambda t: None) if args.stream else None)
+                last = getattr(agent, "last", None)
+                if last:
+                    print(f"  [{mode}] {msg!r} → {last['intent']}{' +merge' if last['merged'] else ''}")
+
+    print(f"{'mode':<9} | {'turns':>5} {'llm/turn':>8} {'avg ms':>8} {'ttft ms':>8}")
+    for mode, st in turn_report().items():
+        print(f"{mode:<9} | {st['turns']:>5} {st['llm_calls_per_turn']:>8} {st['avg_latency_ms']:>8} "
+              f"{st.get('avg_ttft_ms', '-'):>8}")
+
+
+if __name__ == "__main__":
+    main()
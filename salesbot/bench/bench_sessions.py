@@ -0,0 +1,87 @@
+"""
+Сессии: время создания и память процесса на 1000 разговоров
+───────────────────────────────────────────────────────────
+    python salesbot/bench/bench_sessions.py [--sessions 1000] [--variants shared,per-session]
+
+•  shared      – build_orchestrator(): executor'ы / prompt'ы / инструменты
+                 общие на процесс (SharedAgents), на сессию – только память;
+•  per-session – как раньше: на каждую сессию свой SharedAgents (все
+                 sub-агенты, инструменты и ReAct-агент заново).
+
+Каждый вариант – в отдельном процессе (RSS не смешивается); модель –
+фейковая, сессии только создаются, LLM не вызывается. Печатает мс на
+сессию и прирост RSS на 1000 сессий.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+os.environ.setdefault("LLM_CACHE_AGENTS", "")
+
+import _common  # noqa: F401 – sys.path
+
+VARIANTS = ("shared", "per-session")
+
+
+def _rss_mb() -> float:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+
+
+def _child(variant: str, sessions: int, mode: str) -> None:
+    import gc
+
+    from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+    from salesbot.memory import build_memory
+    from salesbot.orchestrator import (DispatchOrchestrator, ReactOrchestrator, SharedAgents,
+                                       build_orchestrator)
+
+    llm = FakeListChatModel(responses=["ok"])
+    cls = DispatchOrchestrator if mode == "dispatch" else ReactOrchestrator
+
+    def make(i: int):
+        if variant == "shared":
+            return build_orchestrator(f"s{i}", mode=mode, llm=llm)
+        agents = SharedAgents(llm)
+        return cls(agents, f"s{i}", build_memory(agents.llm))
+
+    make(-1)                                    # импорты / общий SharedAgents – вне замера
+    gc.collect()
+    rss0, t0 = _rss_mb(), time.perf_counter()
+    keep = [make(i) for i in range(sessions)]
+    elapsed = time.perf_counter() - t0
+    gc.collect()
+    rss = _rss_mb() - rss0
+    print(json.dumps({"variant": variant, "sessions": len(keep),
+                      "ms_per_session": round(elapsed * 1000 / sessions, 3),
+                      "rss_mb_per_1000": round(rss * 1000 / sessions, 1)}))
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sessions", type=int, default=1000)
+    ap.add_argument("--variants", default=",".join(VARIANTS))
+    ap.add_argument("--mode", choices=("react", "dispatch"), default="react")
+    ap.add_argument("--child", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.child:
+        _child(args.child, args.sessions, args.mode)
+        return
+
+    print(f"{'variant':<12} {'ms/session':>11} {'RSS MB/1000':>12}")
+    for variant in args.variants.split(","):
+        out = subprocess.run([sys.executable, __file__, "--child", variant,
+                              "--sessions", str(args.sessions), "--mode", args.mode],
+                             capture_output=True, text=True, check=True)
+        res = json.loads(out.stdout.strip().splitlines()[-1])
+        print(f"{variant:<12} {res['ms_per_session']:>11} {res['rss_mb_per_1000']:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Bulk fetch листа: окна строк vs старый «A2:A10000 + колонка на заголовок»
+─────────────────────────────────────────────────────────────────────────
+    python salesbot/bench/bench_sheet_fetch.py [--rows 50000] [--cols 60] [--chunk 5000]
+
+Фейковый лист (bench/fake_sheet.py) rows × cols. Печатает запросы к API,
+переданные ячейки, сколько строк реально прочитано, wall time и пик памяти
+(tracemalloc) для fetch_records() при разных окнах и для старой схемы.
+Старая схема читает заголовки "A1:Z1" – всё правее Z молча теряется – и
+не больше 9999 строк.
+Пик памяти почти не зависит от окна: его задаёт dict всех записей, который
+fetch_records() отдаёт целиком; окно меняет число запросов и размер ответа.
+"""
+
+import argparse
+import string
+import time
+import tracemalloc
+
+from _common import HEADERS, fake_catalog
+from fake_sheet import FakeWorksheet
+
+from sync_sheet_to_redis import fetch_records
+
+
+def wide_sheet(rows: int, cols: int) -> FakeWorksheet:
+    headers = HEADERS + [f"Доп {i}" for i in range(len(HEADERS), cols)]
+    extra = {h: f"{h} value" for h in headers[len(HEADERS):]}
+    records = fake_catalog(rows)
+    for data in records.values():
+        data.update(extra)
+    return FakeWorksheet(headers, records)
+
+
+def legacy_fetch(sheet):
+    """sync() до переписывания – для сравнения."""
+    headers = sheet.get("A1:Z1")[0]
+    cols = {h: string.ascii_uppercase[i] for i, h in enumerate(headers)}
+    models = sheet.get("A2:A10000")
+    rows_dict = {idx + 2: row[0] for idx, row in enumerate(models) if row}
+    columns = sheet.batch_get([f"{cols[h]}2:{cols[h]}10000" for h in headers])
+    records = {}
+    for i, row_idx in enumerate(rows_dict.keys()):
+        records[row_idx] = {headers[col]: columns[col][i][0] if columns[col][i] else ""
+                            for col in range(len(headers))}
+    return headers, records
+
+
+def measure(label: str, sheet: FakeWorksheet, fn) -> None:
+    sheet.reset_counters()
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    try:
+        headers, records = fn(sheet)
+        n = f"{len(records)} × {len(headers)}"
+    except IndexError as e:
+        n = f"error: {e}"
+    ms = (time.perf_counter() - t0) * 1000
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    calls = sum(sheet.calls.values())
+    print(f"{label:<22} | {calls:>5} {sheet.cells:>9} | {n!s:>26} | {ms:>9.0f} {peak / 2**20:>8.1f}")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=50_000)
+    ap.add_argument("--cols", type=int, default=60)
+    ap.add_argument("--chunk", type=int, nargs="*", default=[1000, 5000, 20000])
+    args = ap.parse_args()
+
+    sheet = wide_sheet(args.rows, args.cols)
+    print(f"sheet {sheet.row_count - 1} rows × {sheet.col_count} cols")
+    print(f"{'variant':<22} | {'calls':>5} {'cells':>9} | {'rows × cols read':>26} | {'ms':>9} {'peak MiB':>8}")
+    for chunk in args.chunk:
+        measure(f"windows chunk={chunk}", sheet, lambda s, c=chunk: fetch_records(s, c))
+    measure("legacy (60 cols)", sheet, legacy_fetch)
+
+    narrow = wide_sheet(args.rows, min(args.cols, 26))
+    measure("legacy (26 cols)", narrow, legacy_fetch)
+    measure("windows (26 cols)", narrow, fetch_records)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Sheets-клиент: лимитер + backoff + single-flight против «шумного» API
+────────────────────────────────────────────────────────────────────
+    python salesbot/bench/bench_sheets_client.py [--sessions 40] [--p429 0.2] [--latency 0.05]
+
+Фейковый лист (bench/fake_sheet.py) с инъекцией ошибок: каждый запрос с
+вероятностью p429 отвечает 429, а сверх квоты (quota запросов за скользящую
+минуту, как у Sheets API) – всегда 429. `sessions` потоков одновременно читают
+каталог (одинаковый "A2:A") и по одной своей строке.
+
+Печатает для «голого» листа и для throttled(): сколько сессий упало, сколько
+запросов реально ушло в API, сколько из них получили 429, повторы,
+склеенные чтения и wall time. Время сжато: минута квоты = `--minute` сек.
+"""
+
+import argparse
+import random
+import threading
+import time
+from collections import deque
+
+from _common import HEADERS, fake_catalog
+from fake_sheet import FakeWorksheet
+
+from sheets_client import SheetsClient, Throttled, TokenBucket
+
+
+class FakeAPIError(Exception):
+    """Как gspread.exceptions.APIError: HTTP-код в response.status_code."""
+
+    def __init__(self, status: int) -> None:
+        super().__init__(f"APIError [{status}]")
+        self.response = type("Response", (), {"status_code": status, "headers": {}})()
+
+
+class FlakyWorksheet(FakeWorksheet):
+    def __init__(self, *args, p429: float, quota: int, minute: float, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.p429 = p429
+        self.quota = quota
+        self.minute = minute
+        self.rejected = 0
+        self._window: deque = deque()
+        self._lock = threading.Lock()
+
+    def _request(self, kind: str, cells: int) -> None:
+        with self._lock:
+            now = time.monotonic()
+            while self._window and now - self._window[0] > self.minute:
+                self._window.popleft()
+            self._window.append(now)
+            over = len(self._window) > self.quota
+            self.calls[kind] += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if over or random.random() < self.p429:
+            with self._lock:
+                self.rejected += 1
+            raise FakeAPIError(429)
+        self.cells += cells
+
+
+def run(sheet, sessions: int) -> "tuple[int, float]":
+    errors = []
+
+    def _session(i: int) -> None:
+        try:
+            sheet.get("A2:A")
+            sheet.get(f"A{i + 2}:G{i + 2}")
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=_session, args=(i,)) for i in range(sessions)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return len(errors), time.perf_counter() - t0
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sessions", type=int, default=40)
+    ap.add_argument("--p429", type=float, default=0.2)
+    ap.add_argument("--latency", type=float, default=0.05)
+    ap.add_argument("--quota", type=int, default=60, help="запросов за «минуту»")
+    ap.add_argument("--minute", type=float, default=2.0, help="длина «минуты» квоты, сек")
+    args = ap.parse_args()
+    random.seed(1)
+
+    def _sheet() -> FlakyWorksheet:
+        return FlakyWorksheet(HEADERS, fake_catalog(500), latency=args.latency,
+                              p429=args.p429, quota=args.quota, minute=args.minute)
+
+    print(f"{'variant':<10} | {'failed':>6} {'api calls':>9} {'429':>5} {'retries':>7} "
+          f"{'coalesced':>9} | {'wall s':>6}")
+
+    raw = _sheet()
+    failed, wall = run(raw, args.sessions)
+    print(f"{'raw':<10} | {failed:>6} {sum(raw.calls.values()):>9} {raw.rejected:>5} "
+          f"{'-':>7} {'-':>9} | {wall:>6.2f}")
+
+    flaky = _sheet()
+    # квота и backoff в том же сжатом времени
+    scale = args.minute / 60
+    bucket = TokenBucket(per_minute=args.quota * 0.9, capacity=10)
+    bucket.rate /= scale
+    sheets = SheetsClient(bucket, backoff_base=1.0 * scale, backoff_max=32 * scale)
+    failed, wall = run(Throttled(flaky, sheets), args.sessions)
+    st = sheets.stats()
+    print(f"{'throttled':<10} | {failed:>6} {sum(flaky.calls.values()):>9} {flaky.rejected:>5} "
+          f"{st['retries']:>7} {st['coalesced']:>9} | {wall:>6.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Change-driven sync: пропуск по отпечатку + pub/sub
+──────────────────────────────────────────────────
+    python salesbot/bench/bench_sync_change.py [--rows 2000] [--no-revision]
+
+Гоняет sync() против фейкового листа (bench/fake_sheet.py) и локального
+Redis, печатает запросы/ячейки к API на каждом шаге и через сколько после
+публикации подписанный снапшот увидел новую версию (опрос asic:current
+выключен, работает только pub/sub).
+
+--no-revision – у таблицы нет метаданных ревизии, отпечаток считается по
+SYNC_PROBE_RANGE: правка вне пробного диапазона ждёт FORCE_EVERY.
+"""
+
+import argparse
+import time
+
+from _common import HEADERS, fake_catalog, local_redis_pair
+from fake_sheet import FakeWorksheet
+
+import catalog_index
+import redis_cache
+import sync_sheet_to_redis
+from redis_cache import snapshot
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=2000)
+    ap.add_argument("--no-revision", action="store_true")
+    args = ap.parse_args()
+
+    text, binary = local_redis_pair()
+    text.flushdb()
+    redis_cache.r, redis_cache.r_bin = text, binary
+    catalog_index.r = sync_sheet_to_redis.r = text
+
+    sheet = FakeWorksheet(HEADERS, fake_catalog(args.rows), with_revision=not args.no_revision)
+    snapshot.clear()
+    snapshot.check_interval = 3600      # только pub/sub
+    snapshot.subscribe(text)
+
+    price_col = HEADERS.index("Цена продажи") + 1
+    steps = [
+        ("first sync", lambda: None),
+        ("unchanged", lambda: None),
+        ("price edit", lambda: sheet.update_cell(5, price_col, "999 $")),
+        ("new row", lambda: sheet.append_row(["Antminer S21 XP 270T", "Bitmain", "S21",
+                                              "новый", "270 TH/s", "3645 W", "7100 $"])),
+    ]
+    print(f"{'step':<12} | {'api calls':>9} {'cells':>8} | {'result':<30} | {'pub/sub ms':>10}")
+    for name, edit in steps:
+        edit()
+        sheet.reset_counters()
+        delta = sync_sheet_to_redis.sync(sheet)
+        published = time.perf_counter()
+        target = redis_cache.current_version()
+        seen_ms = "-"
+        if delta is not None:
+            while snapshot.stats()["version"] != target:
+                if time.perf_counter() - published > 5:
+                    break
+                time.sleep(0.0005)
+            else:
+                seen_ms = f"{(time.perf_counter() - published) * 1000:.1f}"
+        result = "skipped (fingerprint)" if delta is None else " ".join(
+            f"{k[0]}={v}" for k, v in delta.items())
+        calls = sum(sheet.calls.values())
+        print(f"{name:<12} | {calls:>9} {sheet.cells:>8} | {result:<30} | {seen_ms:>10}")
+
+    snapshot.unsubscribe()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Фейковый gspread.Worksheet для бенчмарков sync'а
+────────────────────────────────────────────────
+•  get / batch_get по A1-диапазонам ("A1:Z1", "A2:A10000", "A:A", "B2:BH5001")
+   отдают значения так же, как Sheets API: хвостовые пустые строки и ячейки
+   обрезаются;
+•  spreadsheet.get_lastUpdateTime() – «ревизия» таблицы, растёт на каждой
+   правке (with_revision=False – метаданных нет, sync уходит на пробный диапазон);
+•  calls / cells – сколько запросов к API и ячеек ушло бы в квоту;
+•  latency – искусственная задержка одного запроса, сек.
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+import re
+import time
+from collections import Counter
+from typing import Dict, List, Sequence
+
+_A1_RE = re.compile(r"^([A-Z]*)(\d*)$")
+
+
+def col_index(letters: str) -> int:
+    """'A' → 1, 'Z' → 26, 'AA' → 27."""
+    n = 0
+    for ch in letters:
+        n = n * 26 + ord(ch) - 64
+    return n
+
+
+class FakeSpreadsheet:
+    def __init__(self, owner: "FakeWorksheet", with_revision: bool) -> None:
+        self._owner = owner
+        self._with_revision = with_revision
+        self.modified = dt.datetime(2024, 1, 1)
+
+    def get_lastUpdateTime(self) -> str:
+        if not self._with_revision:
+            raise AttributeError("get_lastUpdateTime")
+        self._owner._request("meta", 0)
+        return self.modified.isoformat() + "Z"
+
+    def touch(self) -> None:
+        self.modified += dt.timedelta(seconds=1)
+
+
+class FakeWorksheet:
+    def __init__(self, headers: Sequence[str], records: Dict[int, Dict[str, str]],
+                 with_revision: bool = True, latency: float = 0.0) -> None:
+        self.latency = latency
+        self.calls: Counter = Counter()
+        self.cells = 0
+        self.spreadsheet = FakeSpreadsheet(self, with_revision)
+        self._grid: List[List[str]] = [list(headers)]
+        for row in sorted(records):
+            while len(self._grid) < row - 1:
+                self._grid.append([""] * len(headers))
+            self._grid.append([str(records[row].get(h, "")) for h in headers])
+
+    # размеры листа (в gspread – из метаданных листа)
+    @property
+    def row_count(self) -> int:
+        return len(self._grid)
+
+    @property
+    def col_count(self) -> int:
+        return max((len(r) for r in self._grid), default=0)
+
+    def reset_counters(self) -> None:
+        self.calls.clear()
+        self.cells = 0
+
+    def _request(self, kind: str, cells: int) -> None:
+        self.calls[kind] += 1
+        self.cells += cells
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _parse(self, a1: str) -> "tuple[int, int, int, int]":
+        start, _, end = a1.partition(":")
+        end = end or start
+        (c1, r1), (c2, r2) = (_A1_RE.match(part.upper()).groups() for part in (start, end))
+        return (int(r1) if r1 else 1, col_index(c1) if c1 else 1,
+                int(r2) if r2 else self.row_count, col_index(c2) if c2 else self.col_count)
+
+    def _values(self, a1: str) -> List[List[str]]:
+        r1, c1, r2, c2 = self._parse(a1)
+        out: List[List[str]] = []
+        for row in self._grid[r1 - 1:r2]:
+            cells = row[c1 - 1:c2]
+            while cells and cells[-1] == "":
+                cells.pop()
+            out.append(cells)
+        while out and not out[-1]:
+            out.pop()
+        return out
+
+    def get(self, range_name: str) -> List[List[str]]:
+        values = self._values(range_name)
+        self._request("get", sum(map(len, values)))
+        return values
+
+    def batch_get(self, ranges: Sequence[str]) -> List[List[List[str]]]:
+        out = [self._values(a1) for a1 in ranges]
+        self._request("batch_get", sum(len(c) for v in out for c in v))
+        return out
+
+    # правки «пользователя» – без учёта в квоте
+    def update_cell(self, row: int, col: int, value: str) -> None:
+        while len(self._grid) < row:
+            self._grid.append([])
+        cells = self._grid[row - 1]
+        cells.extend([""] * (col - len(cells)))
+        cells[col - 1] = str(value)
+        self.spreadsheet.touch()
+
+    def append_row(self, values: Sequence[str]) -> None:
+        self._grid.append([str(v) for v in values])
+        self.spreadsheet.touch()
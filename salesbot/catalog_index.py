@@ -0,0 +1,423 @@
+"""
+Catalog-Index
+─────────────
+Вторичные индексы каталога в Redis, строятся в sync_sheet_to_redis.sync()
+из тех же записей и в той же версии (asic:v{n}:…), что и строки каталога.
+
+•  asic:v{n}:idx:{field}:{value}  – SET row'ов с данным значением поля
+•  asic:v{n}:idx:{field}          – HASH нормализованное значение → как в таблице
+•  asic:v{n}:facets               – JSON-дерево brand → series → condition → count
+•  asic:v{n}:rng:{field}          – ZSET row → число (цена $, хэшрейт TH/s, потребление W)
+•  asic:v{n}:search               – JSON {docs: {row: токены}, grams: {триграмма: [row]}}
+
+Читатели принимают version (по умолчанию – версия процессного снапшота),
+чтобы индекс и строки в одном ответе инструмента были из одной версии.
+
+Поиск по нескольким полям – одно SINTER на стороне Redis, подсчёт групп –
+одно чтение готового дерева фасетов, бюджет/хэшрейт – ZRANGEBYSCORE,
+название модели («вотсмайнер м50с») – триграммный индекс в памяти процесса.
+
+С CATALOG_BACKEND=sqlite / auto читатели отвечают из локального файла
+(catalog_sqlite.SqliteCatalog) с тем же контрактом.
+"""
+
+from __future__ import annotations
+
+import json
+import re
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from redis_cache import ar, local_catalog, r, snapshot, vkey
+
+# логическое имя фильтра → заголовок колонки в Google Sheet
+INDEX_FIELDS: Dict[str, str] = {
+    "brand": "Производитель",
+    "series": "Линейка",
+    "condition": "Состояние",
+}
+
+# числовое поле → возможные заголовки колонки (берётся первый найденный)
+RANGE_FIELDS: Dict[str, Tuple[str, ...]] = {
+    "price": ("Цена продажи", "Цена"),
+    "hashrate": ("Хэшрейт", "Хешрейт", "Hashrate"),
+    "power": ("Потребление", "Энергопотребление", "Power"),
+}
+
+# имена внутри версии: vkey(version, NAME)
+RNG_FMT = "rng:{field}"
+IDX_VALUES_FMT = "idx:{field}"
+IDX_FMT = "idx:{field}:{value}"
+FACETS = "facets"
+SEARCH = "search"
+
+# сленг → как пишут в таблице (после casefold)
+SLANG: Dict[str, str] = {
+    "вотсмайнер": "whatsminer", "ватсмайнер": "whatsminer", "вацмайнер": "whatsminer",
+    "вотс": "whatsminer", "ватс": "whatsminer", "вотсы": "whatsminer",
+    "антмайнер": "antminer", "антик": "antminer", "анты": "antminer",
+    "битмейн": "bitmain", "битмаин": "bitmain", "битман": "bitmain",
+    "авалон": "avalon", "канаан": "canaan", "айсривер": "iceriver", "госемайнер": "goldshell",
+    "голдшелл": "goldshell", "про": "pro", "плюс": "+", "гидро": "hydro", "хайдро": "hydro",
+}
+_TRANSLIT = str.maketrans({
+    "а": "a", "б": "b", "в": "v", "г": "g", "д": "d", "е": "e", "ж": "zh", "з": "z",
+    "и": "i", "й": "y", "к": "k", "л": "l", "м": "m", "н": "n", "о": "o", "п": "p",
+    "р": "r", "с": "s", "т": "t", "у": "u", "ф": "f", "х": "h", "ц": "c", "ч": "ch",
+    "ш": "sh", "щ": "sch", "ъ": "", "ы": "y", "ь": "", "э": "e", "ю": "yu", "я": "ya",
+})
+_TOKEN_RE = re.compile(r"[0-9a-zа-я+]+")
+# поля, по которым ищется модель (кроме колонки A)
+SEARCH_HEADERS: Tuple[str, ...] = ("Производитель", "Линейка")
+
+
+def norm(value: Any) -> str:
+    """«  WhatsMiner » → «whatsminer»; ё → е."""
+    return " ".join(str(value).casefold().replace("ё", "е").split())
+
+
+_NUM_RE = re.compile(r"\d{1,3}(?:[\s\u00a0]\d{3})+(?:[.,]\d+)?|\d+(?:[.,]\d+)*")
+# множитель к базовой единице: TH/s для хэшрейта (scrypt-модели вроде L7 –
+# в MH/s), W для потребления
+_UNITS = {
+    "hashrate": (("ph", 1000.0), ("gh", 0.001), ("mh", 1e-6), ("kh", 1e-9),
+                 ("th", 1.0), ("t", 1.0)),
+    "power": (("kw", 1000.0), ("квт", 1000.0), ("w", 1.0), ("вт", 1.0)),
+}
+
+
+def parse_number(raw: Any) -> Optional[float]:
+    """«1 250,50 $» → 1250.5, «$1,250» → 1250.0, «—» → None."""
+    m = _NUM_RE.search(str(raw))
+    if not m:
+        return None
+    num = re.sub(r"[\s\u00a0]", "", m.group(0))
+    if "," in num and "." not in num and re.fullmatch(r"\d{1,3}(,\d{3})+", num) is None:
+        num = num.replace(",", ".")
+    num = num.replace(",", "")
+    try:
+        return float(num)
+    except ValueError:
+        return None
+
+
+def parse_metric(field: str, raw: Any) -> Optional[float]:
+    """Число в базовой единице поля: «0.2 PH/s» → 200.0, «3.2 kW» → 3200.0."""
+    value = parse_number(raw)
+    if value is None:
+        return None
+    tail = norm(raw)[_NUM_RE.search(norm(raw)).end():].strip()
+    for unit, factor in _UNITS.get(field, ()):
+        if tail.startswith(unit):
+            return value * factor
+    return value
+
+
+def _range_header(data: Dict[str, Any], field: str) -> Optional[str]:
+    return next((h for h in RANGE_FIELDS[field] if h in data), None)
+
+
+def search_tokens(text: Any) -> List[str]:
+    """«Вотсмайнер М50С++» → ['whatsminer', 'm50s++']: сленг, затем транслит."""
+    return [SLANG.get(tok, tok).translate(_TRANSLIT) for tok in _TOKEN_RE.findall(norm(text))]
+
+
+def trigrams(token: str) -> List[str]:
+    padded = f" {token} "
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+
+def build_search(records: Dict[int, Dict[str, Any]]) -> Dict[str, Any]:
+    docs: Dict[str, List[str]] = {}
+    grams: Dict[str, List[int]] = {}
+    for row, data in records.items():
+        model = next(iter(data.values()), "")
+        tokens = list(dict.fromkeys(search_tokens(" ".join(
+            [str(model), *(str(data.get(h, "")) for h in SEARCH_HEADERS)]))))
+        docs[str(row)] = tokens
+        for gram in {g for tok in tokens for g in trigrams(tok)}:
+            grams.setdefault(gram, []).append(row)
+    return {"docs": docs, "grams": grams}
+
+
+def build_indexes(records: Dict[int, Dict[str, Any]], version: int) -> int:
+    """Пишет индексы ещё не опубликованной версии одной MULTI-транзакцией. Возвращает число SET-ключей."""
+    sets: Dict[str, List[int]] = {}
+    values: Dict[str, Dict[str, str]] = {field: {} for field in INDEX_FIELDS}
+    facets: Dict[str, Any] = {}
+    scores: Dict[str, Dict[int, float]] = {}
+    for row, data in records.items():
+        node = facets
+        path = [str(data.get(h, "")).strip() or "—" for h in INDEX_FIELDS.values()]
+        for value in path[:-1]:
+            node = node.setdefault(value, {})
+        node[path[-1]] = node.get(path[-1], 0) + 1
+        for field, header in INDEX_FIELDS.items():
+            raw = str(data.get(header, "")).strip()
+            if not raw:
+                continue
+            value = norm(raw)
+            values[field].setdefault(value, raw)
+            sets.setdefault(vkey(version, IDX_FMT.format(field=field, value=value)), []).append(row)
+        for field in RANGE_FIELDS:
+            header = _range_header(data, field)
+            score = parse_metric(field, data[header]) if header else None
+            if score is not None:
+                scores.setdefault(vkey(version, RNG_FMT.format(field=field)), {})[row] = score
+
+    pipe = r.pipeline()
+    for key, rows in sets.items():
+        pipe.sadd(key, *rows)
+    for key, mapping in scores.items():
+        pipe.zadd(key, mapping)
+    for field, mapping in values.items():
+        if mapping:
+            pipe.hset(vkey(version, IDX_VALUES_FMT.format(field=field)), mapping=mapping)
+    pipe.set(vkey(version, FACETS), json.dumps(facets, ensure_ascii=False))
+    pipe.set(vkey(version, SEARCH), json.dumps(build_search(records), ensure_ascii=False))
+    pipe.execute()
+    return len(sets)
+
+
+def _v(version: int | None) -> int | None:
+    return snapshot.version() if version is None else version
+
+
+async def _av(version: int | None) -> int | None:
+    return await snapshot.aversion() if version is None else version
+
+
+def index_values(field: str, version: int | None = None) -> List[str]:
+    """Все значения поля так, как они записаны в таблице."""
+    v = _v(version)
+    local = local_catalog(v)
+    if local is not None:
+        return local.index_values(field, v)
+    return sorted(r.hvals(vkey(v, IDX_VALUES_FMT.format(field=field)))) if v is not None else []
+
+
+async def aindex_values(field: str, version: int | None = None) -> List[str]:
+    v = await _av(version)
+    local = local_catalog(v)
+    if local is not None:
+        return local.index_values(field, v)
+    return sorted(await ar.hvals(vkey(v, IDX_VALUES_FMT.format(field=field)))) if v is not None else []
+
+
+def _filter_keys(version: int, filters: Dict[str, str | None]) -> List[str]:
+    return [
+        vkey(version, IDX_FMT.format(field=field, value=norm(value)))
+        for field, value in filters.items()
+        if value and field in INDEX_FIELDS
+    ]
+
+
+def filter_rows(version: int | None = None, **filters: str | None) -> List[int]:
+    """row'ы, у которых совпадают все заданные поля (SINTER)."""
+    v = _v(version)
+    local = local_catalog(v)
+    if local is not None:
+        return local.filter_rows(v, **filters)
+    keys = _filter_keys(v, filters) if v is not None else []
+    if not keys:
+        return []
+    return sorted(int(row) for row in r.sinter(keys))
+
+
+async def afilter_rows(version: int | None = None, **filters: str | None) -> List[int]:
+    v = await _av(version)
+    local = local_catalog(v)
+    if local is not None:
+        return local.filter_rows(v, **filters)
+    keys = _filter_keys(v, filters) if v is not None else []
+    if not keys:
+        return []
+    return sorted(int(row) for row in await ar.sinter(keys))
+
+
+def _facet_paths(node: Any, path: Tuple[str, ...] = ()) -> Iterator[Tuple[Tuple[str, ...], int]]:
+    if isinstance(node, dict):
+        for value, child in node.items():
+            yield from _facet_paths(child, path + (value,))
+    else:
+        yield path, node
+
+
+def _check_field(field: str, allowed: Iterable[str]) -> None:
+    if field not in allowed:
+        raise ValueError(f"field must be one of {list(allowed)}, got {field!r}")
+
+
+def _check_limit(limit: int) -> None:
+    if limit < 1:
+        raise ValueError(f"limit must be >= 1, got {limit}")
+
+
+def _count_facets(raw: str | None, field: str, filters: Dict[str, str] | None) -> Dict[str, Any]:
+    fields = list(INDEX_FIELDS)
+    wanted = {fields.index(f): norm(v) for f, v in (filters or {}).items() if v and f in fields}
+    pos = fields.index(field)
+
+    counts: Dict[str, int] = {}
+    for path, n in _facet_paths(json.loads(raw or "{}")):
+        if all(norm(path[i]) == v for i, v in wanted.items()):
+            counts[path[pos]] = counts.get(path[pos], 0) + n
+    ordered = dict(sorted(counts.items(), key=lambda kv: (-kv[1], kv[0])))
+    return {"field": field, "counts": ordered, "total": sum(ordered.values())}
+
+
+def group_counts(field: str, filters: Dict[str, str] | None = None,
+                 version: int | None = None) -> Dict[str, Any]:
+    """
+    Кол-во моделей по значениям `field` среди строк, подходящих под `filters`.
+    Считается по готовому дереву фасетов, строки каталога не читаются.
+    """
+    _check_field(field, INDEX_FIELDS)
+    v = _v(version)
+    local = local_catalog(v)
+    if local is not None:
+        return local.group_counts(field, filters, v)
+    return _count_facets(r.get(vkey(v, FACETS)) if v is not None else None, field, filters)
+
+
+async def agroup_counts(field: str, filters: Dict[str, str] | None = None,
+                        version: int | None = None) -> Dict[str, Any]:
+    _check_field(field, INDEX_FIELDS)
+    v = await _av(version)
+    local = local_catalog(v)
+    if local is not None:
+        return local.group_counts(field, filters, v)
+    return _count_facets(await ar.get(vkey(v, FACETS)) if v is not None else None, field, filters)
+
+
+def _range_args(version: int, field: str, min_value: float | None, max_value: float | None,
+                near: float | None, limit: int, filtered: bool) -> Dict[str, Any]:
+    """kwargs ZRANGEBYSCORE / ZREVRANGEBYSCORE (у обоих min/max по имени) для range_rows()."""
+    if near is not None:
+        min_value, max_value = near * 0.9, near * 1.1
+    lo = "-inf" if min_value is None else min_value
+    hi = "+inf" if max_value is None else max_value
+    page = None if filtered or near is not None else limit
+    return {"name": vkey(version, RNG_FMT.format(field=field)), "min": lo, "max": hi,
+            "start": 0 if page else None, "num": page, "withscores": True}
+
+
+def _range_finish(found: List[Tuple[str, float]], allowed: set | None,
+                  near: float | None, limit: int) -> List[Tuple[int, float]]:
+    out = [(int(row), score) for row, score in found
+           if allowed is None or int(row) in allowed]
+    if near is not None:
+        out.sort(key=lambda rs: abs(rs[1] - near))
+    return out[:limit]
+
+
+def range_rows(field: str,
+               min_value: float | None = None,
+               max_value: float | None = None,
+               near: float | None = None,
+               order: str = "asc",
+               limit: int = 10,
+               version: int | None = None,
+               **filters: str | None) -> List[Tuple[int, float]]:
+    """
+    [(row, значение)] из rng:{field}.
+    •  min/max – ZRANGEBYSCORE-диапазон;  near – окно ±10 % и сортировка по близости;
+    •  order=desc + limit – top-N («самые мощные»);  filters – как в filter_rows().
+    """
+    _check_field(field, RANGE_FIELDS)
+    _check_limit(limit)
+    v = _v(version)
+    local = local_catalog(v)
+    if local is not None:
+        return local.range_rows(field, min_value, max_value, near, order, limit, v, **filters)
+    if v is None:
+        return []
+    filtered = any(filters.values())
+    args = _range_args(v, field, min_value, max_value, near, limit, filtered)
+    allowed = set(filter_rows(v, **filters)) if filtered else None
+    query = r.zrevrangebyscore if order == "desc" else r.zrangebyscore
+    return _range_finish(query(**args), allowed, near, limit)
+
+
+async def arange_rows(field: str,
+                      min_value: float | None = None,
+                      max_value: float | None = None,
+                      near: float | None = None,
+                      order: str = "asc",
+                      limit: int = 10,
+                      version: int | None = None,
+                      **filters: str | None) -> List[Tuple[int, float]]:
+    _check_field(field, RANGE_FIELDS)
+    _check_limit(limit)
+    v = await _av(version)
+    local = local_catalog(v)
+    if local is not None:
+        return local.range_rows(field, min_value, max_value, near, order, limit, v, **filters)
+    if v is None:
+        return []
+    filtered = any(filters.values())
+    args = _range_args(v, field, min_value, max_value, near, limit, filtered)
+    allowed = set(await afilter_rows(v, **filters)) if filtered else None
+    query = ar.zrevrangebyscore if order == "desc" else ar.zrangebyscore
+    return _range_finish(await query(**args), allowed, near, limit)
+
+
+def _decode_search(raw: str | None) -> Dict[str, Any]:
+    index = json.loads(raw or '{"docs": {}, "grams": {}}')
+    index["docs"] = {int(row): set(tokens) for row, tokens in index["docs"].items()}
+    return index
+
+
+def _load_search(version: int | None) -> Dict[str, Any]:
+    return _decode_search(r.get(vkey(version, SEARCH)) if version is not None else None)
+
+
+async def _aload_search(version: int | None) -> Dict[str, Any]:
+    return _decode_search(await ar.get(vkey(version, SEARCH)) if version is not None else None)
+
+
+def _score(index: Dict[str, Any], tokens: List[str], limit: int,
+           min_score: float) -> List[Tuple[int, float]]:
+    q_grams = {g for tok in tokens for g in trigrams(tok)}
+
+    hits: Dict[int, int] = {}
+    for gram in q_grams:
+        for row in index["grams"].get(gram, ()):
+            hits[row] = hits.get(row, 0) + 1
+
+    scored = []
+    for row, n in hits.items():
+        exact = sum(tok in index["docs"].get(row, ()) for tok in tokens)
+        score = round(n / len(q_grams) + exact / len(tokens), 3)
+        if score >= min_score:
+            scored.append((row, score))
+    scored.sort(key=lambda rs: (-rs[1], rs[0]))
+    return scored[:limit]
+
+
+def search_rows(query: str, limit: int = 5, min_score: float = 0.4,
+                version: int | None = None) -> List[Tuple[int, float]]:
+    """
+    [(row, score)] по убыванию score:
+    доля совпавших триграмм запроса + бонус за токены, совпавшие целиком
+    (максимум 2.0). Строки со score < min_score отбрасываются.
+    """
+    v = _v(version)
+    local = local_catalog(v)
+    if local is not None:
+        return local.search_rows(query, limit, min_score, v)
+    tokens = search_tokens(query)
+    if not tokens:
+        return []
+    return _score(snapshot.memo("search", _load_search, v), tokens, limit, min_score)
+
+
+async def asearch_rows(query: str, limit: int = 5, min_score: float = 0.4,
+                       version: int | None = None) -> List[Tuple[int, float]]:
+    v = await _av(version)
+    local = local_catalog(v)
+    if local is not None:
+        return local.search_rows(query, limit, min_score, v)
+    tokens = search_tokens(query)
+    if not tokens:
+        return []
+    return _score(await snapshot.amemo("search", _aload_search, v), tokens, limit, min_score)
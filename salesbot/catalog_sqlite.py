@@ -0,0 +1,254 @@
+"""
+Catalog-SQLite
+──────────────
+Локальный снапшот опубликованной версии каталога в одном SQLite-файле.
+Пишется sync'ом рядом с Redis-версией, боты с CATALOG_BACKEND=sqlite читают
+его с диска – без сети и без Redis на холодном старте.
+
+•  rows      – row, модель, JSON строки, поля фильтров (как в таблице и norm()),
+               числовые price / hashrate / power в базовых единицах
+•  rows_fts  – FTS5 по search_tokens(модель + производитель + линейка);
+               токенайзер trigram (SQLite ≥ 3.34), иначе unicode61 + префиксы
+•  meta      – version, headers, fts
+
+Файл собирается во временном и подменяется os.replace – читатель видит
+либо старую версию, либо новую целиком. Читатель открывает его
+`mode=ro&immutable=1` с mmap и переоткрывает, когда у файла сменился
+inode / mtime; открытая раньше версия дочитывается из старого inode.
+Версия, которой нет в файле (ни текущей, ни предыдущей), не подменяется
+текущей – redis_cache.local_catalog(version) тогда уходит в Redis.
+
+Ответы совпадают с catalog_index (filter_rows, group_counts, range_rows,
+search_rows) – инструменты каталога не знают, какой backend под ними.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+from catalog_index import (
+    INDEX_FIELDS, RANGE_FIELDS,
+    _check_field, _range_header, norm, parse_metric, search_tokens, trigrams, SEARCH_HEADERS,
+)
+
+MMAP_BYTES = int(os.getenv("CATALOG_SQLITE_MMAP", str(256 * 2**20)))
+
+_INDEX_COLS = ", ".join(f"{f} TEXT, {f}_n TEXT" for f in INDEX_FIELDS)
+_RANGE_COLS = ", ".join(f"{f} REAL" for f in RANGE_FIELDS)
+
+_SCHEMA = f"""
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE rows (row INTEGER PRIMARY KEY, model TEXT, data TEXT, tokens TEXT,
+                   {_INDEX_COLS}, {_RANGE_COLS});
+""" + "".join(f"CREATE INDEX rows_{f} ON rows ({f}_n);\n" for f in INDEX_FIELDS) \
+    + "".join(f"CREATE INDEX rows_{f} ON rows ({f});\n" for f in RANGE_FIELDS)
+
+
+def _create_fts(db: sqlite3.Connection) -> str:
+    try:
+        db.execute("CREATE VIRTUAL TABLE rows_fts USING fts5(tokens, tokenize='trigram')")
+        return "trigram"
+    except sqlite3.OperationalError:
+        db.execute("CREATE VIRTUAL TABLE rows_fts USING fts5(tokens, prefix='2 3')")
+        return "unicode61"
+
+
+def write_catalog(headers: Sequence[str], records: Dict[int, Dict[str, Any]],
+                  version: int, path: str) -> None:
+    """Собирает снапшот версии во временном файле и атомарно подменяет `path`."""
+    tmp = f"{path}.{os.getpid()}.tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    db = sqlite3.connect(tmp)
+    try:
+        db.executescript(_SCHEMA)
+        fts = _create_fts(db)
+        cols = ["row", "model", "data", "tokens"]
+        cols += [c for f in INDEX_FIELDS for c in (f, f"{f}_n")] + list(RANGE_FIELDS)
+        insert = f"INSERT INTO rows ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))})"
+
+        def _rows():
+            for row, data in records.items():
+                model = str(next(iter(data.values()), ""))
+                tokens = " ".join(dict.fromkeys(search_tokens(" ".join(
+                    [model, *(str(data.get(h, "")) for h in SEARCH_HEADERS)]))))
+                values: List[Any] = [row, model, json.dumps(data, ensure_ascii=False), tokens]
+                for header in INDEX_FIELDS.values():
+                    raw = str(data.get(header, "")).strip()
+                    values += [raw, norm(raw) if raw else ""]
+                for field in RANGE_FIELDS:
+                    header = _range_header(data, field)
+                    values.append(parse_metric(field, data[header]) if header else None)
+                yield values
+
+        with db:
+            db.executemany(insert, _rows())
+            db.execute("INSERT INTO rows_fts (rowid, tokens) SELECT row, ' ' || tokens || ' ' FROM rows")
+            db.executemany("INSERT INTO meta VALUES (?, ?)", [
+                ("version", str(version)),
+                ("headers", json.dumps(list(headers), ensure_ascii=False)),
+                ("fts", fts),
+            ])
+        db.execute("VACUUM")
+    finally:
+        db.close()
+    os.replace(tmp, path)
+
+
+class SqliteCatalog:
+    """
+    Read-only доступ к снапшоту. Соединение своё у каждого потока; при
+    подмене файла предыдущее соединение живёт, пока читатели с явным
+    version той версии не закончат.
+    """
+
+    def __init__(self, path: str, mmap_bytes: int = MMAP_BYTES) -> None:
+        self.path = path
+        self.mmap_bytes = mmap_bytes
+        self._local = threading.local()
+
+    # ── соединения ─────────────────────────────────────────────────
+    def _open(self) -> Tuple[sqlite3.Connection, int | None, str]:
+        db = sqlite3.connect(f"file:{self.path}?mode=ro&immutable=1", uri=True,
+                             check_same_thread=False)
+        db.execute(f"PRAGMA mmap_size={self.mmap_bytes}")
+        meta = dict(db.execute("SELECT key, value FROM meta"))
+        version = int(meta["version"]) if meta.get("version") else None
+        return db, version, meta.get("fts", "unicode61")
+
+    def _db(self, version: int | None = None) -> Tuple[sqlite3.Connection | None, int | None, str]:
+        local = self._local
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None, None, ""
+        sig = (st.st_ino, st.st_mtime_ns)
+        if getattr(local, "sig", None) != sig:
+            prev = getattr(local, "cur", None)
+            if getattr(local, "prev", None) is not None:
+                local.prev[0].close()
+            local.prev, local.cur, local.sig = prev, self._open(), sig
+        if version is None or local.cur[1] == version:
+            return local.cur
+        if local.prev is not None and local.prev[1] == version:
+            return local.prev
+        return None, None, ""           # такой версии в файле нет – читать из Redis
+
+    def version(self) -> int | None:
+        return self._db()[1]
+
+    def holds(self, version: int) -> bool:
+        """Есть ли `version` в файле (текущая или только что подменённая)."""
+        return self._db(version)[0] is not None
+
+    # ── строки ─────────────────────────────────────────────────────
+    def load_rows(self, version: int | None = None) -> Dict[int, str]:
+        db = self._db(version)[0]
+        return dict(db.execute("SELECT row, model FROM rows ORDER BY row")) if db else {}
+
+    def load_rows_many(self, rows: Iterable[int], version: int | None = None) -> Dict[int, Dict[str, Any]]:
+        rows = list(dict.fromkeys(int(row) for row in rows))
+        db = self._db(version)[0]
+        found: Dict[int, Dict[str, Any]] = {}
+        if db and rows:
+            marks = ", ".join("?" * len(rows))
+            found = {row: json.loads(data) for row, data in
+                     db.execute(f"SELECT row, data FROM rows WHERE row IN ({marks})", rows)}
+        return {row: found.get(row, {}) for row in rows}
+
+    # ── индексы ────────────────────────────────────────────────────
+    @staticmethod
+    def _where(filters: Dict[str, str | None]) -> Tuple[List[str], List[str]]:
+        active = [(f, v) for f, v in filters.items() if v and f in INDEX_FIELDS]
+        return [f"{f}_n = ?" for f, _ in active], [norm(v) for _, v in active]
+
+    def index_values(self, field: str, version: int | None = None) -> List[str]:
+        _check_field(field, INDEX_FIELDS)
+        db = self._db(version)[0]
+        if db is None:
+            return []
+        sql = (f"SELECT {field} FROM rows WHERE row IN "
+               f"(SELECT MIN(row) FROM rows WHERE {field}_n != '' GROUP BY {field}_n)")
+        return sorted(value for (value,) in db.execute(sql))
+
+    def filter_rows(self, version: int | None = None, **filters: str | None) -> List[int]:
+        where, args = self._where(filters)
+        db = self._db(version)[0]
+        if db is None or not where:
+            return []
+        sql = f"SELECT row FROM rows WHERE {' AND '.join(where)} ORDER BY row"
+        return [row for (row,) in db.execute(sql, args)]
+
+    def group_counts(self, field: str, filters: Dict[str, str] | None = None,
+                     version: int | None = None) -> Dict[str, Any]:
+        _check_field(field, INDEX_FIELDS)
+        where, args = self._where(filters or {})
+        db = self._db(version)[0]
+        counts: Dict[str, int] = {}
+        if db is not None:
+            sql = (f"SELECT CASE {field} WHEN '' THEN '—' ELSE {field} END AS value, COUNT(*) "
+                   f"FROM rows {'WHERE ' + ' AND '.join(where) if where else ''} GROUP BY value")
+            counts = dict(db.execute(sql, args))
+        ordered = dict(sorted(counts.items(), key=lambda kv: (-kv[1], kv[0])))
+        return {"field": field, "counts": ordered, "total": sum(ordered.values())}
+
+    def range_rows(self, field: str,
+                   min_value: float | None = None,
+                   max_value: float | None = None,
+                   near: float | None = None,
+                   order: str = "asc",
+                   limit: int = 10,
+                   version: int | None = None,
+                   **filters: str | None) -> List[Tuple[int, float]]:
+        _check_field(field, RANGE_FIELDS)
+        db = self._db(version)[0]
+        if db is None:
+            return []
+        if near is not None:
+            min_value, max_value = near * 0.9, near * 1.1
+        where, args = self._where(filters)
+        where.append(f"{field} IS NOT NULL")
+        if min_value is not None:
+            where.append(f"{field} >= ?")
+            args.append(min_value)
+        if max_value is not None:
+            where.append(f"{field} <= ?")
+            args.append(max_value)
+        if near is not None:
+            rank, args = f"ABS({field} - ?), row", args + [near]
+        else:
+            rank = f"{field} {'DESC' if order == 'desc' else 'ASC'}, row"
+        sql = f"SELECT row, {field} FROM rows WHERE {' AND '.join(where)} ORDER BY {rank} LIMIT ?"
+        return [(row, value) for row, value in db.execute(sql, args + [limit])]
+
+    def search_rows(self, query: str, limit: int = 5, min_score: float = 0.4,
+                    version: int | None = None) -> List[Tuple[int, float]]:
+        """
+        Кандидаты – FTS5, score – та же формула, что в catalog_index.search_rows
+        (доля совпавших триграмм + бонус за целые токены).
+        """
+        tokens = search_tokens(query)
+        db, _, fts = self._db(version)
+        if db is None or not tokens:
+            return []
+        q_grams = {g for tok in tokens for g in trigrams(tok)}
+        if fts == "trigram":
+            match = " OR ".join(f'"{g}"' for g in q_grams)
+        else:
+            match = " OR ".join(f'"{tok}"*' for tok in tokens)
+        sql = ("SELECT rows.row, rows.tokens FROM rows_fts JOIN rows ON rows.row = rows_fts.rowid "
+               "WHERE rows_fts MATCH ? ORDER BY rank LIMIT ?")
+        scored = []
+        for row, doc in db.execute(sql, (match, max(limit * 20, 200))):
+            doc_tokens = set(doc.split())
+            doc_grams = {g for tok in doc_tokens for g in trigrams(tok)}
+            exact = sum(tok in doc_tokens for tok in tokens)
+            score = round(len(q_grams & doc_grams) / len(q_grams) + exact / len(tokens), 3)
+            if score >= min_score:
+                scored.append((row, score))
+        scored.sort(key=lambda rs: (-rs[1], rs[0]))
+        return scored[:limit]
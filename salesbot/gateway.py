@@ -0,0 +1,212 @@
+"""
+Gateway
+───────
+asyncio-сервер: много разговоров в одном процессе, оркестратор – через
+ainvoke (ожидание OpenAI / Redis не держит поток).
+
+Протокол – JSON-строки по TCP (одна строка – одно сообщение, UTF-8):
+    → {"session": "<id>", "message": "<текст>", "stream": true}
+    ← {"session": id, "token": "…"}                              (stream)
+    ← {"session": id, "output": "…", "latency_ms": …, "ttft_ms": …}
+    ← {"session": id, "error": "…"}
+    → {"cmd": "stats"}   ← {"sessions", "inflight", "turns": turn_report()}
+
+•  SessionRegistry – оркестратор на session id, создаётся при первом
+   сообщении; простаивающие дольше GATEWAY_IDLE_TTL сек. вытесняются,
+   сверх GATEWAY_MAX_SESSIONS – самые давние из свободных (без реплик
+   в работе или в очереди – Session.pending).
+•  На сессию – одна реплика одновременно (asyncio.Lock, очередь FIFO);
+   разные сессии идут параллельно, в том числе с одного соединения.
+•  GATEWAY_MAX_INFLIGHT – общий потолок одновременных реплик процесса.
+
+    python -m salesbot.gateway [--host 0.0.0.0] [--port 8765] [--mode dispatch]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict
+
+from salesbot.orchestrator import DEFAULT_MODE, MODES, arun_turn, build_orchestrator, turn_report
+
+log = logging.getLogger(__name__)
+
+IDLE_TTL = float(os.getenv("GATEWAY_IDLE_TTL", "1800"))
+MAX_SESSIONS = int(os.getenv("GATEWAY_MAX_SESSIONS", "5000"))
+MAX_INFLIGHT = int(os.getenv("GATEWAY_MAX_INFLIGHT", "500"))
+
+
+class Session:
+    __slots__ = ("id", "agent", "lock", "last_used", "turns", "pending")
+
+    def __init__(self, session_id: str, agent: Any) -> None:
+        self.id = session_id
+        self.agent = agent
+        self.lock = asyncio.Lock()
+        self.last_used = time.monotonic()
+        self.turns = 0
+        self.pending = 0                    # реплики в очереди lock + выполняемая
+
+
+class SessionRegistry:
+    """session id → Session; LRU по последнему обращению."""
+
+    def __init__(self, factory: Callable[[str], Any], idle_ttl: float = IDLE_TTL,
+                 max_sessions: int = MAX_SESSIONS) -> None:
+        self.factory = factory
+        self.idle_ttl = idle_ttl
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self.created = self.evicted = 0
+
+    def get(self, session_id: str) -> Session:
+        """Без await между проверкой и вставкой – две реплики новой сессии не создадут две."""
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = self._sessions[session_id] = Session(session_id, self.factory(session_id))
+            self.created += 1
+            self.evict(keep=session_id)
+        self._sessions.move_to_end(session_id)
+        session.last_used = time.monotonic()
+        return session
+
+    def evict(self, keep: str | None = None) -> None:
+        now = time.monotonic()
+        for sid, session in list(self._sessions.items()):
+            over = len(self._sessions) > self.max_sessions
+            if not over and now - session.last_used < self.idle_ttl:
+                break                       # дальше – только более свежие
+            # lock.locked() ложен в промежутке между репликами очереди – считаем pending
+            if sid == keep or session.pending:
+                continue
+            del self._sessions[sid]
+            self.evicted += 1
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+
+class Gateway:
+    def __init__(self, registry: SessionRegistry, max_inflight: int = MAX_INFLIGHT) -> None:
+        self.registry = registry
+        self.inflight = 0
+        self._slots = asyncio.Semaphore(max_inflight)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"sessions": len(self.registry), "created": self.registry.created,
+                "evicted": self.registry.evicted, "inflight": self.inflight,
+                "turns": turn_report()}
+
+    async def turn(self, session_id: str, message: str,
+                   on_token: Callable[[str], None] | None = None) -> Dict[str, Any]:
+        """Одна реплика сессии: ждёт свою очередь в сессии, затем слот процесса."""
+        session = self.registry.get(session_id)
+        t0 = time.perf_counter()
+        first: list = []
+
+        def _token(token: str) -> None:
+            if not first:
+                first.append(time.perf_counter())
+            if on_token:
+                on_token(token)
+
+        session.pending += 1
+        try:
+            async with session.lock, self._slots:
+                self.inflight += 1
+                try:
+                    output = await arun_turn(session.agent, message, on_token=_token)
+                finally:
+                    self.inflight -= 1
+                    session.turns += 1
+                    session.last_used = time.monotonic()
+        finally:
+            session.pending -= 1
+        out = {"session": session_id, "output": output,
+               "latency_ms": round((time.perf_counter() - t0) * 1000, 1)}
+        if first:
+            out["ttft_ms"] = round((first[0] - t0) * 1000, 1)
+        return out
+
+    # ── TCP / JSON-lines ─────────────────────────────────────────────
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        def send(obj: Dict[str, Any]) -> None:
+            # строка пишется целиком без await – токены разных сессий не перемешаются
+            writer.write((json.dumps(obj, ensure_ascii=False) + "\n").encode())
+
+        async def _serve(req: Dict[str, Any]) -> None:
+            sid = str(req.get("session") or "")
+            try:
+                if not sid or not isinstance(req.get("message"), str):
+                    raise ValueError("expected {session, message}")
+                # токены пишутся из потока event loop'а (FinalAnswerStreamer.run_inline)
+                on_token = (lambda t: send({"session": sid, "token": t})) if req.get("stream") else None
+                send(await self.turn(sid, req["message"], on_token))
+            except Exception as e:
+                log.exception("turn failed: session=%s", sid)
+                send({"session": sid, "error": str(e)})
+            await writer.drain()
+
+        tasks: set = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    req = json.loads(line)
+                except ValueError:
+                    send({"error": "invalid json"})
+                    continue
+                if req.get("cmd") == "stats":
+                    send(self.stats())
+                    continue
+                task = asyncio.create_task(_serve(req))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            writer.close()
+
+    async def serve(self, host: str, port: int) -> asyncio.AbstractServer:
+        return await asyncio.start_server(self.handle, host, port, limit=1 << 20)
+
+
+async def _janitor(registry: SessionRegistry, every: float) -> None:
+    while True:
+        await asyncio.sleep(every)
+        registry.evict()
+
+
+async def main_async(host: str, port: int, mode: str) -> None:
+    registry = SessionRegistry(lambda sid: build_orchestrator(sid, mode=mode))
+    gateway = Gateway(registry)
+    server = await gateway.serve(host, port)
+    janitor = asyncio.create_task(_janitor(registry, min(IDLE_TTL, 60.0)))
+    log.info("gateway listening on %s:%s (mode=%s)", host, port, mode)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        janitor.cancel()
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="asyncio-gateway для ASIC-бота")
+    ap.add_argument("--host", default=os.getenv("GATEWAY_HOST", "0.0.0.0"))
+    ap.add_argument("--port", type=int, default=int(os.getenv("GATEWAY_PORT", "8765")))
+    ap.add_argument("--mode", choices=MODES, default=DEFAULT_MODE)
+    args = ap.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    asyncio.run(main_async(args.host, args.port, args.mode))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""
+LLM-Cache
+─────────
+Точный кэш ответов модели в Redis для детерминированных вызовов
+(temperature=0): одинаковые модель + параметры + отрендеренные сообщения →
+тот же ответ без нового completion'а.
+
+•  Ключ – llm:cache:{ns}:{hash(llm_string)}:{hash(messages)}; llm_string –
+   сериализация модели и её параметров от LangChain (model, temperature, stop …).
+•  TTL – LLM_CACHE_TTL сек. с момента записи (по умолчанию сутки).
+•  LRU – ZSET llm:cache:{ns}:lru «ключ → последнее обращение»; при записи
+   сверх LLM_CACHE_MAX записей вытесняются самые давние.
+•  Включается по sub-агенту: cached_llm(llm, "intent") даёт копию модели с
+   кэшем; список агентов – LLM_CACHE_AGENTS (по умолчанию только intent).
+
+Счётчики попаданий – cache_stats / cache_report() (на процесс);
+counting() – попадания только вызовов внутри блока (одной реплики).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, Optional, Sequence
+
+from langchain_core.caches import BaseCache
+from langchain_core.load import dumps, loads
+from langchain_core.outputs import Generation
+
+from redis_cache import ar, r
+
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", "86400"))
+LLM_CACHE_MAX = int(os.getenv("LLM_CACHE_MAX", "10000"))
+# sub-агенты, чьи вызовы кэшируются: "intent,presentation" / "" – никто
+LLM_CACHE_AGENTS = frozenset(
+    a.strip() for a in os.getenv("LLM_CACHE_AGENTS", "intent").split(",") if a.strip())
+
+KEY_ENTRY_FMT = "llm:cache:{ns}:{model}:{prompt}"
+KEY_LRU_FMT = "llm:cache:{ns}:lru"
+
+# namespace → {hits, misses}
+cache_stats: Dict[str, Counter] = {}
+# {hits, misses} текущей реплики – см. counting()
+_scoped: ContextVar[Counter | None] = ContextVar("llm_cache_scope", default=None)
+
+
+def _digest(text: str) -> str:
+    return hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+
+
+class RedisCompletionCache(BaseCache):
+    """BaseCache LangChain'а поверх Redis: TTL на запись + LRU по числу записей."""
+
+    def __init__(self, namespace: str = "default", ttl: int = LLM_CACHE_TTL,
+                 max_entries: int = LLM_CACHE_MAX, client: Any = None, aclient: Any = None) -> None:
+        self.namespace = namespace
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.r = client if client is not None else r
+        self.ar = aclient if aclient is not None else ar
+        self.lru_key = KEY_LRU_FMT.format(ns=namespace)
+        self.stats = cache_stats.setdefault(namespace, Counter())
+
+    def _key(self, prompt: str, llm_string: str) -> str:
+        return KEY_ENTRY_FMT.format(ns=self.namespace, model=_digest(llm_string)[:12],
+                                    prompt=_digest(prompt))
+
+    def _count(self, raw: Any) -> Optional[Sequence[Generation]]:
+        outcome = "misses" if raw is None else "hits"
+        self.stats[outcome] += 1
+        scoped = _scoped.get()
+        if scoped is not None:
+            scoped[outcome] += 1
+        return None if raw is None else loads(raw)
+
+    # ── sync ─────────────────────────────────────────────────────────
+    def lookup(self, prompt: str, llm_string: str) -> Optional[Sequence[Generation]]:
+        key = self._key(prompt, llm_string)
+        pipe = self.r.pipeline(transaction=False)
+        pipe.get(key)
+        pipe.zadd(self.lru_key, {key: time.time()}, xx=True)     # touch, только если есть
+        raw, _ = pipe.execute()
+        return self._count(raw)
+
+    def update(self, prompt: str, llm_string: str, return_val: Sequence[Generation]) -> None:
+        key = self._key(prompt, llm_string)
+        now = time.time()
+        pipe = self.r.pipeline()
+        pipe.set(key, dumps(list(return_val)), ex=self.ttl)
+        pipe.zadd(self.lru_key, {key: now})
+        # записи старше TTL уже истекли – убираем их из LRU
+        pipe.zremrangebyscore(self.lru_key, "-inf", now - self.ttl)
+        pipe.zcard(self.lru_key)
+        size = pipe.execute()[-1]
+        if size > self.max_entries:
+            self._evict(size - self.max_entries)
+
+    def _evict(self, n: int) -> None:
+        victims = [k for k, _ in self.r.zpopmin(self.lru_key, n)]
+        if victims:
+            self.r.delete(*victims)
+            self.stats["evicted"] += len(victims)
+
+    def clear(self, **kwargs: Any) -> None:
+        keys = self.r.zrange(self.lru_key, 0, -1)
+        for i in range(0, len(keys), 500):
+            self.r.delete(*keys[i:i + 500])
+        self.r.delete(self.lru_key)
+
+    # ── async ────────────────────────────────────────────────────────
+    async def alookup(self, prompt: str, llm_string: str) -> Optional[Sequence[Generation]]:
+        key = self._key(prompt, llm_string)
+        pipe = self.ar.pipeline(transaction=False)
+        pipe.get(key)
+        pipe.zadd(self.lru_key, {key: time.time()}, xx=True)
+        raw, _ = await pipe.execute()
+        return self._count(raw)
+
+    async def aupdate(self, prompt: str, llm_string: str, return_val: Sequence[Generation]) -> None:
+        key = self._key(prompt, llm_string)
+        now = time.time()
+        pipe = self.ar.pipeline()
+        pipe.set(key, dumps(list(return_val)), ex=self.ttl)
+        pipe.zadd(self.lru_key, {key: now})
+        pipe.zremrangebyscore(self.lru_key, "-inf", now - self.ttl)
+        pipe.zcard(self.lru_key)
+        size = (await pipe.execute())[-1]
+        if size > self.max_entries:
+            victims = [k for k, _ in await self.ar.zpopmin(self.lru_key, size - self.max_entries)]
+            if victims:
+                await self.ar.delete(*victims)
+                self.stats["evicted"] += len(victims)
+
+
+def cached_llm(llm: Any, agent: str, force: bool = False) -> Any:
+    """
+    Копия модели с RedisCompletionCache(namespace=agent), если агент есть в
+    LLM_CACHE_AGENTS (или force) и модель детерминирована; иначе – llm как есть.
+    Колбэки (счётчик LLM-вызовов оркестратора) копия сохраняет.
+    """
+    if not (force or agent in LLM_CACHE_AGENTS):
+        return llm
+    if getattr(llm, "temperature", 0) not in (0, 0.0, None):
+        return llm
+    return llm.model_copy(update={"cache": RedisCompletionCache(agent)})
+
+
+@contextmanager
+def counting() -> Iterator[Counter]:
+    """
+    {hits, misses} только вызовов внутри блока (и порождённых им задач /
+    потоков – контекст копируется); параллельные реплики не смешиваются.
+    """
+    scoped: Counter = Counter()
+    token = _scoped.set(scoped)
+    try:
+        yield scoped
+    finally:
+        _scoped.reset(token)
+
+
+def cache_report() -> Dict[str, Dict[str, Any]]:
+    """{agent: {hits, misses, evicted, hit_rate}}."""
+    out = {}
+    for ns, st in cache_stats.items():
+        total = st["hits"] + st["misses"]
+        out[ns] = {"hits": st["hits"], "misses": st["misses"], "evicted": st["evicted"],
+                   "hit_rate": round(st["hits"] / total, 3) if total else 0.0}
+    return out
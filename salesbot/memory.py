@@ -4,11 +4,18 @@ from langchain.memory import CombinedMemory, ConversationBufferMemory
 from langchain.memory import ConversationEntityMemory
 from langchain_openai import ChatOpenAI
 
-def build_shared(session_id: str | None = None) -> Tuple[CombinedMemory, ChatOpenAI]:
-    if not session_id:
-        session_id = str(uuid.uuid4())
-    llm = ChatOpenAI(model_name="gpt-4o-mini", temperature=0)
+def build_llm() -> ChatOpenAI:
+    return ChatOpenAI(model_name="gpt-4o-mini", temperature=0)
 
+def build_memory(llm: ChatOpenAI) -> CombinedMemory:
+    """Память одной сессии; llm (для EntityMemory) – общий на процесс."""
     buf = ConversationBufferMemory(return_messages=True, memory_key="chat_history")
     ent = ConversationEntityMemory(llm=llm, k=30)   # name, phone, model…
-    return CombinedMemory(memories=[buf, ent]), llm
+    return CombinedMemory(memories=[buf, ent])
+
+def build_shared(session_id: str | None = None,
+                 llm: ChatOpenAI | None = None) -> Tuple[CombinedMemory, ChatOpenAI]:
+    if not session_id:
+        session_id = str(uuid.uuid4())
+    llm = llm or build_llm()
+    return build_memory(llm), llm
@@ -6,16 +6,42 @@ Sales-Orchestrator
     (последние 3 реплики + все сущности) и передаёт в sub-агенте.
 •  Catalog-Agent пользуется Redis-инструментами list_all_products / store_mapping /
     get_fields_by_index согласно ReAct-алгоритму.
+
+Режимы (build_orchestrator(mode=…) / ORCHESTRATOR_MODE):
+•  react    – ReAct-агент сам вызывает classify_intent и выбирает sub-агента
+               (минимум 3 LLM-вызова на реплику: Thought → Action → Final Answer).
+•  dispatch – intent.classify() один раз, маршрут по intent – в коде (routes);
+               LLM-склейка только для greeting/other и «сырых» черновиков.
+run_turn() меряет обе: LLM-вызовы и латентность на реплику (turn_report()).
+
+Стриминг: run_turn(agent, msg, on_token=…) отдаёт токены финального ответа,
+как только финальный шаг начал генерацию (ReAct – после маркера
+«Final Answer:», Thought/Action клиенту не уходят); time-to-first-token
+пишется отдельно от полной латентности.
+
+Сессия – только память: prompt'ы, инструменты и executor'ы sub-агентов
+(SharedAgents) строятся один раз на процесс и получают CombinedMemory
+сессии при вызове; session_id для инструментов каталога – session_scope().
 """
 
 from __future__ import annotations
 
 # ── std & 3-rd ───────────────────────────────────────────────────────
-from typing import List
+import json
+import os
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, NamedTuple
+from uuid import UUID
 from langchain_openai import ChatOpenAI
 from langchain.agents import create_react_agent, AgentExecutor
 from langchain.tools import Tool
-from langchain_core.prompts import PromptTemplate
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder, PromptTemplate
 from langchain.memory import (
     CombinedMemory,
     ConversationBufferMemory,
@@ -23,10 +49,22 @@ from langchain.memory import (
 )
 
 # ── local ────────────────────────────────────────────────────────────
-from salesbot.memory import build_shared
-from salesbot.tools_catalog import catalog_tools
+from salesbot.memory import build_llm, build_memory
+from salesbot.llm_cache import cached_llm, counting
+from salesbot.answer_cache import ENTITY_KEYS, acached_draft, cached_draft
+from salesbot.tools_catalog import session_scope
 from salesbot.subagents import catalog, objections, presentation, schedule_call, intent
-from salesbot.subagents.output_parser import FixingOutputParser
+from salesbot.subagents import intent_rules
+from salesbot.subagents.output_parser import FINAL_ANSWER, FixingOutputParser
+
+
+MODES = ("react", "dispatch")
+DEFAULT_MODE = os.getenv("ORCHESTRATOR_MODE", "react")
+# строка с сущностями классификатора, которую dispatch дописывает к вопросу
+ENTITIES_HINT = "\nСущности: "
+# теги LLM-вызовов, чьи токены может получить клиент (см. FinalAnswerStreamer)
+STREAM_REACT = "stream:react"       # шаг ReAct: токены только после FINAL_ANSWER
+STREAM_PLAIN = "stream:plain"       # весь вывод – ответ клиенту
 
 
 # ═════════════════════════════════════════════════════════════════════
@@ -55,70 +93,360 @@ def _make_catalog_memory(full_mem: CombinedMemory, llm: ChatOpenAI, window: int
     return CombinedMemory(memories=[win_buf, ent_full])
 
 
-def _wrap_subagent(name: str, exe: AgentExecutor, descr: str) -> Tool:
+# ── сессия текущего вызова ───────────────────────────────────────────
+class SessionState(NamedTuple):
+    session_id: str
+    memory: CombinedMemory
+    # sub-агенты пишут свой вопрос / черновик в память (react); dispatch сам
+    # сохраняет реплику клиента и итоговый ответ
+    record: bool = True
+
+
+# executor'ы и инструменты общие на процесс; память и session_id сессии
+# выставляет её оркестратор на время invoke / ainvoke
+_current: ContextVar[SessionState] = ContextVar("orchestrator_session")
+
+
+def _invoke_with(exe: Any, memory: CombinedMemory, message: str,
+                 extra: Dict[str, Any] | None = None, config: Any = None,
+                 save: bool = True) -> Dict[str, Any]:
+    """exe.invoke с переменными памяти сессии; save – реплика сохраняется в ту же память."""
+    inputs = {"input": message}
+    result = exe.invoke({**memory.load_memory_variables(inputs), **(extra or {}), **inputs},
+                        config=config)
+    if save:
+        memory.save_context(inputs, {"output": result["output"]})
+    return result
+
+
+async def _ainvoke_with(exe: Any, memory: CombinedMemory, message: str,
+                        extra: Dict[str, Any] | None = None, config: Any = None,
+                        save: bool = True) -> Dict[str, Any]:
+    inputs = {"input": message}
+    variables = await memory.aload_memory_variables(inputs)
+    result = await exe.ainvoke({**variables, **(extra or {}), **inputs}, config=config)
+    if save:
+        await memory.asave_context(inputs, {"output": result["output"]})
+    return result
+
+
+class Route(NamedTuple):
+    """Вызов sub-агента на вопрос: call – синхронно, acall – для ainvoke (gateway)."""
+    call: Callable[[str], str]
+    acall: Callable[[str], Awaitable[str]]
+
+
+def _exe_route(exe: AgentExecutor) -> Route:
+    """Sub-агент без своей памяти: история – из памяти текущей сессии."""
+    def _call(q: str) -> str:
+        state = _current.get()
+        return _invoke_with(exe, state.memory, q, save=state.record)["output"]
+
+    async def _acall(q: str) -> str:
+        state = _current.get()
+        return (await _ainvoke_with(exe, state.memory, q, save=state.record))["output"]
+
+    return Route(_call, _acall)
+
+
+def _wrap_subagent(name: str, route: Route, descr: str) -> Tool:
     """Обычный обёртка-Tool для «статических» sub-агентов."""
     return Tool(
         name=name,
         description=descr,
-        func=lambda q: exe.invoke({"input": q})["output"],
+        func=route.call,
+        coroutine=route.acall,
     )
 
 
-def _wrap_catalog(memory: CombinedMemory, llm: ChatOpenAI) -> Tool:
+def _wrap_intent(exe: AgentExecutor) -> Tool:
+    """classify_intent: сначала правила intent_rules, LLM – только если они не уверены."""
+    async def _acall(q: str) -> str:
+        return json.dumps(await intent.aclassify(q, exe), ensure_ascii=False)
+
+    return Tool(
+        name="classify_intent",
+        description="Определяет intent и сущности",
+        func=lambda q: json.dumps(intent.classify(q, exe), ensure_ascii=False),
+        coroutine=_acall,
+    )
+
+
+def _catalog_route(llm: ChatOpenAI) -> Route:
     """
-    Специальный wrapper для Catalog-Agent.
-    Каждый вызов:
-    1. создаёт контекст-память с узким окном
-    2. строит новый Executor (легко, он lightweight)
-    3. передаёт tools/tool_names в prompt (для {tools} placeholder)
+    Вызов Catalog-Agent на один вопрос:
+    1. создаёт контекст-память с узким окном из памяти текущей сессии
+    2. executor и tools/tool_names (для {tools} placeholder) – общие на процесс
+    3. index→row mapping хранится в Redis под session_id (session_scope → store_mapping).
+    Самостоятельные каталожные вопросы идут через answer_cache (ключ –
+    вопрос + сущности + версия каталога).
     """
-    cat_tools = catalog_tools()
-    tool_names = [t.name for t in cat_tools]
+    cat_exec = catalog.build(None, cached_llm(llm, "catalog"))
+    extra = {"tools": cat_exec.tools, "tool_names": [t.name for t in cat_exec.tools]}
+
+    def _cacheable(q: str) -> "tuple[str, Dict[str, Any]] | None":
+        question, _, hint = q.partition(ENTITIES_HINT)
+        if intent_rules.classify(question)["intent"] != "catalog_query":
+            # «а бу?», «2» – ответ зависит от контекста сессии, не кэшируем
+            return None
+        entities = intent_rules.catalog_entities(question)
+        try:
+            entities.update({k: v for k, v in json.loads(hint or "{}").items()
+                             if k in ENTITY_KEYS and v})
+        except (ValueError, AttributeError):
+            pass
+        # без brand / model («цена?», «сколько стоит 3?») cached_draft сразу зовёт агента
+        return question, entities
 
     def _call(q: str) -> str:
-        cat_mem = _make_catalog_memory(memory, llm)
-        cat_exec = catalog.build(cat_mem, llm)
-
-        result = cat_exec.invoke(
-            {
-                "input": q,
-                "tools": cat_tools,
-                "tool_names": tool_names,
-            }
-        )
-        return result["output"]
+        state = _current.get()
 
+        def run() -> str:
+            cat_mem = _make_catalog_memory(state.memory, llm)
+            with session_scope(state.session_id):
+                return _invoke_with(cat_exec, cat_mem, q, extra, save=state.record)["output"]
+
+        key = _cacheable(q)
+        return run() if key is None else cached_draft(*key, state.session_id, run)
+
+    async def _acall(q: str) -> str:
+        state = _current.get()
+
+        async def run() -> str:
+            cat_mem = _make_catalog_memory(state.memory, llm)
+            with session_scope(state.session_id):
+                return (await _ainvoke_with(cat_exec, cat_mem, q, extra,
+                                            save=state.record))["output"]
+
+        key = _cacheable(q)
+        return await run() if key is None else await acached_draft(*key, state.session_id, run)
+
+    return Route(_call, _acall)
+
+
+def _wrap_catalog(route: Route) -> Tool:
+    """Специальный wrapper для Catalog-Agent (см. _catalog_route)."""
     return Tool(
         name="catalog_agent",
         description="Отвечает на вопросы о моделях, ценах, брендах ASIC",
-        func=_call,
+        func=route.call,
+        coroutine=route.acall,
     )
 
 
 # ═════════════════════════════════════════════════════════════════════
-# build orchestrator
+# метрики: LLM-вызовы и латентность на реплику
 # ═════════════════════════════════════════════════════════════════════
-def build_orchestrator(session_id: str | None = None) -> AgentExecutor:
-    # ── shared memory & llm ──────────────────────────────────────────
-    shared_mem, llm = build_shared(session_id)
-
-    # ── sub-executors (кроме каталога) ───────────────────────────────
-    obj_exe = objections.build(shared_mem, llm)
-    pre_exe = presentation.build(shared_mem, llm)
-    call_exe = schedule_call.build(shared_mem, llm)
-    nlp_exe = intent.build(shared_mem, llm)
-
-    # ── Tools list ──────────────────────────────────────────────────
-    tools: List[Tool] = [
-        _wrap_catalog(shared_mem, llm),
-        _wrap_subagent("objection_agent",   obj_exe, "Работа с возражениями"),
-        _wrap_subagent("presentation_agent", pre_exe, "Презентация компании"),
-        _wrap_subagent("schedule_call",     call_exe, "Согласование звонка"),
-        _wrap_subagent("classify_intent",   nlp_exe, "Определяет intent и сущности"),
-    ]
-
-    # ── главный ReAct-Prompt ─────────────────────────────────────────
-    TEMPLATE = """
+class LLMCallCounter(BaseCallbackHandler):
+    """
+    Считает обращения к модели (вешается в llm.callbacks – видит и sub-агентов).
+    calls – всего на процесс; turn() – счётчик одной реплики в ContextVar,
+    так что параллельные реплики gateway'я не попадают друг другу в счёт.
+    Попадания в llm_cache тоже проходят через on_*_start – run_turn их вычитает.
+    """
+
+    run_inline = True       # в async-цепочках – в потоке event loop'а, без гонок
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self._turn: ContextVar[Counter | None] = ContextVar("llm_calls_turn", default=None)
+
+    @contextmanager
+    def turn(self) -> Iterator[Counter]:
+        counter: Counter = Counter()
+        token = self._turn.set(counter)
+        try:
+            yield counter
+        finally:
+            self._turn.reset(token)
+
+    def _hit(self) -> None:
+        self.calls += 1
+        counter = self._turn.get()
+        if counter is not None:
+            counter["calls"] += 1
+
+    def on_llm_start(self, serialized: Dict[str, Any], prompts: List[str], **kwargs: Any) -> None:
+        self._hit()
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: List[Any], **kwargs: Any) -> None:
+        self._hit()
+
+
+llm_calls = LLMCallCounter()
+# mode → {turns, llm_calls, latency_ms} (см. turn_report)
+turn_stats: Dict[str, Dict[str, float]] = {}
+
+
+def _streaming(llm: ChatOpenAI, tag: str) -> Any:
+    """Копия модели, которая генерирует потоком и помечает свои вызовы тегом `tag`."""
+    if "streaming" in type(llm).model_fields:
+        llm = llm.model_copy(update={"streaming": True})
+    return llm.with_config(tags=[tag])
+
+
+class FinalAnswerStreamer(BaseCallbackHandler):
+    """
+    Пересылает в sink токены финального ответа. Слушает только LLM-вызовы с
+    тегами STREAM_REACT / STREAM_PLAIN (sub-агенты молчат): для ReAct-шага
+    текст копится до FINAL_ANSWER – Thought / Action наружу не уходят.
+    first_token_at – perf_counter() первого отданного токена.
+    """
+
+    run_inline = True       # sink gateway'я пишет в asyncio.Queue – только из потока loop'а
+
+    def __init__(self, sink: Callable[[str], None]) -> None:
+        self.sink = sink
+        self.first_token_at: float | None = None
+        self._runs: Dict[UUID, Dict[str, Any]] = {}
+
+    @property
+    def emitted(self) -> bool:
+        return self.first_token_at is not None
+
+    def _start(self, run_id: UUID, tags: List[str] | None) -> None:
+        tags = tags or []
+        if STREAM_PLAIN in tags:
+            self._runs[run_id] = {"open": True, "buf": ""}
+        elif STREAM_REACT in tags:
+            self._runs[run_id] = {"open": False, "buf": ""}
+
+    def on_llm_start(self, serialized: Dict[str, Any], prompts: List[str], *, run_id: UUID,
+                     tags: List[str] | None = None, **kwargs: Any) -> None:
+        self._start(run_id, tags)
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: List[Any], *, run_id: UUID,
+                            tags: List[str] | None = None, **kwargs: Any) -> None:
+        self._start(run_id, tags)
+
+    def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs: Any) -> None:
+        run = self._runs.get(run_id)
+        if run is None:
+            return
+        if run["open"]:
+            self.emit(token)
+            return
+        run["buf"] += token
+        head, marker, tail = run["buf"].partition(FINAL_ANSWER)
+        if marker:
+            run["open"] = True
+            self.emit(tail)
+
+    def on_llm_end(self, response: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._runs.pop(run_id, None)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._runs.pop(run_id, None)
+
+    def emit(self, text: str) -> None:
+        if not self.emitted:
+            text = text.lstrip()
+            if not text:
+                return
+            self.first_token_at = time.perf_counter()
+        self.sink(text)
+
+
+def _record(mode: str, calls: int, t0: float, streamer: FinalAnswerStreamer | None) -> None:
+    st = turn_stats.setdefault(mode, {"turns": 0, "llm_calls": 0, "latency_ms": 0.0,
+                                      "streamed": 0, "ttft_ms": 0.0})
+    st["turns"] += 1
+    st["llm_calls"] += calls
+    st["latency_ms"] += (time.perf_counter() - t0) * 1000
+    if streamer and streamer.emitted:
+        st["streamed"] += 1
+        st["ttft_ms"] += (streamer.first_token_at - t0) * 1000
+
+
+def run_turn(agent: Any, message: str, on_token: Callable[[str], None] | None = None) -> str:
+    """
+    Одна реплика через оркестратор любого режима; пишет LLM-вызовы и время в
+    turn_stats. on_token – стриминг финального ответа (и ttft в статистике);
+    если финальный шаг не шёл потоком (ответ sub-агента как есть), ответ
+    отдаётся в on_token целиком.
+    """
+    streamer = FinalAnswerStreamer(on_token) if on_token else None
+    config = {"callbacks": [streamer]} if streamer else None
+    t0 = time.perf_counter()
+    with llm_calls.turn() as calls, counting() as cached:
+        try:
+            output = agent.invoke({"input": message}, config=config)["output"]
+            if streamer and not streamer.emitted:
+                streamer.emit(output)
+            return output
+        finally:
+            _record(getattr(agent, "mode", "react"), calls["calls"] - cached["hits"], t0, streamer)
+
+
+async def arun_turn(agent: Any, message: str, on_token: Callable[[str], None] | None = None) -> str:
+    """run_turn() через agent.ainvoke – для gateway."""
+    streamer = FinalAnswerStreamer(on_token) if on_token else None
+    config = {"callbacks": [streamer]} if streamer else None
+    t0 = time.perf_counter()
+    with llm_calls.turn() as calls, counting() as cached:
+        try:
+            output = (await agent.ainvoke({"input": message}, config=config))["output"]
+            if streamer and not streamer.emitted:
+                streamer.emit(output)
+            return output
+        finally:
+            _record(getattr(agent, "mode", "react"), calls["calls"] - cached["hits"], t0, streamer)
+
+
+def turn_report() -> Dict[str, Dict[str, float]]:
+    """
+    {mode: {turns, llm_calls_per_turn, avg_latency_ms[, avg_ttft_ms]}} – для
+    сравнения react / dispatch; ttft – по репликам со стримингом.
+    """
+    out = {}
+    for mode, st in turn_stats.items():
+        if not st["turns"]:
+            continue
+        out[mode] = {
+            "turns": st["turns"],
+            "llm_calls_per_turn": round(st["llm_calls"] / st["turns"], 2),
+            "avg_latency_ms": round(st["latency_ms"] / st["turns"], 1),
+        }
+        if st["streamed"]:
+            out[mode]["avg_ttft_ms"] = round(st["ttft_ms"] / st["streamed"], 1)
+    return out
+
+
+# ═════════════════════════════════════════════════════════════════════
+# dispatch-режим
+# ═════════════════════════════════════════════════════════════════════
+REPLY_PROMPT = ChatPromptTemplate.from_messages([
+    ("system",
+     "Ты — старший продавец ASIC-оборудования. Ответь клиенту дружелюбно и коротко, "
+     "на русском. Не выдумывай цены и наличие – если спрашивают про модели, "
+     "предложи уточнить бренд / модель / бюджет."),
+    MessagesPlaceholder("chat_history"),
+    ("human", "{input}"),
+])
+
+MERGE_PROMPT = ChatPromptTemplate.from_messages([
+    ("system",
+     "Ты — старший продавец ASIC-оборудования. Ниже черновик sub-агента для ответа "
+     "клиенту. Преврати его в финальный ответ: своё вступление/закрытие, без "
+     "служебных пометок и JSON, не добавляй фактов, которых нет в черновике."),
+    ("human", "Вопрос клиента: {input}\n\nЧерновик:\n{draft}"),
+])
+
+# признаки черновика, который нельзя отдавать клиенту как есть
+_RAW_MARKERS = ("Draft:", "Action:", "Observation:", "Agent stopped", FINAL_ANSWER)
+
+
+def _needs_merge(draft: str) -> bool:
+    """LLM-склейка нужна, только если черновик пустой или «сырой» (JSON / ReAct-следы)."""
+    text = (draft or "").strip()
+    return not text or text[0] in "{[" or any(m in text for m in _RAW_MARKERS)
+
+
+
+# ═════════════════════════════════════════════════════════════════════
+# общие агенты процесса
+# ═════════════════════════════════════════════════════════════════════
+REACT_TEMPLATE = """
 Ты — старший продавец ASIC-оборудования.
 
 1. Сначала вызови **classify_intent** чтобы определить намерение и сущности.
@@ -137,23 +465,220 @@ Question: {input}
 Thought:{agent_scratchpad}
 """.strip()
 
-    prompt = PromptTemplate(
-        template=TEMPLATE,
-        input_variables=["chat_history", "input", "agent_scratchpad"],
-    )
 
-    # ── ReAct-agent ─────────────────────────────────────────────────
-    react_agent = create_react_agent(
-        llm=llm,
-        tools=tools,
-        prompt=prompt,
-        output_parser=FixingOutputParser(),
-    )
+class SharedAgents:
+    """
+    Всё, что не зависит от сессии, – один раз на процесс: модель, prompt'ы,
+    executor'ы sub-агентов (без памяти), инструменты и ReAct-агент.
+    Сессия – только CombinedMemory + session_id (см. build_orchestrator).
+    """
 
-    return AgentExecutor(
-        agent=react_agent,
-        tools=tools,
-        memory=shared_mem,
-        verbose=True,
-        max_iterations=20,
-    )
+    def __init__(self, llm: ChatOpenAI) -> None:
+        if llm_calls not in (llm.callbacks or []):
+            llm.callbacks = [*(llm.callbacks or []), llm_calls]
+        self.llm = llm
+        self.final_llm = _streaming(llm, STREAM_PLAIN)     # ответ / склейка dispatch – потоком
+
+        # ── sub-executors; кэш ответов – по LLM_CACHE_AGENTS ──────────
+        self.nlp_exe = intent.build(None, cached_llm(llm, "intent"))
+        self.routes: Dict[str, Route] = {
+            "catalog_query": _catalog_route(llm),
+            "objection":     _exe_route(objections.build(None, cached_llm(llm, "objections"))),
+            "presentation":  _exe_route(presentation.build(None, cached_llm(llm, "presentation"))),
+            "schedule_call": _exe_route(schedule_call.build(None, cached_llm(llm, "schedule_call"))),
+        }
+
+        # ── Tools list ──────────────────────────────────────────────
+        tools: List[Tool] = [
+            _wrap_catalog(self.routes["catalog_query"]),
+            _wrap_subagent("objection_agent",    self.routes["objection"],     "Работа с возражениями"),
+            _wrap_subagent("presentation_agent", self.routes["presentation"],  "Презентация компании"),
+            _wrap_subagent("schedule_call",      self.routes["schedule_call"], "Согласование звонка"),
+            _wrap_intent(self.nlp_exe),
+        ]
+
+        # ── ReAct-agent ─────────────────────────────────────────────
+        prompt = PromptTemplate(
+            template=REACT_TEMPLATE,
+            input_variables=["chat_history", "input", "agent_scratchpad"],
+        )
+        react_agent = create_react_agent(
+            llm=_streaming(llm, STREAM_REACT),
+            tools=tools,
+            prompt=prompt,
+            output_parser=FixingOutputParser(),
+        )
+        self.react = AgentExecutor(
+            agent=react_agent,
+            tools=tools,
+            verbose=True,
+            max_iterations=20,
+        )
+
+
+_shared: Dict[int | None, SharedAgents] = {}
+_shared_lock = threading.Lock()
+
+
+def shared_agents(llm: ChatOpenAI | None = None) -> SharedAgents:
+    """SharedAgents процесса: на gpt-4o-mini по умолчанию или на переданной модели."""
+    key = None if llm is None else id(llm)
+    with _shared_lock:
+        agents = _shared.get(key)
+        if agents is None:
+            agents = _shared[key] = SharedAgents(llm or build_llm())
+        return agents
+
+
+# ═════════════════════════════════════════════════════════════════════
+# оркестраторы сессии
+# ═════════════════════════════════════════════════════════════════════
+class _SessionOrchestrator:
+    """Память и session_id одной сессии поверх SharedAgents."""
+
+    mode = "react"
+
+    def __init__(self, agents: SharedAgents, session_id: str, memory: CombinedMemory) -> None:
+        self.agents = agents
+        self.state = SessionState(session_id, memory)
+        self.memory = memory
+
+    @property
+    def session_id(self) -> str:
+        return self.state.session_id
+
+
+class ReactOrchestrator(_SessionOrchestrator):
+    """Общий ReAct-executor процесса с памятью этой сессии."""
+
+    def invoke(self, inputs: Dict[str, Any], config: Any = None) -> Dict[str, Any]:
+        token = _current.set(self.state)
+        try:
+            return _invoke_with(self.agents.react, self.memory, inputs["input"], config=config)
+        finally:
+            _current.reset(token)
+
+    async def ainvoke(self, inputs: Dict[str, Any], config: Any = None) -> Dict[str, Any]:
+        token = _current.set(self.state)
+        try:
+            return await _ainvoke_with(self.agents.react, self.memory, inputs["input"], config=config)
+        finally:
+            _current.reset(token)
+
+
+class DispatchOrchestrator(_SessionOrchestrator):
+    """
+    Оркестратор без ReAct-цикла: intent.classify() (правила, затем LLM) ровно
+    один раз, далее sub-агент по agents.routes. greeting/other – один LLM-ответ с
+    историей; черновик sub-агента отдаётся как есть, если не _needs_merge().
+
+    В память пишется реплика клиента как есть (без ENTITIES_HINT) и ответ,
+    который он получил (после склейки), – sub-агенты в dispatch не сохраняют.
+
+    invoke({"input": msg}) → {"input", "output", "intent", "entities", "merged"} –
+    совместимо с AgentExecutor для run_cli / run_turn; ainvoke – для gateway.
+    """
+
+    mode = "dispatch"
+
+    def __init__(self, agents: SharedAgents, session_id: str, memory: CombinedMemory) -> None:
+        super().__init__(agents, session_id, memory)
+        self.state = SessionState(session_id, memory, record=False)
+        self.buffer: ConversationBufferMemory = next(
+            m for m in memory.memories if isinstance(m, ConversationBufferMemory)
+        )
+        self.last: Dict[str, Any] | None = None    # результат последнего invoke (маршрут, merge)
+
+    def _history(self, window: int = 3) -> list:
+        return self.buffer.chat_memory.messages[-window * 2:]
+
+    def _reply_prompt(self, message: str) -> list:
+        return REPLY_PROMPT.format_messages(chat_history=self._history(), input=message)
+
+    @staticmethod
+    def _query(message: str, entities: Dict[str, Any]) -> str:
+        if not entities:
+            return message
+        return message + ENTITIES_HINT + json.dumps(entities, ensure_ascii=False)
+
+    def _finish(self, message: str, name: str, entities: Dict[str, Any], output: str,
+                merged: bool) -> Dict[str, Any]:
+        self.last = {"input": message, "output": output, "intent": name,
+                     "entities": entities, "merged": merged}
+        return self.last
+
+    def invoke(self, inputs: Dict[str, Any], config: Any = None) -> Dict[str, Any]:
+        """config – RunnableConfig (callbacks стримера); sub-агентам не передаётся."""
+        token = _current.set(self.state)
+        try:
+            return self._invoke(inputs["input"], config)
+        finally:
+            _current.reset(token)
+
+    async def ainvoke(self, inputs: Dict[str, Any], config: Any = None) -> Dict[str, Any]:
+        token = _current.set(self.state)
+        try:
+            return await self._ainvoke(inputs["input"], config)
+        finally:
+            _current.reset(token)
+
+    def _invoke(self, message: str, config: Any) -> Dict[str, Any]:
+        agents = self.agents
+        found = intent.classify(message, agents.nlp_exe)
+        name, entities = found.get("intent", "other"), found.get("entities") or {}
+        route = agents.routes.get(name)
+
+        if route is None:                       # greeting / other
+            output = agents.final_llm.invoke(self._reply_prompt(message), config=config).content
+            self.buffer.save_context({"input": message}, {"output": output})
+            return self._finish(message, name, entities, output, False)
+
+        output = route.call(self._query(message, entities))
+        merged = _needs_merge(output)
+        if merged:
+            prompt = MERGE_PROMPT.format_messages(input=message, draft=output)
+            output = agents.final_llm.invoke(prompt, config=config).content
+        # после sub-агента – во всю CombinedMemory (обновляются и сущности)
+        self.memory.save_context({"input": message}, {"output": output})
+        return self._finish(message, name, entities, output, merged)
+
+    async def _ainvoke(self, message: str, config: Any) -> Dict[str, Any]:
+        agents = self.agents
+        found = await intent.aclassify(message, agents.nlp_exe)
+        name, entities = found.get("intent", "other"), found.get("entities") or {}
+        route = agents.routes.get(name)
+
+        if route is None:
+            output = (await agents.final_llm.ainvoke(self._reply_prompt(message), config=config)).content
+            await self.buffer.asave_context({"input": message}, {"output": output})
+            return self._finish(message, name, entities, output, False)
+
+        output = await route.acall(self._query(message, entities))
+        merged = _needs_merge(output)
+        if merged:
+            prompt = MERGE_PROMPT.format_messages(input=message, draft=output)
+            output = (await agents.final_llm.ainvoke(prompt, config=config)).content
+        await self.memory.asave_context({"input": message}, {"output": output})
+        return self._finish(message, name, entities, output, merged)
+
+
+# ═════════════════════════════════════════════════════════════════════
+# build orchestrator
+# ═════════════════════════════════════════════════════════════════════
+def build_orchestrator(session_id: str | None = None, mode: str | None = None,
+                       llm: ChatOpenAI | None = None) -> _SessionOrchestrator:
+    """
+    mode: "react" (по умолчанию, ORCHESTRATOR_MODE) → ReactOrchestrator;
+          "dispatch" → DispatchOrchestrator; оба с invoke() / ainvoke().
+    Executor'ы общие на процесс (shared_agents), на сессию создаётся только память.
+    llm – своя модель вместо gpt-4o-mini (нагрузочные тесты с фейковой моделью).
+    """
+    mode = mode or DEFAULT_MODE
+    if mode not in MODES:
+        raise ValueError(f"unknown orchestrator mode {mode!r}, expected one of {MODES}")
+
+    session_id = session_id or str(uuid.uuid4())
+    agents = shared_agents(llm)
+    memory = build_memory(agents.llm)
+    cls = DispatchOrchestrator if mode == "dispatch" else ReactOrchestrator
+    return cls(agents, session_id, memory)
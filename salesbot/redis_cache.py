@@ -1,24 +1,749 @@
-import os, json, redis
-from typing import Dict, Any
+import os, json, time, hashlib, threading, redis
+import datetime as dt
+import redis.asyncio as aioredis
+from collections import OrderedDict
+from typing import Dict, Any, Awaitable, Callable, Iterable, List, Sequence, Tuple
 from dotenv import load_dotenv
 
+try:
+    import msgpack
+except ImportError:     # без msgpack packed-блоб кодируется компактным JSON
+    msgpack = None
+
 load_dotenv()
 r = redis.from_url(os.getenv("REDIS_URL"), decode_responses=True)
+r_bin = redis.from_url(os.getenv("REDIS_URL"))      # packed-блоб – байты
+
+# async-клиенты для корутинных инструментов: общий пул на процесс,
+# при исчерпании соединений корутина ждёт (Blocking), а не падает
+REDIS_POOL_SIZE = int(os.getenv("REDIS_POOL_SIZE", "50"))
+_apool = aioredis.BlockingConnectionPool.from_url(
+    os.getenv("REDIS_URL"), max_connections=REDIS_POOL_SIZE, decode_responses=True)
+_apool_bin = aioredis.BlockingConnectionPool.from_url(
+    os.getenv("REDIS_URL"), max_connections=max(REDIS_POOL_SIZE // 10, 2))
+ar = aioredis.Redis(connection_pool=_apool)
+ar_bin = aioredis.Redis(connection_pool=_apool_bin)
+
+# Каталог версионируется: каждый sync пишет asic:v{n}:…, в конце атомарно
+# переключается asic:current. Содержимое строк адресуется по digest'у и общее
+# для версий, поэтому новая версия пишет только изменённые строки.
+#
+#   asic:current              – номер опубликованной версии
+#   asic:v{n}:rows            – JSON {row: модель}
+#   asic:v{n}:hashes          – HASH row → digest
+#   asic:v{n}:format          – json | hash | packed
+#   asic:v{n}:packed          – колоночный блоб (только packed)
+#   asic:v{n}:idx:… / rng:… / facets / search – индексы (catalog_index.py)
+#   asic:blob:{fmt}:{digest}  – строка: JSON-строка (json) или HASH (hash)
+KEY_TIMESTAMP   = "asic:last_sync"
+KEY_CURRENT     = "asic:current"
+KEY_VERSION_SEQ = "asic:version:seq"
+KEY_RETIRED     = "asic:versions:retired"   # ZSET версия → когда снята с публикации
+KEY_VERSION_FMT = "asic:v{v}:{name}"
+KEY_BLOB_FMT    = "asic:blob:{fmt}:{digest}"
+KEY_SESSION_MAP_FMT = "asic:session:{sid}:map"     # index→row текущего списка сессии
+CHANNEL_CATALOG = "asic:catalog:published"          # pub/sub: номер новой версии
+
+# ключи до версионирования – удаляются при первой публикации
+LEGACY_PATTERNS = ("asic:rows", "asic:row:*", "asic:packed", "asic:hashes", "asic:format",
+                   "asic:idx:*", "asic:rng:*", "asic:facets", "asic:search")
+
+SESSION_TTL = int(os.getenv("SESSION_TTL", "86400"))
+# сколько секунд снятая версия ещё читается, прежде чем её удалит GC
+VERSION_GRACE = int(os.getenv("CATALOG_VERSION_GRACE", "300"))
+
+# json   – строка = JSON-строка
+# hash   – строка = Redis hash {header: value}
+# packed – вся версия = один колоночный блоб {h: headers, r: rows, c: columns}
+FORMATS = ("json", "hash", "packed")
+CATALOG_FORMAT = os.getenv("CATALOG_FORMAT", "json")
+
+# откуда боты читают каталог:
+# redis  – как раньше;  sqlite – локальный файл CATALOG_SQLITE;
+# auto   – файл, если он есть, иначе Redis.
+# Версию задаёт asic:current: файл читается, только если в нём она и есть,
+# иначе (файл отстал – его пишет лишь sync-лидер) – Redis
+CATALOG_BACKEND = os.getenv("CATALOG_BACKEND", "redis")
+CATALOG_SQLITE = os.getenv("CATALOG_SQLITE", os.path.join(os.path.dirname(__file__), "catalog.sqlite"))
+
+# asic:v{n}:hashes → блобы за один round trip
+_FETCH_ROWS_LUA = """
+local out = {}
+for i = 3, #ARGV do
+  local digest = redis.call('HGET', KEYS[1], ARGV[i])
+  if not digest then
+    out[#out + 1] = false
+  elseif ARGV[2] == 'hash' then
+    out[#out + 1] = redis.call('HGETALL', ARGV[1] .. digest)
+  else
+    out[#out + 1] = redis.call('GET', ARGV[1] .. digest)
+  end
+end
+return out
+"""
+_fetch_rows = r.register_script(_FETCH_ROWS_LUA)
+_afetch_rows = ar.register_script(_FETCH_ROWS_LUA)
+
+
+def vkey(version: int, name: str) -> str:
+    return KEY_VERSION_FMT.format(v=version, name=name)
+
+def blob_key(fmt: str, digest: str) -> str:
+    return KEY_BLOB_FMT.format(fmt=fmt, digest=digest)
+
+_local_catalog = None
+
+def _file_catalog():
+    """SqliteCatalog, если backend – локальный файл (любой версии), иначе None."""
+    global _local_catalog
+    if CATALOG_BACKEND == "redis" or not CATALOG_SQLITE:
+        return None
+    if CATALOG_BACKEND == "auto" and not os.path.exists(CATALOG_SQLITE):
+        return None
+    if _local_catalog is None or _local_catalog.path != CATALOG_SQLITE:
+        from catalog_sqlite import SqliteCatalog    # catalog_sqlite сам импортирует redis_cache
+        _local_catalog = SqliteCatalog(CATALOG_SQLITE)
+    return _local_catalog
+
+def local_catalog(version: int | None):
+    """
+    SqliteCatalog, если файл содержит именно `version`, иначе None – читаем из
+    Redis. Файл переписывает только sync-лидер: на остальных узлах он может
+    отставать от asic:current, и его версия не должна выдаваться за новую.
+    """
+    local = _file_catalog()
+    if local is None or version is None or not local.holds(version):
+        return None
+    return local
+
+def _packed(version: int | None) -> bool:
+    return CATALOG_FORMAT == "packed" and local_catalog(version) is None
+
+def published_version() -> int | None:
+    """asic:current из Redis – для писателя (sync) и как источник истины для читателей."""
+    raw = r.get(KEY_CURRENT)
+    return int(raw) if raw else None
+
+def current_version() -> int | None:
+    try:
+        return published_version()
+    except redis.RedisError:
+        local = _file_catalog()     # Redis недоступен – хотя бы версия из файла
+        if local is None:
+            raise
+        return local.version()
+
+async def acurrent_version() -> int | None:
+    try:
+        raw = await ar.get(KEY_CURRENT)
+    except redis.RedisError:
+        local = _file_catalog()
+        if local is None:
+            raise
+        return local.version()
+    return int(raw) if raw else None
+
+
+# ───────────────────────────── чтение ────────────────────────────────
+def _fetch_args(version: int, rows: List[int]) -> Dict[str, Any]:
+    return {"keys": [vkey(version, "hashes")],
+            "args": [blob_key(CATALOG_FORMAT, ""), CATALOG_FORMAT, *rows]}
+
+def _decode_fetched(rows: List[int], raws: List[Any]) -> Dict[int, Dict[str, Any]]:
+    if CATALOG_FORMAT == "hash":
+        return {row: dict(zip(raw[::2], raw[1::2])) if raw else {} for row, raw in zip(rows, raws)}
+    return {row: json.loads(raw or "{}") for row, raw in zip(rows, raws)}
+
+def load_rows(version: int | None = None) -> Dict[int, str]:
+    """{row: модель} версии `version` (по умолчанию – опубликованной)."""
+    v = current_version() if version is None else version
+    local = local_catalog(v)
+    if local is not None:
+        return local.load_rows(v)
+    if v is None:
+        return {}
+    if CATALOG_FORMAT == "packed":
+        return load_packed(v).index()
+    return json.loads(r.get(vkey(v, "rows")) or "{}")
+
+def load_row(row: int, version: int | None = None) -> Dict[str, Any]:
+    return load_rows_many([row], version).get(row, {})
+
+def load_rows_many(rows: Iterable[int], version: int | None = None) -> Dict[int, Dict[str, Any]]:
+    """Все строки за один round trip (Lua: HGET digest → GET/HGETALL блоба)."""
+    rows = list(dict.fromkeys(int(row) for row in rows))
+    if not rows:
+        return {}
+    v = current_version() if version is None else version
+    local = local_catalog(v)
+    if local is not None:
+        return local.load_rows_many(rows, v)
+    if v is None:
+        return {row: {} for row in rows}
+    if CATALOG_FORMAT == "packed":
+        return load_packed(v).rows_many(rows)
+    return _decode_fetched(rows, _fetch_rows(client=r, **_fetch_args(v, rows)))
+
+async def aload_rows(version: int | None = None) -> Dict[int, str]:
+    v = await acurrent_version() if version is None else version
+    local = local_catalog(v)
+    if local is not None:
+        return local.load_rows(v)
+    if v is None:
+        return {}
+    if CATALOG_FORMAT == "packed":
+        return (await aload_packed(v)).index()
+    return json.loads(await ar.get(vkey(v, "rows")) or "{}")
+
+async def aload_row(row: int, version: int | None = None) -> Dict[str, Any]:
+    return (await aload_rows_many([row], version)).get(row, {})
+
+async def aload_rows_many(rows: Iterable[int], version: int | None = None) -> Dict[int, Dict[str, Any]]:
+    rows = list(dict.fromkeys(int(row) for row in rows))
+    if not rows:
+        return {}
+    v = await acurrent_version() if version is None else version
+    local = local_catalog(v)
+    if local is not None:
+        return local.load_rows_many(rows, v)
+    if v is None:
+        return {row: {} for row in rows}
+    if CATALOG_FORMAT == "packed":
+        return (await aload_packed(v)).rows_many(rows)
+    return _decode_fetched(rows, await _afetch_rows(client=ar, **_fetch_args(v, rows)))
+
+
+# ─────────────────────── index→row по сессиям ────────────────────────
+def store_session_mapping(session_id: str, mapping: Dict[int, int]) -> None:
+    """Заменяет mapping сессии целиком; ключ живёт SESSION_TTL сек."""
+    key = KEY_SESSION_MAP_FMT.format(sid=session_id)
+    pipe = r.pipeline()
+    pipe.delete(key)
+    if mapping:
+        pipe.hset(key, mapping={int(i): int(row) for i, row in mapping.items()})
+        pipe.expire(key, SESSION_TTL)
+    pipe.execute()
+
+def load_session_mapping(session_id: str) -> Dict[int, int]:
+    """mapping сессии ({} если нет/истёк); каждое чтение продлевает TTL."""
+    key = KEY_SESSION_MAP_FMT.format(sid=session_id)
+    pipe = r.pipeline(transaction=False)
+    pipe.hgetall(key)
+    pipe.expire(key, SESSION_TTL)
+    raw, _ = pipe.execute()
+    return {int(i): int(row) for i, row in raw.items()}
+
+async def astore_session_mapping(session_id: str, mapping: Dict[int, int]) -> None:
+    key = KEY_SESSION_MAP_FMT.format(sid=session_id)
+    async with ar.pipeline() as pipe:
+        pipe.delete(key)
+        if mapping:
+            pipe.hset(key, mapping={int(i): int(row) for i, row in mapping.items()})
+            pipe.expire(key, SESSION_TTL)
+        await pipe.execute()
+
+async def aload_session_mapping(session_id: str) -> Dict[int, int]:
+    key = KEY_SESSION_MAP_FMT.format(sid=session_id)
+    async with ar.pipeline(transaction=False) as pipe:
+        pipe.hgetall(key)
+        pipe.expire(key, SESSION_TTL)
+        raw, _ = await pipe.execute()
+    return {int(i): int(row) for i, row in raw.items()}
+
+
+# ─────────────────────────── packed-формат ───────────────────────────
+class PackedCatalog:
+    """
+    Колоночный каталог: таблица заголовков + по массиву значений на колонку.
+    Dict строки собирается только для запрошенных row, без промежуточных
+    структур на весь каталог.
+    """
+
+    __slots__ = ("headers", "rows", "columns", "_pos")
+
+    def __init__(self, headers: List[str], rows: List[int], columns: List[List[str]]) -> None:
+        self.headers = headers
+        self.rows = rows
+        self.columns = columns
+        self._pos = {row: i for i, row in enumerate(rows)}
+
+    @classmethod
+    def encode(cls, headers: Sequence[str], records: Dict[int, Dict[str, Any]]) -> bytes:
+        rows = list(records)
+        table = {
+            "h": list(headers),
+            "r": rows,
+            "c": [[records[row].get(h, "") for row in rows] for h in headers],
+        }
+        if msgpack is not None:
+            return b"M" + msgpack.packb(table, use_bin_type=True)
+        return b"J" + json.dumps(table, ensure_ascii=False, separators=(",", ":")).encode()
+
+    @classmethod
+    def decode(cls, blob: bytes | None) -> "PackedCatalog":
+        if not blob:
+            return cls([], [], [])
+        if blob[:1] == b"M":
+            if msgpack is None:
+                raise RuntimeError("packed-блоб записан msgpack'ом – установите msgpack")
+            table = msgpack.unpackb(blob[1:], raw=False)
+        else:
+            table = json.loads(blob[1:])
+        return cls(table["h"], table["r"], table["c"])
+
+    def index(self) -> Dict[int, str]:
+        return dict(zip(self.rows, self.columns[0])) if self.columns else {}
+
+    def row(self, row: int) -> Dict[str, Any]:
+        i = self._pos.get(row)
+        if i is None:
+            return {}
+        return {h: col[i] for h, col in zip(self.headers, self.columns)}
+
+    def rows_many(self, rows: Iterable[int]) -> Dict[int, Dict[str, Any]]:
+        return {row: self.row(row) for row in rows}
+
+def load_packed(version: int) -> PackedCatalog:
+    return PackedCatalog.decode(r_bin.get(vkey(version, "packed")))
+
+async def aload_packed(version: int) -> PackedCatalog:
+    return PackedCatalog.decode(await ar_bin.get(vkey(version, "packed")))
+
+
+# ───────────────────────────── запись ────────────────────────────────
+def row_digest(data: Dict[str, Any]) -> str:
+    """Отпечаток содержимого строки (порядок колонок не важен)."""
+    raw = json.dumps(data, ensure_ascii=False, sort_keys=True).encode()
+    return hashlib.blake2b(raw, digest_size=8).hexdigest()
+
+
+def stage_catalog(headers: Sequence[str], records: Dict[int, Dict[str, Any]],
+                  fmt: str | None = None) -> Tuple[int | None, Dict[str, int]]:
+    """
+    Пишет каталог новой, ещё не опубликованной версией.
+    Сравнение с digest'ами текущей версии: блобы пишутся только для новых /
+    изменённых строк, исчезнувшие просто не попадают в манифест.
+    Смена формата = все строки «изменены».
+    Возвращает (номер версии | None, если ничего не поменялось; статистику
+    {added, changed, removed, unchanged}).
+    """
+    fmt = fmt or CATALOG_FORMAT
+    if fmt not in FORMATS:
+        raise ValueError(f"CATALOG_FORMAT must be one of {FORMATS}, got {fmt!r}")
+
+    new = {row: row_digest(data) for row, data in records.items()}
+    prev = published_version()      # не local_catalog: файл может отставать от Redis
+    same_format = prev is not None and r.get(vkey(prev, "format")) == fmt
+    old = {int(row): h for row, h in r.hgetall(vkey(prev, "hashes")).items()} if same_format else {}
+
+    dirty = [row for row, h in new.items() if old.get(row) != h]
+    removed = [row for row in old if row not in new]
+    stats = {
+        "added": sum(row not in old for row in dirty),
+        "changed": sum(row in old for row in dirty),
+        "removed": len(removed),
+        "unchanged": len(new) - len(dirty),
+    }
+    if same_format and not dirty and not removed:
+        return None, stats
+
+    v = int(r.incr(KEY_VERSION_SEQ))
+    pipe = r.pipeline()
+    if fmt == "packed":
+        # bytes пишутся как есть и через decode_responses-клиент
+        pipe.set(vkey(v, "packed"), PackedCatalog.encode(headers, records))
+    else:
+        index = {row: data.get(headers[0], "") for row, data in records.items()} if headers else {}
+        pipe.set(vkey(v, "rows"), json.dumps(index, ensure_ascii=False))
+        for row in dirty:
+            key, data = blob_key(fmt, new[row]), records[row]
+            if fmt == "hash":
+                pipe.delete(key)
+                if data:
+                    pipe.hset(key, mapping=data)
+            else:
+                pipe.set(key, json.dumps(data, ensure_ascii=False))
+    if new:
+        pipe.hset(vkey(v, "hashes"), mapping=new)
+    pipe.set(vkey(v, "format"), fmt)
+    pipe.execute()
+    return v, stats
+
+
+def publish_version(version: int) -> List[int]:
+    """
+    Атомарно делает `version` текущей (SET asic:current + штамп + PUBLISH
+    одной MULTI), прошлая версия уходит в asic:versions:retired.
+    Возвращает удалённые GC версии.
+    """
+    pipe = r.pipeline()
+    pipe.set(KEY_CURRENT, version, get=True)
+    pipe.set(KEY_TIMESTAMP, dt.datetime.utcnow().isoformat())
+    pipe.publish(CHANNEL_CATALOG, version)
+    prev, _, _ = pipe.execute()
+    if prev is None:
+        _drop_legacy()
+    elif int(prev) != version:
+        r.zadd(KEY_RETIRED, {int(prev): time.time()})
+    return gc_versions()
+
+
+def discard_version(version: int) -> None:
+    """Отказ от неопубликованной версии: её ключи уберёт ближайший gc_versions()."""
+    r.zadd(KEY_RETIRED, {version: 0})
+
+
+def gc_versions(grace: float | None = None) -> List[int]:
+    """Удаляет версии, снятые раньше чем `grace` сек. назад, и осиротевшие блобы."""
+    grace = VERSION_GRACE if grace is None else grace
+    expired = [int(v) for v in r.zrangebyscore(KEY_RETIRED, "-inf", time.time() - grace)]
+    if not expired:
+        return []
+    for v in expired:
+        _unlink_pattern(vkey(v, "*"))
+    r.zrem(KEY_RETIRED, *expired)
+
+    live = [v for v in (published_version(), *map(int, r.zrange(KEY_RETIRED, 0, -1))) if v is not None]
+    referenced = set()
+    for v in live:
+        fmt = r.get(vkey(v, "format"))
+        if fmt and fmt != "packed":
+            referenced.update(blob_key(fmt, d) for d in r.hvals(vkey(v, "hashes")))
+    orphans = [k for k in r.scan_iter(blob_key("*", "*"), count=1000) if k not in referenced]
+    for i in range(0, len(orphans), 1000):
+        r.unlink(*orphans[i:i + 1000])
+    return expired
+
+
+def cache_catalog(headers: Sequence[str], records: Dict[int, Dict[str, Any]],
+                  fmt: str | None = None) -> Dict[str, int]:
+    """stage_catalog + publish_version без индексов (бенчмарки, ручная заливка)."""
+    version, stats = stage_catalog(headers, records, fmt)
+    if version is not None:
+        publish_version(version)
+    return stats
+
+
+def _unlink_pattern(pattern: str) -> None:
+    batch: List[str] = []
+    for key in r.scan_iter(pattern, count=1000):
+        batch.append(key)
+        if len(batch) >= 1000:
+            r.unlink(*batch)
+            batch.clear()
+    if batch:
+        r.unlink(*batch)
+
+
+def _drop_legacy() -> None:
+    for pattern in LEGACY_PATTERNS:
+        _unlink_pattern(pattern)
+
+
+def catalog_memory(pattern: str = "asic:*") -> Dict[str, Any]:
+    """MEMORY USAGE по всем ключам каталога: {keys, bytes}; bytes=None, если команда недоступна."""
+    keys = list(r.scan_iter(pattern, count=1000))
+    if not keys:
+        return {"keys": 0, "bytes": 0}
+    pipe = r.pipeline(transaction=False)
+    for key in keys:
+        pipe.memory_usage(key, samples=0)
+    try:
+        sizes = pipe.execute()
+    except redis.ResponseError:
+        return {"keys": len(keys), "bytes": None}
+    return {"keys": len(keys), "bytes": sum(s or 0 for s in sizes)}
+
+
+class CatalogSnapshot:
+    """
+    Процессный снапшот опубликованной версии каталога.
+
+    •  Перед чтением сверяем asic:current (один GET, не чаще чем раз в
+       `check_interval` сек.) – если опубликована новая версия, снапшот
+       сбрасывается. version() отдаёт номер, под которым лежит снапшот, –
+       на него и ключуются индексы / кэши ответов.
+    •  Строки лежат уже декодированными; LRU ограничен `max_rows`.
+    •  hits / misses / reloads – счётчики для метрик (см. stats()).
+    •  Чтение с явным version, отличным от снапшота, идёт мимо кэша.
+    •  subscribe() – фоновая подписка на asic:catalog:published: новая
+       версия подхватывается сразу после publish, опрос asic:current
+       остаётся страховкой на случай обрыва подписки.
+
+    Возвращаемые dict'ы общие для всех сессий – не мутировать.
+    """
+
+    def __init__(self, max_rows: int = 5000, check_interval: float = 1.0) -> None:
+        self.max_rows = max_rows
+        self.check_interval = check_interval
+        self.hits = self.misses = self.reloads = 0
+        self._version: int | None = None
+        self._checked_at = 0.0
+        self._index: Dict[int, str] | None = None
+        self._packed: PackedCatalog | None = None
+        self._memo: Dict[str, Any] = {}
+        self._rows: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._listener: Any = None
+
+    def _due(self) -> bool:
+        now = time.monotonic()
+        if self._checked_at and now - self._checked_at < self.check_interval:
+            return False
+        self._checked_at = now
+        return True
+
+    def _apply(self, version: int | None) -> None:
+        if version != self._version:
+            self._version = version
+            self._index = None
+            self._packed = None
+            self._memo.clear()
+            self._rows.clear()
+            self.reloads += 1
+
+    def _refresh(self) -> None:
+        if self._due():
+            self._apply(current_version())
+
+    async def _arefresh(self) -> None:
+        with self._lock:
+            due = self._due()
+        if due:
+            version = await acurrent_version()
+            with self._lock:
+                self._apply(version)
+
+    def notify(self, version: int | None) -> None:
+        """Сразу переключиться на `version` (сообщение pub/sub или сам sync)."""
+        with self._lock:
+            self._apply(version)
+            self._checked_at = time.monotonic()
+
+    def subscribe(self, client: Any = None) -> None:
+        """Подписка на CHANNEL_CATALOG в daemon-потоке; повторный вызов – no-op."""
+        with self._lock:
+            if self._listener is not None:
+                return
+            pubsub = (client or r).pubsub(ignore_subscribe_messages=True)
+            try:
+                pubsub.subscribe(**{CHANNEL_CATALOG: self._on_message})
+            except redis.RedisError:
+                pubsub.close()      # Redis недоступен – работаем на опросе
+                return
+            self._listener = pubsub.run_in_thread(
+                sleep_time=1.0, daemon=True, exception_handler=self._on_listener_error)
+
+    def unsubscribe(self) -> None:
+        with self._lock:
+            listener, self._listener = self._listener, None
+        if listener is not None:
+            listener.stop()
+
+    def _on_message(self, message: Dict[str, Any]) -> None:
+        try:
+            self.notify(int(message["data"]))
+        except (TypeError, ValueError):
+            pass
+
+    def _on_listener_error(self, exc: BaseException, pubsub: Any, thread: Any) -> None:
+        # соединение оборвалось – остаёмся на опросе, subscribe() можно повторить
+        thread.stop()
+        pubsub.close()
+        with self._lock:
+            if self._listener is thread:
+                self._listener = None
+        self._checked_at = 0.0
+
+    def _foreign(self, version: int | None) -> bool:
+        return version is not None and version != self._version
+
+    def _take(self, rows: List[int]) -> "tuple[Dict[int, Dict[str, Any]], List[int]]":
+        out: Dict[int, Dict[str, Any]] = {}
+        missing: List[int] = []
+        for row in rows:
+            data = self._rows.get(row)
+            if data is None:
+                missing.append(row)
+            else:
+                self._rows.move_to_end(row)
+                out[row] = data
+        self.hits += len(rows) - len(missing)
+        self.misses += len(missing)
+        return out, missing
+
+    def _put(self, fetched: Dict[int, Dict[str, Any]], out: Dict[int, Dict[str, Any]]) -> None:
+        for row, data in fetched.items():
+            self._rows[row] = data
+            out[row] = data
+        while len(self._rows) > self.max_rows:
+            self._rows.popitem(last=False)
+
+    def version(self) -> int | None:
+        """Номер версии каталога, которую сейчас отдаёт снапшот."""
+        with self._lock:
+            self._refresh()
+            return self._version
+
+    def rows(self, version: int | None = None) -> Dict[int, str]:
+        """Как load_rows(), но из памяти процесса."""
+        with self._lock:
+            self._refresh()
+            if self._foreign(version):
+                return load_rows(version)
+            if self._index is None:
+                self.misses += 1
+                if self._version is None:
+                    self._index = {}
+                elif _packed(self._version):
+                    self._index = self._table().index()
+                else:
+                    self._index = load_rows(self._version)
+            else:
+                self.hits += 1
+            return self._index
+
+    def rows_many(self, rows: Iterable[int], version: int | None = None) -> Dict[int, Dict[str, Any]]:
+        """Как load_rows_many(): промахи добираются одним round trip."""
+        rows = list(dict.fromkeys(int(row) for row in rows))
+        with self._lock:
+            self._refresh()
+            if self._foreign(version):
+                return load_rows_many(rows, version)
+            out, missing = self._take(rows)
+            if missing and self._version is not None:
+                self._put(self._table().rows_many(missing) if _packed(self._version)
+                          else load_rows_many(missing, self._version), out)
+            return {row: out.get(row, {}) for row in rows}
+
+    def memo(self, name: str, loader: Callable[[int | None], Any], version: int | None = None) -> Any:
+        """
+        Производная структура версии (индекс поиска и т.п.): loader(version).
+        loader идёт вне self._lock (он читает Redis, а _arefresh берёт тот же
+        замок в потоке event loop'а); под замком – только публикация. Если
+        двое строили одновременно, остаётся первый результат.
+        """
+        with self._lock:
+            self._refresh()
+            if self._foreign(version):
+                foreign = True
+            else:
+                foreign, version = False, self._version
+                if name in self._memo:
+                    self.hits += 1
+                    return self._memo[name]
+        value = loader(version)
+        if foreign:
+            return value
+        with self._lock:
+            self.misses += 1
+            if version != self._version:
+                return value
+            return self._memo.setdefault(name, value)
+
+    # async-варианты: I/O идёт вне self._lock, под замком – только память
+    async def aversion(self) -> int | None:
+        await self._arefresh()
+        return self._version
+
+    async def arows(self, version: int | None = None) -> Dict[int, str]:
+        await self._arefresh()
+        with self._lock:
+            if self._foreign(version):
+                foreign = True
+            else:
+                foreign, version = False, self._version
+                if self._index is not None:
+                    self.hits += 1
+                    return self._index
+        if foreign or version is None:
+            return await aload_rows(version) if version is not None else {}
+        index = ((await self._atable(version)).index() if _packed(version)
+                 else await aload_rows(version))
+        with self._lock:
+            self.misses += 1
+            if version == self._version:
+                self._index = index
+            return index
+
+    async def arows_many(self, rows: Iterable[int], version: int | None = None) -> Dict[int, Dict[str, Any]]:
+        rows = list(dict.fromkeys(int(row) for row in rows))
+        await self._arefresh()
+        with self._lock:
+            if self._foreign(version):
+                foreign = True
+            else:
+                foreign, version = False, self._version
+                out, missing = self._take(rows)
+        if foreign:
+            return await aload_rows_many(rows, version)
+        if missing and version is not None:
+            fetched = ((await self._atable(version)).rows_many(missing) if _packed(version)
+                       else await aload_rows_many(missing, version))
+            with self._lock:
+                if version == self._version:
+                    self._put(fetched, out)
+                else:
+                    out.update(fetched)
+        return {row: out.get(row, {}) for row in rows}
+
+    async def amemo(self, name: str, loader: Callable[[int | None], Awaitable[Any]],
+                    version: int | None = None) -> Any:
+        await self._arefresh()
+        with self._lock:
+            if self._foreign(version):
+                foreign = True
+            else:
+                foreign, version = False, self._version
+                if name in self._memo:
+                    self.hits += 1
+                    return self._memo[name]
+        value = await loader(version)
+        if foreign:
+            return value
+        with self._lock:
+            self.misses += 1
+            if version != self._version:
+                return value
+            return self._memo.setdefault(name, value)
+
+    def _table(self) -> PackedCatalog:
+        if self._packed is None:
+            self._packed = load_packed(self._version) if self._version is not None else PackedCatalog([], [], [])
+        return self._packed
 
-KEY_ROWS      = "asic:rows"       
-KEY_ROW_FMT   = "asic:row:{row}"   
-KEY_TIMESTAMP = "asic:last_sync"   
+    async def _atable(self, version: int) -> PackedCatalog:
+        if self._packed is not None and version == self._version:
+            return self._packed
+        table = await aload_packed(version)
+        with self._lock:
+            if version == self._version:
+                self._packed = table
+        return table
 
-def cache_rows(rows: Dict[int, str]):
-    r.set(KEY_ROWS, json.dumps(rows, ensure_ascii=False))
+    def clear(self) -> None:
+        with self._lock:
+            self._version = None
+            self._checked_at = 0.0
+            self._index = None
+            self._packed = None
+            self._memo.clear()
+            self._rows.clear()
 
-def cache_row(row: int, data: Dict[str, Any]):
-    r.set(KEY_ROW_FMT.format(row=row), json.dumps(data, ensure_ascii=False))
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "version": self._version,
+            "rows_cached": len(self._rows),
+            "hits": self.hits,
+            "misses": self.misses,
+            "reloads": self.reloads,
+            "subscribed": self._listener is not None,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }
 
-def load_rows() -> Dict[int, str]:
-    raw = r.get(KEY_ROWS) or "{}"
-    return json.loads(raw)
 
-def load_row(row: int) -> Dict[str, Any]:
-    raw = r.get(KEY_ROW_FMT.format(row=row)) or "{}"
-    return json.loads(raw)
+snapshot = CatalogSnapshot(
+    max_rows=int(os.getenv("CATALOG_SNAPSHOT_ROWS", "5000")),
+    check_interval=float(os.getenv("CATALOG_SNAPSHOT_CHECK_SEC", "1.0")),
+)
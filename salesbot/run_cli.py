@@ -1,13 +1,35 @@
-from salesbot.orchestrator import build_orchestrator
+import argparse
 
-agent = build_orchestrator()
+from salesbot.orchestrator import DEFAULT_MODE, MODES, build_orchestrator, run_turn, turn_report
+from salesbot.subagents.intent import fast_path_report
+from salesbot.llm_cache import cache_report
+from salesbot.answer_cache import answer_report
 
-print("💬 ASIC-бот v2. Пиши 'exit' для выхода")
+ap = argparse.ArgumentParser()
+ap.add_argument("--mode", choices=MODES, default=DEFAULT_MODE,
+                help="react – ReAct-оркестратор, dispatch – маршрут по intent в коде")
+ap.add_argument("--no-stream", dest="stream", action="store_false",
+                help="печатать ответ целиком, а не токенами")
+args = ap.parse_args()
+
+agent = build_orchestrator(mode=args.mode)
+
+print(f"💬 ASIC-бот v2 ({args.mode}). Пиши 'exit' для выхода")
 while True:
     msg = input("🧑: ")
     if msg.lower() in {"exit","quit"}:
         break
     try:
-        print("🤖:", agent.invoke({"input": msg})["output"])
+        if args.stream:
+            print("🤖: ", end="", flush=True)
+            run_turn(agent, msg, on_token=lambda t: print(t, end="", flush=True))
+            print()
+        else:
+            print("🤖:", run_turn(agent, msg))
     except Exception as e:
         print("⚠️", e)
+
+print("📊 intent fast-path:", fast_path_report())
+print("📊 turns:", turn_report())
+print("📊 llm cache:", cache_report())
+print("📊 catalog answers:", answer_report())
@@ -0,0 +1,97 @@
+"""
+Sheet-Cache
+───────────
+Чтение листа для research-агентов (research/v1, research/asic_db, research/react_test) поверх
+sheets_client: общий лимитер / повторы + TTL read-through кэш.
+
+•  заголовки читаются один раз, буквы колонок – rowcol_to_a1 (шире Z тоже);
+•  строки кэшируются целиком – любые подмножества полей потом бесплатны;
+•  промахи get_rows() – один batch_get сплошными блоками
+   A{first}:{last_col}{last}, блоки рвутся на дырах больше MAX_GAP строк;
+•  свежесть – GSHEET_CACHE_TTL сек., invalidate() сбрасывает всё.
+"""
+
+from __future__ import annotations
+
+import os
+import time
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+
+from gspread.utils import rowcol_to_a1
+
+from sheets_client import throttled
+
+# сколько секунд ответы листа считаются свежими
+CACHE_TTL = float(os.getenv("GSHEET_CACHE_TTL", "60"))
+# строки дальше друг от друга, чем на MAX_GAP, читаются отдельными блоками
+MAX_GAP = 50
+
+
+class CachedSheet:
+    """Лист (gspread Worksheet) под общим лимитером процесса + TTL-кэш."""
+
+    def __init__(self, sheet: Any, ttl: float = CACHE_TTL, max_gap: int = MAX_GAP) -> None:
+        self.sheet = throttled(sheet)
+        self.ttl = ttl
+        self.max_gap = max_gap
+        self._cache: Dict[Any, Tuple[float, Any]] = {}
+        self.headers: List[str] = self.sheet.get("1:1")[0]
+        self.col_letter: Dict[str, str] = {
+            name: rowcol_to_a1(1, i + 1)[:-1] for i, name in enumerate(self.headers)
+        }
+
+    # ── TTL read-through кэш ──────────────────────────────────────────
+    def _fresh(self, key: Any) -> Any:
+        hit = self._cache.get(key)
+        if hit and time.monotonic() - hit[0] < self.ttl:
+            return hit[1]
+        return None
+
+    def _cached(self, key: Any, loader: Callable[[], Any]) -> Any:
+        value = self._fresh(key)
+        if value is None:
+            value = loader()
+            self._cache[key] = (time.monotonic(), value)
+        return value
+
+    def invalidate(self) -> None:
+        self._cache.clear()
+
+    # ── чтение ───────────────────────────────────────────────────────
+    def _blocks(self, rows: List[int]) -> List[Tuple[int, int]]:
+        """Сортированные row → сплошные блоки (first, last) без больших дыр."""
+        blocks: List[Tuple[int, int]] = []
+        for row in rows:
+            if blocks and row - blocks[-1][1] <= self.max_gap:
+                blocks[-1] = (blocks[-1][0], row)
+            else:
+                blocks.append((row, row))
+        return blocks
+
+    def get_rows(self, rows: Iterable[int],
+                 fields: List[str] | None = None) -> Dict[int, Dict[str, str]]:
+        """
+        {row: {field: value}} (fields=None – все колонки) – строки, которых нет
+        в кэше, читаются одним batch_get сплошными блоками A{first}:{last_col}{last}.
+        """
+        rows = list(dict.fromkeys(int(r) for r in rows))
+        missing = sorted(r for r in rows if self._fresh(("row", r)) is None)
+        if missing:
+            width = len(self.headers)
+            blocks = self._blocks(missing)
+            ranges = [f"A{first}:{rowcol_to_a1(last, width)}" for first, last in blocks]
+            now = time.monotonic()
+            for (first, last), values in zip(blocks, self.sheet.batch_get(ranges)):
+                for offset in range(last - first + 1):
+                    cells = values[offset] if offset < len(values) else []
+                    padded = list(cells) + [""] * (width - len(cells))
+                    self._cache[("row", first + offset)] = (now, dict(zip(self.headers, padded)))
+        fields = fields or self.headers
+        out: Dict[int, Dict[str, str]] = {}
+        for row in rows:
+            data = self._cache[("row", row)][1]
+            out[row] = {f: data.get(f, "") for f in fields}
+        return out
+
+    def get_product_fields(self, row: int, fields: List[str]) -> Dict[str, str]:
+        return self.get_rows([row], fields)[row]
@@ -0,0 +1,214 @@
+"""
+Sheets-Client
+─────────────
+Общая обёртка над gspread-объектами (Worksheet / Spreadsheet) для sync'а и
+research-агентов: все обращения к Google Sheets API идут через неё.
+
+•  TokenBucket – лимит запросов в минуту на процесс (SHEETS_READS_PER_MIN,
+   по умолчанию 60 – квота чтения «на пользователя в минуту»), всплеск до
+   SHEETS_BURST запросов; при пустом ведре вызов ждёт, а не получает 429.
+•  Повторы – на 429 и 5xx (и сетевые OSError) экспоненциальный backoff с
+   полным джиттером: base · 2^попытка, не больше SHEETS_BACKOFF_MAX сек.,
+   до SHEETS_MAX_RETRIES повторов; Retry-After сервера уважается.
+•  Single-flight – одинаковые чтения (get / batch_get / … с теми же
+   аргументами), идущие одновременно, делят один запрос: первый вызов
+   идёт в API, остальные ждут его результат (или его исключение).
+
+Состояние (ведро, in-flight) общее на процесс: throttled(ws) / retrying(fn).
+"""
+
+from __future__ import annotations
+
+import os
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Tuple
+
+READS_PER_MIN = float(os.getenv("SHEETS_READS_PER_MIN", "60"))
+BURST = float(os.getenv("SHEETS_BURST", "10"))
+MAX_RETRIES = int(os.getenv("SHEETS_MAX_RETRIES", "5"))
+BACKOFF_BASE = float(os.getenv("SHEETS_BACKOFF_BASE", "1.0"))
+BACKOFF_MAX = float(os.getenv("SHEETS_BACKOFF_MAX", "32"))
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+# чтения, которые можно склеивать; остальные методы только лимитируются и повторяются
+COALESCED = frozenset({
+    "get", "batch_get", "get_values", "get_all_values", "get_all_records",
+    "row_values", "col_values", "get_lastUpdateTime", "fetch_sheet_metadata",
+})
+
+
+class TokenBucket:
+    """rate токенов в секунду, не больше capacity; acquire() ждёт токен."""
+
+    def __init__(self, per_minute: float = READS_PER_MIN, capacity: float = BURST,
+                 clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep) -> None:
+        self.rate = per_minute / 60.0
+        self.capacity = capacity
+        self._tokens = capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._stamp = clock()
+        self._lock = threading.Lock()
+        self.waited = 0.0
+
+    def _reserve(self) -> float:
+        """Забирает токен (возможно, в долг) и возвращает, сколько ждать."""
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.capacity, self._tokens + (now - self._stamp) * self.rate)
+            self._stamp = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def acquire(self) -> None:
+        wait = self._reserve()
+        if wait:
+            self.waited += wait
+            self._sleep(wait)
+
+
+class SingleFlight:
+    """do(key, fn): пока fn по key выполняется, повторные do(key) ждут её результат."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._calls: Dict[Any, "_Call"] = {}
+        self.shared = 0
+
+    def do(self, key: Any, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.shared += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException | None = None
+
+
+def _status(exc: BaseException) -> int | None:
+    """HTTP-код ошибки gspread (APIError.code в 6.x, response.status_code в 5.x)."""
+    code = getattr(exc, "code", None)
+    if isinstance(code, int):
+        return code
+    response = getattr(exc, "response", None)
+    return getattr(response, "status_code", None)
+
+
+def _retry_after(exc: BaseException) -> float | None:
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+
+def _retryable(exc: BaseException) -> bool:
+    return _status(exc) in RETRY_STATUSES or (isinstance(exc, OSError) and _status(exc) is None)
+
+
+class SheetsClient:
+    """Лимитер + повторы + single-flight; один экземпляр на процесс – `client`."""
+
+    def __init__(self, bucket: TokenBucket | None = None, max_retries: int = MAX_RETRIES,
+                 backoff_base: float = BACKOFF_BASE, backoff_max: float = BACKOFF_MAX,
+                 sleep: Callable[[float], None] = time.sleep) -> None:
+        self.bucket = bucket or TokenBucket(sleep=sleep)
+        self.flight = SingleFlight()
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._sleep = sleep
+        self.requests = self.retries = 0
+
+    def call(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """fn(*args, **kwargs) под лимитером, с повторами на 429 / 5xx."""
+        attempt = 0
+        while True:
+            self.bucket.acquire()
+            self.requests += 1
+            try:
+                return fn(*args, **kwargs)
+            except Exception as e:
+                if attempt >= self.max_retries or not _retryable(e):
+                    raise
+                delay = _retry_after(e)
+                if delay is None:
+                    delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+                attempt += 1
+                self.retries += 1
+                self._sleep(delay)
+
+    def read(self, key: Any, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """call(), склеенный с одинаковыми одновременными чтениями по key."""
+        return self.flight.do(key, lambda: self.call(fn, *args, **kwargs))
+
+    def stats(self) -> Dict[str, Any]:
+        return {"requests": self.requests, "retries": self.retries,
+                "coalesced": self.flight.shared, "throttled_sec": round(self.bucket.waited, 3)}
+
+
+class Throttled:
+    """
+    Прокси над gspread-объектом: методы идут через SheetsClient,
+    .spreadsheet тоже оборачивается; остальные атрибуты – как есть.
+    """
+
+    def __init__(self, target: Any, sheets: SheetsClient | None = None) -> None:
+        self._target = target
+        self._sheets = sheets or client
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._target, name)
+        if name == "spreadsheet" and attr is not None:
+            return Throttled(attr, self._sheets)
+        if not callable(attr):
+            return attr
+        sheets = self._sheets
+
+        def _call(*args: Any, **kwargs: Any) -> Any:
+            if name in COALESCED:
+                key: Tuple[Any, ...] = (id(self._target), name, repr(args), repr(sorted(kwargs.items())))
+                return sheets.read(key, attr, *args, **kwargs)
+            return sheets.call(attr, *args, **kwargs)
+
+        return _call
+
+
+client = SheetsClient()
+
+
+def throttled(target: Any) -> Throttled:
+    """gspread Worksheet / Spreadsheet → прокси под общим лимитером процесса."""
+    return target if isinstance(target, Throttled) else Throttled(target)
+
+
+def retrying(fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """Разовый вызов API (open_by_key и т.п.) под общим лимитером процесса."""
+    return client.call(fn, *args, **kwargs)
@@ -15,6 +15,10 @@ TEMPLATE = """
 • list_all_products – возвращает JSON {{row: «модель»}}.  
 • store_mapping      – {{mapping: index→row}} кладёт индексы в память сессии.  
 • get_fields_by_index – {{indices:[…]}} → JSON полей строки (Производитель, Серия, Состояние, Цена и т.д.).
+• filter_products    – {{brand?, series?, condition?}} → только подходящие строки с полями (индекс в Redis, без выгрузки всего каталога).
+• group_counts       – {{field: brand|series|condition, filters?}} → {{counts: {{значение: кол-во}}, total}} – готовые группы.
+• range_products     – {{field: price|hashrate|power, min_value?, max_value?, near?, order?, limit?}} → строки по числовому индексу.
+• search_products    – {{query, limit?}} → строки, ранжированные по похожести названия (сленг, опечатки, кириллица).
 
 ❕ **Формат ReAct**  
 Question: <вопрос клиента или уточнение от старшего агента>  
@@ -30,11 +34,9 @@ Final Answer: <готовый текст для клиента без мысле
 
 ### Алгоритм «какие ASIC есть?»
 
-1. **Action → list_all_products** (без аргументов).  
-2. **Action → store_mapping** – построить mapping: `{1:row1, 2:row2, …}`.  
-3. **Action → get_fields_by_index** – запросить все индексы, вытащить поля *Производитель*, *Линейка*, *Состояние*.  
-4. Если моделей **> 7** → сгруппировать по *Производитель*, посчитать кол-во:  
-   *Draft*:  
+1. **Action → group_counts** `{{"field": "brand"}}` – одним вызовом получить
+   кол-во моделей по *Производитель* (без list_all_products / get_fields_by_index).  
+2. Если `total` **> 7** → *Draft* по полученным counts:  
 
 У нас есть:
 
@@ -43,10 +45,35 @@ Bitmain (34 моделей)
 WhatsMiner (27)
 …
 Какой бренд интересует?
-5. Если моделей ≤ 7 → вывести нумерованный список `[index] Модель` и попросить номера.  
-6. После выбора бренда/линейки/состояния – сужать так же, пока не ≤ 7 позиций.  
+3. Если `total` ≤ 7 → **Action → filter_products** (или list_all_products, если фильтров нет),
+   **Action → store_mapping** – mapping `{{1:row1, 2:row2, …}}`,
+   вывести нумерованный список `[index] Модель` и попросить номера.  
+4. Дальше группировать так же по *Линейка* / *Состояние*:
+   `{{"field": "series", "filters": {{"brand": "<выбранный>"}}}}`.  
+5. Если group_counts вернул пустые counts – откатиться к старой схеме:
+   list_all_products → store_mapping → get_fields_by_index.  
+6. После выбора бренда/линейки/состояния – **Action → filter_products** с этими фильтрами
+   (не list_all_products + get_fields_by_index), сужать так же, пока не ≤ 7 позиций.  
 7. Получив финальные индексы, вернуть **цену, хэшрейт, потребление**.
 
+### Экономия контекста
+
+Каждый Observation повторно уходит в LLM на следующих шагах – запрашивай минимум:
+`"fields": ["Модель", "Цена продажи", "Хэшрейт"]`, `"compact": true` (таблица вместо JSON),
+`"limit"` / `"offset"` для длинных списков (в ответе будет `next_offset`).
+
+### Клиент назвал модель («вотсмайнер m50s», «с19 про»)
+
+**Action → search_products** `{{"query": "<как написал клиент>"}}` – берём лучшие строки,
+не выгружая list_all_products.
+
+### Бюджет / хэшрейт / «что дешевле»
+
+«до 2000$» → `{{"field": "price", "max_value": 2000}}`,
+«около 110 TH» → `{{"field": "hashrate", "near": 110}}`,
+«что дешевле» / «самый мощный» → `order` asc / desc + `limit`.
+Не сравнивай цены сам по выгрузке всего каталога – используй **range_products**.
+
 ⚠️ Никогда не хардкодь бренды или серии – группируй по тем полям, которые реально пришли из Redis.
 
 {tools}
@@ -60,8 +87,12 @@ Thought:{agent_scratchpad}
 """.strip()
 
 
-def build(memory: CombinedMemory, llm: ChatOpenAI) -> AgentExecutor:
-    tools = catalog_tools()
+def build(memory: CombinedMemory | None, llm: ChatOpenAI, session_id: str | None = None) -> AgentExecutor:
+    """
+    memory=None, session_id=None – executor общий на процесс: память подаётся
+    при вызове, сессия инструментов – tools_catalog.session_scope().
+    """
+    tools = catalog_tools(session_id)
     tool_names = [t.name for t in tools]
 
     prompt = PromptTemplate(
@@ -17,12 +17,14 @@ Intent-Agent
 
 from __future__ import annotations
 import json, re
-from typing import Dict
+from collections import Counter
+from typing import Any, Dict
 from langchain_openai import ChatOpenAI
 from langchain.chains import LLMChain
 from langchain_core.prompts import ChatPromptTemplate
 from langchain.memory import CombinedMemory
 from langchain.agents import AgentExecutor
+from salesbot.subagents import intent_rules
 
 
 # ╔════════════════════════════════════════════════════════╗
@@ -119,8 +121,8 @@ PROMPT = ChatPromptTemplate.from_messages(
 # ╔════════════════════════════════════════════════════════╗
 #                     AGENT-СТРОИТЕЛЬ
 # ╚════════════════════════════════════════════════════════╝
-def build(mem: CombinedMemory, llm: ChatOpenAI) -> AgentExecutor:
-    """Возвращает Executor для определения интентов."""
+def build(mem: CombinedMemory | None, llm: ChatOpenAI) -> AgentExecutor:
+    """Возвращает Executor для определения интентов (mem=None – общий на процесс)."""
     chain = LLMChain(llm=llm, prompt=PROMPT, memory=mem, verbose=False)
     return AgentExecutor(agent=chain, tools=[], memory=mem, verbose=False)
 
@@ -128,12 +130,22 @@ def build(mem: CombinedMemory, llm: ChatOpenAI) -> AgentExecutor:
 # ╔════════════════════════════════════════════════════════╗
 #                СИНХРОННЫЙ ВЫЗОВ ВНЕ ЧЕЙНА
 # ╚════════════════════════════════════════════════════════╝
-def classify(message: str, exe: AgentExecutor):
-    """
-    Вспомогательная функция: быстро получить dict {intent, entities}
-    без try/except-шуму в оркестраторе.
-    """
-    raw = exe.invoke({"input": message})["output"]
+# сколько реплик решили правила, а сколько ушло в LLM (см. fast_path_report)
+fast_path_stats: Dict[str, Any] = {"rules": 0, "llm": 0, "by_intent": Counter()}
+
+
+def _fast(message: str, min_confidence: float | None) -> Dict[str, Any] | None:
+    threshold = intent_rules.MIN_CONFIDENCE if min_confidence is None else min_confidence
+    fast = intent_rules.classify(message)
+    if fast["confidence"] >= threshold:
+        fast_path_stats["rules"] += 1
+        fast_path_stats["by_intent"][fast["intent"]] += 1
+        return {"intent": fast["intent"], "entities": fast["entities"]}
+    fast_path_stats["llm"] += 1
+    return None
+
+
+def _parse(raw: str) -> Dict[str, Any]:
     try:
         data = json.loads(raw)
         if isinstance(data, dict) and "intent" in data and "entities" in data:
@@ -141,3 +153,38 @@ def classify(message: str, exe: AgentExecutor):
     except Exception: 
         pass
     return {"intent": "other", "entities": {}}
+
+
+def classify(message: str, exe: AgentExecutor, min_confidence: float | None = None):
+    """
+    Вспомогательная функция: быстро получить dict {intent, entities}
+    без try/except-шуму в оркестраторе.
+
+    Сначала – intent_rules.classify(): если правило уверено
+    (confidence ≥ min_confidence), LLM не вызывается.
+    """
+    fast = _fast(message, min_confidence)
+    if fast is not None:
+        return fast
+    return _parse(exe.invoke({"input": message})["output"])
+
+
+async def aclassify(message: str, exe: AgentExecutor, min_confidence: float | None = None):
+    """classify() для gateway: LLM-детектор через exe.ainvoke."""
+    fast = _fast(message, min_confidence)
+    if fast is not None:
+        return fast
+    return _parse((await exe.ainvoke({"input": message}))["output"])
+
+
+def fast_path_report() -> Dict[str, Any]:
+    """{turns, rules, llm, hit_rate, by_intent} – доля реплик без LLM-классификации."""
+    rules, llm = fast_path_stats["rules"], fast_path_stats["llm"]
+    turns = rules + llm
+    return {
+        "turns": turns,
+        "rules": rules,
+        "llm": llm,
+        "hit_rate": round(rules / turns, 3) if turns else 0.0,
+        "by_intent": dict(fast_path_stats["by_intent"]),
+    }
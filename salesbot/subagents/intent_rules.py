@@ -0,0 +1,187 @@
+"""
+Intent-Rules
+────────────
+Детерминированный пре-классификатор перед LLM-детектором намерений
+(intent.classify). Правила повторяют триггеры и форматы сущностей из
+INTENT_SPECS / SYSTEM_MSG:
+
+•  контакт (телефон 7-11 цифр, @telegram / t.me/…, e-mail)  → schedule_call
+•  чистое приветствие / благодарность / прощание               → greeting
+•  ценовые слова («сколько стоит», «почём», «цена», «прайс»), наличие /
+   характеристики рядом с моделью, «какие асики есть»          → catalog_query
+   + brand / model / hash_rate / budget / condition из текста
+
+classify() всегда возвращает {intent, entities, confidence, rule};
+confidence – насколько правилу можно верить без LLM. Смешанные реплики
+(«сколько стоит доставка», «дорого, перезвоните») получают низкий
+confidence и уходят в LLM.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+from typing import Any, Dict, List, Tuple
+
+# ── контакты ─────────────────────────────────────────────────────────
+EMAIL_RE = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+TELEGRAM_RE = re.compile(r"(?:(?<![\w.])@|\b(?:t|telegram)\.me/)([A-Za-z][A-Za-z0-9_]{3,31})\b")
+PHONE_RE = re.compile(r"(?<![\w+])\+?\d[\d\s\-()]{5,16}\d(?![\d])")
+# число, за которым валюта / единица, – не телефон («1 500 000 ₽»)
+_NOT_PHONE_TAIL = re.compile(r"\s*(?:₽|\$|руб|р\.|usdt|usd|т\.?р|k\b|к\b|th|т[hх]|w\b|вт|шт)", re.I)
+CALL_WORDS = re.compile(
+    r"позвон|перезвон|звонит|звонок|созвон|набер|номер|телефон|тел\.|пишите|напишите|"
+    r"свяж|контакт|whatsapp|ватсап|вотсап|телеграм|telegram|тг\b|почт", re.I)
+
+# ── приветствия ──────────────────────────────────────────────────────
+GREETING_RE = re.compile(
+    r"\b(?:прив(?:ет|етик|етствую)?|здравствуй(?:те)?|здрасьте|добр(?:ый|ое|ого)\s+"
+    r"(?:день|дня|вечер|вечера|утро|утра)|доброго\s+времени\s+суток|хай|салют|hi|hello|hey|"
+    r"спасибо|благодарю|спс|пока|до\s+свидания|всего\s+доброго|хорошего\s+дня)\b", re.I)
+# слова, которые могут стоять рядом с приветствием, не меняя интента
+_GREETING_FILLER = {"всем", "вам", "большое", "огромное", "ещё", "еще", "и", "вас", "тебе",
+                    "ок", "окей", "ok", "да", "ага", "понял", "поняла", "ясно", "хорошо", "за", "помощь"}
+
+# ── каталог / цена ───────────────────────────────────────────────────
+PRICE_RE = re.compile(
+    r"сколько\s+сто|по\s?ч[её]м|цен[аыуеой]|стоимост|прайс|price", re.I)
+# наличие / характеристики – catalog_query, если рядом модель или бренд
+CATALOG_RE = re.compile(
+    r"наличи|интерес|есть\s+ли|характеристик|х[эе]шрейт|сравн|что\s+лучше|дешевле", re.I)
+# «какие асики есть», «ассортимент» – catalog_query и без модели
+ASSORTMENT_RE = re.compile(
+    r"какие\s+(?:\w+\s+)?(?:асики|asic\w*|модели|майнеры|аппараты)|ассортимент|что\s+есть\s+(?:в\s+наличии|до)", re.I)
+BRANDS: Dict[str, str] = {
+    "bitmain": "Bitmain", "битмейн": "Bitmain", "битмаин": "Bitmain",
+    "antminer": "Antminer", "антмайнер": "Antminer", "антик": "Antminer",
+    "whatsminer": "WhatsMiner", "вотсмайнер": "WhatsMiner", "ватсмайнер": "WhatsMiner",
+    "microbt": "MicroBT", "avalon": "Avalon", "авалон": "Avalon", "canaan": "Canaan",
+    "iceriver": "IceRiver", "айсривер": "IceRiver", "goldshell": "Goldshell",
+    "голдшелл": "Goldshell", "jasminer": "Jasminer",
+}
+_BRAND_RE = re.compile(r"\b(" + "|".join(BRANDS) + r")\b", re.I)
+# S19, S19j Pro, S21 XP, M30S++, M50S, T21, L7, KS3, A1346
+MODEL_RE = re.compile(
+    r"\b([A-Za-z]{1,2}\d{1,4}[A-Za-z]{0,3}(?:\+\+|\+)?(?:\s+(?:pro|xp|hyd|hydro|plus))?)(?![\w+])", re.I)
+HASHRATE_RE = re.compile(r"(\d+(?:[.,]\d+)?)\s*(?:th/s|ths|th|тх|t(?![a-zа-я])|т(?![a-zа-я]))", re.I)
+# левая граница: «S19k», «L7 9500k» – цифры модели не начало бюджета
+BUDGET_RE = re.compile(r"(?<![A-Za-zА-Яа-яЁё\d])(\d[\d\s]*(?:[.,]\d+)?\s*(?:₽|\$|usdt|руб\w*|р\.|тыс\w*|k\b|к\b))", re.I)
+CONDITION_RE = re.compile(r"\b(нов(?:ый|ые|ая)|б/?у|бу|восстановлен\w*)\b", re.I)
+
+# что-то кроме цены модели: логистика / сервис → presentation, сомнения → objection
+_PRESENTATION_RE = re.compile(r"доставк|логистик|монтаж|настройк|размещени|хостинг|услуг|компани|кто вы", re.I)
+_OBJECTION_RE = re.compile(r"дорог|шум|окуп|гаранти|сгор|розетк|перегре|не уверен|сомнева", re.I)
+
+# с этого confidence результат правил берётся без LLM
+MIN_CONFIDENCE = float(os.getenv("FAST_INTENT_MIN_CONFIDENCE", "0.85"))
+
+
+def _phones(text: str) -> List[str]:
+    out = []
+    for m in PHONE_RE.finditer(text):
+        digits = re.sub(r"\D", "", m.group())
+        if 7 <= len(digits) <= 11 and not _NOT_PHONE_TAIL.match(text, m.end()):
+            out.append(m.group().strip())
+    return out
+
+
+def _contact(text: str) -> Tuple[Dict[str, Any], float] | None:
+    entities: Dict[str, Any] = {}
+    rest = text
+    emails = EMAIL_RE.findall(rest)
+    if emails:
+        entities["email"] = emails[0]
+        rest = EMAIL_RE.sub(" ", rest)
+    tg = TELEGRAM_RE.search(rest)
+    if tg:
+        entities["telegram"] = "@" + tg.group(1)
+        rest = TELEGRAM_RE.sub(" ", rest)
+    phones = _phones(rest)
+    if phones:
+        entities["phone"] = phones[0]
+        for p in phones:
+            rest = rest.replace(p, " ")
+    if not entities:
+        return None
+    words = re.findall(r"[^\W\d_]+", rest)
+    # «мой номер …», «звоните: …» – контакт и есть реплика; длинный текст вокруг – решает LLM
+    confidence = 0.95 if len(words) <= 3 or (CALL_WORDS.search(rest) and len(words) <= 8) else 0.7
+    if PRICE_RE.search(rest) or _OBJECTION_RE.search(rest):
+        confidence = 0.6
+    return entities, confidence
+
+
+def _greeting(text: str) -> float | None:
+    if not GREETING_RE.search(text):
+        return None
+    rest = GREETING_RE.sub(" ", text)
+    words = [w for w in re.findall(r"[^\W\d_]+", rest.casefold()) if w not in _GREETING_FILLER]
+    return 0.95 if not words else None
+
+
+def catalog_entities(text: str) -> Dict[str, Any]:
+    """brand / model / hash_rate / budget / condition в формате SYSTEM_MSG."""
+    entities: Dict[str, Any] = {}
+    brand = _BRAND_RE.search(text)
+    if brand:
+        entities["brand"] = BRANDS[brand.group(1).casefold()]
+    models = [m.span(1) for m in MODEL_RE.finditer(text) if re.search(r"\d", m.group(1))]
+    # бюджет, залезающий на модель («S19k pro» → «19k»), – часть названия
+    budget = next((m for m in BUDGET_RE.finditer(text)
+                   if not any(a < m.end(1) and m.start(1) < b for a, b in models)), None)
+    if budget:
+        entities["budget"] = budget.group(1).strip()
+    hashrate = HASHRATE_RE.search(text)
+    if hashrate:
+        entities["hash_rate"] = f"{hashrate.group(1)} TH/s"
+    taken = [m.span() for m in (budget, hashrate) if m]
+    for m in MODEL_RE.finditer(text):
+        if any(a <= m.start() < b for a, b in taken) or not re.search(r"\d", m.group(1)):
+            continue
+        entities["model"] = m.group(1)
+        break
+    condition = CONDITION_RE.search(text)
+    if condition:
+        raw = condition.group(1).casefold()
+        entities["condition"] = ("бу" if raw.replace("/", "") == "бу"
+                                 else "новый" if raw.startswith("нов") else "восстановленный")
+    return entities
+
+
+def _catalog(text: str) -> Tuple[Dict[str, Any], float] | None:
+    price, catalog, assortment = (PRICE_RE.search(text), CATALOG_RE.search(text),
+                                  ASSORTMENT_RE.search(text))
+    if not (price or catalog or assortment):
+        return None
+    entities = catalog_entities(text)
+    if _PRESENTATION_RE.search(text) or _OBJECTION_RE.search(text):
+        return entities, 0.5
+    if assortment or "model" in entities or "brand" in entities:
+        return entities, 0.9
+    return entities, 0.8 if price else 0.5
+
+
+def classify(message: str) -> Dict[str, Any]:
+    """
+    {intent, entities, confidence, rule}. Если ни одно правило не сработало
+    или сработали правила разных интентов – confidence ≤ 0.5.
+    """
+    text = (message or "").strip()
+    hits: List[Tuple[str, str, Dict[str, Any], float]] = []
+
+    contact = _contact(text)
+    if contact:
+        hits.append(("contact", "schedule_call", *contact))
+    greeting = _greeting(text)
+    if greeting is not None:
+        hits.append(("greeting", "greeting", {}, greeting))
+    catalog = _catalog(text)
+    if catalog:
+        hits.append(("catalog", "catalog_query", *catalog))
+
+    if not hits:
+        return {"intent": "other", "entities": {}, "confidence": 0.0, "rule": None}
+    rule, intent, entities, confidence = max(hits, key=lambda h: h[3])
+    if len({h[1] for h in hits}) > 1:
+        confidence = min(confidence, 0.5)
+    return {"intent": intent, "entities": entities, "confidence": confidence, "rule": rule}
@@ -107,6 +107,7 @@ PROMPT = ChatPromptTemplate.from_messages(
 # ──────────────────────────────────────────────────────────────
 # 3. Builder
 # ──────────────────────────────────────────────────────────────
-def build(shared: CombinedMemory, llm: ChatOpenAI) -> AgentExecutor:
+def build(shared: CombinedMemory | None, llm: ChatOpenAI) -> AgentExecutor:
+    """shared=None – executor без памяти, общий на процесс (память подаёт оркестратор)."""
     chain = LLMChain(llm=llm, prompt=PROMPT, memory=shared, verbose=True)
     return AgentExecutor(agent=chain, tools=[], memory=shared, verbose=True)
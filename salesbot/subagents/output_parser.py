@@ -16,6 +16,9 @@ import re
 from langchain.schema.agent import AgentAction, AgentFinish
 from langchain.agents import AgentOutputParser
 
+# маркер финального шага ReAct – по нему же стример оркестратора начинает отдавать токены
+FINAL_ANSWER = "Final Answer:"
+
 ACTION_RE = re.compile(
     r"^Action:\s*([^\n]+)\nAction Input:\s*(.+)", re.S | re.M
 )
@@ -25,8 +28,8 @@ class FixingOutputParser(AgentOutputParser):
     """Универсальный output-parser для ReAct-агентов."""
 
     def parse(self, text: str) -> AgentAction | AgentFinish:
-        if "Final Answer:" in text:
-            final = text.split("Final Answer:", 1)[1].strip()
+        if FINAL_ANSWER in text:
+            final = text.split(FINAL_ANSWER, 1)[1].strip()
             return AgentFinish(return_values={"output": final}, log=text)
 
         m = ACTION_RE.search(text)
@@ -1,42 +1,310 @@
-import os, string, time, json, datetime as dt
+import os, time, json, hashlib, random, argparse, threading
 import gspread
+from redis.exceptions import LockError
+from gspread.utils import rowcol_to_a1
 from oauth2client.service_account import ServiceAccountCredentials
 from dotenv import load_dotenv
-from redis_cache import cache_rows, cache_row, KEY_TIMESTAMP, r
+from redis_cache import (
+    stage_catalog, publish_version, discard_version, gc_versions, catalog_memory,
+    load_rows, load_rows_many, CATALOG_FORMAT, CATALOG_SQLITE, KEY_CURRENT, r,
+)
+from catalog_index import build_indexes
+from catalog_sqlite import write_catalog
+from sheets_client import retrying, throttled
 
 load_dotenv()
 
-def sync():
+KEY_MEMORY      = "asic:sync:memory"        # catalog_memory() после прошлой записи
+KEY_FINGERPRINT = "asic:sync:fingerprint"   # отпечаток листа на момент последнего полного fetch
+KEY_FULL_AT     = "asic:sync:full_at"       # unix-время последнего полного fetch
+KEY_LEADER      = "asic:sync:leader"        # redis-lock: какой узел сейчас синкает
+
+SYNC_INTERVAL = int(os.getenv("SYNC_INTERVAL", "60"))
+# пробный диапазон, если ревизия таблицы недоступна (нет Drive scope / старый gspread):
+# заголовок + первые строки – один маленький запрос; лучше – ячейка с контрольной
+# суммой листа (например, "Z1" с =SUM(…)), правки вне диапазона ловит FORCE_EVERY
+PROBE_RANGE = os.getenv("SYNC_PROBE_RANGE", "1:10")
+# полный fetch не реже чем раз в N сек. даже при том же отпечатке:
+# пробный диапазон не видит правок в остальных колонках
+FORCE_EVERY = int(os.getenv("SYNC_FORCE_SEC", "3600"))
+# строк листа на один запрос: ограничивает размер ответа API, а не память процесса –
+# stage_catalog / build_indexes / write_catalog получают все записи листа разом
+CHUNK_ROWS = int(os.getenv("SYNC_CHUNK_ROWS", "5000"))
+# аренда лидера: умерший узел отдаёт лидерство не позже чем через LEASE_SEC
+LEASE_SEC = int(os.getenv("SYNC_LEASE_SEC", "30"))
+# ±доля интервала, чтобы узлы, стартовавшие вместе, не били в API синхронно
+JITTER = float(os.getenv("SYNC_JITTER", "0.1"))
+
+
+class LeaderLease:
+    """
+    Лидерство sync'а на redis-lock'е asic:sync:leader с арендой `lease` сек.
+
+    •  acquire() – неблокирующе берёт лок или продлевает свой;
+    •  пока узел лидер, фоновый поток продлевает аренду каждые lease/3 сек.
+       (и во время долгого fetch'а, и между проходами) – остальные узлы
+       стоят в standby и забирают лидерство, только когда аренда истекла;
+    •  renew() – синхронная проверка перед публикацией версии: если аренду
+       уже забрали, результат прохода выбрасывается.
+    """
+
+    def __init__(self, client=None, name: str = KEY_LEADER, lease: int = LEASE_SEC) -> None:
+        self.lease = lease
+        # thread_local=False: токен нужен и потоку продления
+        self._lock = (client or r).lock(name, timeout=lease, blocking=False, thread_local=False)
+        self._stop = threading.Event()
+        self._renewer: threading.Thread | None = None
+
+    @property
+    def held(self) -> bool:
+        return self._renewer is not None and self._renewer.is_alive()
+
+    def acquire(self) -> bool:
+        if self.held:
+            return self.renew()
+        try:
+            if not self._lock.acquire():
+                return False
+        except LockError:
+            return False
+        self._stop.clear()
+        self._renewer = threading.Thread(target=self._renew_loop, daemon=True,
+                                         name="sync-leader-lease")
+        self._renewer.start()
+        return True
+
+    def renew(self) -> bool:
+        try:
+            self._lock.reacquire()
+            return True
+        except LockError:
+            self._stop.set()
+            return False
+
+    def release(self) -> None:
+        self._stop.set()
+        if self._renewer is not None:
+            self._renewer.join()
+            self._renewer = None
+        try:
+            self._lock.release()
+        except LockError:
+            pass            # аренда уже истекла / у другого узла
+
+    def _renew_loop(self) -> None:
+        while not self._stop.wait(self.lease / 3):
+            try:
+                if not self.renew():
+                    print("⚠️  sync leader lease lost")
+                    return
+            except Exception as e:      # Redis недоступен – дадим аренде истечь
+                print("⚠️  sync leader renew error:", e)
+
+
+def open_sheet():
     creds_path = os.path.join(
         os.path.dirname(__file__),
         "technologydynamicsasiccalc-76e05fa1a200.json"
     )
     creds   = ServiceAccountCredentials.from_json_keyfile_name(creds_path)
     client  = gspread.authorize(creds)
-    sheet   = client.open_by_key(os.getenv("GOOGLE_SHEET_ID")).sheet1
+    # все запросы листа – под общим лимитером / повторами / single-flight
+    return throttled(retrying(client.open_by_key, os.getenv("GOOGLE_SHEET_ID")).sheet1)
+
+
+def sheet_fingerprint(sheet) -> str:
+    """
+    Дешёвый отпечаток листа – один запрос к API:
+    •  время последней правки таблицы из Drive-метаданных (gspread ≥ 6,
+       get_lastUpdateTime() читает их заново на каждый вызов);
+    •  иначе blake2b пробного диапазона SYNC_PROBE_RANGE. Свойство
+       lastUpdateTime старых gspread не берём: оно закэшировано при открытии
+       листа, и долгоживущий sheet никогда не увидел бы правку.
+    """
+    getter = getattr(getattr(sheet, "spreadsheet", None), "get_lastUpdateTime", None)
+    try:
+        revision = getter() if getter else None
+    except (AttributeError, KeyError, gspread.exceptions.GSpreadException):
+        revision = None
+    if revision:
+        return f"rev:{revision}"
+    probe = json.dumps(sheet.get(PROBE_RANGE), ensure_ascii=False)
+    return "probe:" + hashlib.blake2b(probe.encode(), digest_size=16).hexdigest()
+
+
+def iter_rows(sheet, n_cols: int, chunk_rows: int | None = None):
+    """
+    (row, values) листа окнами A{i}:{col}{i+chunk-1} – по одному запросу на окно.
+
+    Границы – из размеров сетки листа (row_count / n_cols), а не «до 10000».
+    row_count берётся из метаданных на момент открытия листа, поэтому, пока
+    последнее окно заполнено до конца, читаем дальше – вдруг строки дописали.
+    """
+    chunk = chunk_rows or CHUNK_ROWS
+    start = 2
+    while True:
+        end = start + chunk - 1
+        window = sheet.get(f"{rowcol_to_a1(start, 1)}:{rowcol_to_a1(end, n_cols)}")
+        for offset, values in enumerate(window):
+            yield start + offset, values
+        if end >= sheet.row_count and len(window) < chunk:
+            return
+        start = end + 1
 
-    headers = sheet.get("A1:Z1")[0]
-    cols    = {h: string.ascii_uppercase[i] for i, h in enumerate(headers)}
 
-    models = sheet.get("A2:A10000")
-    rows_dict = {idx + 2: row[0] for idx, row in enumerate(models) if row}
-    cache_rows(rows_dict)
+def fetch_records(sheet, chunk_rows: int | None = None):
+    """
+    headers + {row: {header: value}} всего листа.
 
-    ranges = [f"{cols[h]}2:{cols[h]}10000" for h in headers]
-    columns = sheet.batch_get(ranges)
+    Все записи собираются в один dict – пик памяти sync'а растёт с размером
+    листа при любом окне (digest'ы, индексы и SQLite-файл строятся по всему
+    каталогу); окна ограничивают только размер одного запроса.
 
-    for i, row_idx in enumerate(rows_dict.keys()):
-        data = {headers[col]: columns[col][i][0] if columns[col][i] else ""
-                for col in range(len(headers))}
-        cache_row(row_idx, data)
+    Строка без модели (пустая колонка A) пропускается; номер строки берётся из
+    позиции в окне, поэтому пустые строки не сдвигают остальные колонки.
+    """
+    header_row = sheet.get("1:1")        # вся первая строка, сколько бы колонок ни было
+    headers = header_row[0] if header_row else []
+    n = len(headers)
+    records = {}
+    if not n:
+        return headers, records
+    for row, values in iter_rows(sheet, n, chunk_rows):
+        if not values or not values[0]:
+            continue
+        values = values + [""] * (n - len(values))
+        records[row] = dict(zip(headers, values))
+    return headers, records
+
+
+def _mark_fetched(fingerprint: str) -> None:
+    """Отпечаток – только когда содержимое листа уже в опубликованной версии."""
+    r.mset({KEY_FINGERPRINT: fingerprint, KEY_FULL_AT: time.time()})
+
+
+def sync(sheet=None, force: bool = False, leader: LeaderLease | None = None):
+    """
+    Один проход sync'а. Сначала сверяет отпечаток листа с прошлым – если он
+    тот же (и FORCE_EVERY не истёк), полный fetch пропускается и возвращается
+    None. Иначе – delta {added, changed, removed, unchanged}; новая версия
+    каталога публикуется в asic:current + CHANNEL_CATALOG.
+
+    С `leader` версия публикуется, только если аренда ещё наша, – иначе она
+    отбрасывается и возвращается None; отпечаток при этом не пишется, так что
+    новый лидер перечитает лист, а не пропустит неопубликованную правку.
+    """
+    sheet = sheet or open_sheet()
+    fingerprint = sheet_fingerprint(sheet)
+    stale = time.time() - float(r.get(KEY_FULL_AT) or 0) >= FORCE_EVERY
+    if not force and not stale and fingerprint == r.get(KEY_FINGERPRINT):
+        gc_versions()
+        print("✔ Google Sheet unchanged : fingerprint", fingerprint)
+        return None
+
+    headers, records = fetch_records(sheet)
+
+    # новая версия пишется рядом с текущей, боты видят её только после publish
+    version, delta = stage_catalog(headers, records)
+    summary = " ".join(f"{k}={v}" for k, v in delta.items())
+    if version is None:
+        _mark_fetched(fingerprint)
+        gc_versions()
+        print("✔ Google Sheet unchanged :", len(records), "rows", f"({summary})")
+        return delta
+
+    # сбой между stage и publish: версию – в GC, отпечаток не пишется,
+    # следующий проход прочитает лист заново
+    try:
+        build_indexes(records, version)
+        if leader is not None and not leader.renew():
+            # отпечаток ещё не записан – правку опубликует следующий лидер
+            discard_version(version)
+            print("⚠️  sync leader lease lost – version", version, "discarded")
+            return None
+        # локальный снапшот – до publish: по сообщению pub/sub файл уже новый
+        if CATALOG_SQLITE:
+            write_catalog(headers, records, version, CATALOG_SQLITE)
+        dropped = publish_version(version)
+    except Exception:
+        if r.get(KEY_CURRENT) != str(version):      # упало до публикации
+            discard_version(version)
+        raise
+    _mark_fetched(fingerprint)
+
+    # отчёт о памяти – только когда каталог реально поменялся
+    before = json.loads(r.get(KEY_MEMORY) or '{"keys": 0, "bytes": 0}')
+    after = catalog_memory()
+    r.set(KEY_MEMORY, json.dumps(after))
+
+    t0 = time.perf_counter()
+    load_rows_many(load_rows(version), version)
+    decode_ms = (time.perf_counter() - t0) * 1000
+
+    print(f"✔ Google Sheet synced → Redis v{version} :", len(records), "rows", f"({summary})")
+    if dropped:
+        print("  gc: dropped versions", dropped)
+    print(_memory_report(before, after, len(records), decode_ms))
+    return delta
+
+
+def _memory_report(before, after, n_rows, decode_ms) -> str:
+    def _fmt(m):
+        if m["bytes"] is None:
+            return f"{m['keys']} keys / n/a"
+        return f"{m['keys']} keys / {m['bytes'] / 1024:.1f} KiB"
+
+    line = (f"  format={CATALOG_FORMAT}  memory: {_fmt(before)} → {_fmt(after)}"
+            f"  full decode: {decode_ms:.1f} ms")
+    if after["bytes"] and n_rows:
+        line += f"  (~{after['bytes'] / n_rows:.0f} B/row)"
+    return line
+
+
+def jittered(interval: float, jitter: float = JITTER) -> float:
+    return max(interval * random.uniform(1 - jitter, 1 + jitter), 0.0)
+
+
+def run(interval: float = SYNC_INTERVAL, once: bool = False, force: bool = False) -> None:
+    """
+    Цикл sync'а с выбором лидера: синкает только узел, держащий аренду,
+    остальные проверяют её раз в ~LEASE_SEC. --once – один проход (cron):
+    если лидер другой узел, просто выходим.
+    """
+    leader = LeaderLease()
+    sheet = None            # лист открывается один раз: open_by_key – тоже запрос к API
+    standby = False
+    try:
+        while True:
+            if leader.acquire():
+                if standby:
+                    print("✔ sync leader: lease acquired")
+                standby = False
+                try:
+                    sheet = sheet or open_sheet()
+                    sync(sheet, force=force, leader=leader)
+                except Exception as e:
+                    print("⚠️  sync error:", e)
+                    sheet = None
+                wait = interval
+            else:
+                if not standby:
+                    print("… sync standby: another node holds", KEY_LEADER)
+                standby = True
+                sheet = None
+                wait = min(interval, leader.lease)
+            if once:
+                return
+            force = False
+            time.sleep(jittered(wait))
+    finally:
+        leader.release()
 
-    r.set(KEY_TIMESTAMP, dt.datetime.utcnow().isoformat())
-    print("✔ Google Sheet synced → Redis :", len(rows_dict), "rows")
 
 if __name__ == "__main__":
-    while True:
-        try:
-            sync()
-        except Exception as e:
-            print("⚠️  sync error:", e)
-        time.sleep(600)
+    ap = argparse.ArgumentParser(description="Google Sheet → Redis catalog sync")
+    ap.add_argument("--once", action="store_true", help="один проход и выход (cron)")
+    ap.add_argument("--interval", type=float, default=SYNC_INTERVAL,
+                    help=f"секунд между проходами (по умолчанию {SYNC_INTERVAL}, ±{JITTER:.0%}%)")
+    ap.add_argument("--force", action="store_true", help="полный fetch без проверки отпечатка")
+    args = ap.parse_args()
+    run(args.interval, once=args.once, force=args.force)
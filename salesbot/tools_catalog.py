@@ -1,37 +1,388 @@
-import json
-from typing import Dict, List
+import inspect, json, logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import partial, wraps
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
 from pydantic import BaseModel, Field
 from langchain.tools import StructuredTool, Tool
-from redis_cache import load_rows, load_row
+from redis_cache import (
+    snapshot, store_session_mapping, load_session_mapping,
+    astore_session_mapping, aload_session_mapping,
+)
+from catalog_index import (
+    INDEX_FIELDS, RANGE_FIELDS,
+    filter_rows, group_counts, index_values, range_rows, search_rows,
+    afilter_rows, agroup_counts, aindex_values, arange_rows, asearch_rows,
+)
 
-session_mapping: Dict[int, int] = {}
+try:
+    import tiktoken
+except ImportError:     # без tiktoken – грубая оценка по длине
+    tiktoken = None
+
+log = logging.getLogger(__name__)
+
+DEFAULT_SESSION = "default"
+# сессия текущего вызова для инструментов без привязки (catalog_tools() без session_id):
+# один набор инструментов / executor на процесс, session_id – через session_scope()
+current_session: ContextVar[str] = ContextVar("catalog_session", default=DEFAULT_SESSION)
+
+
+@contextmanager
+def session_scope(session_id: str):
+    """Внутри блока store_mapping / get_fields_by_index работают с mapping'ом session_id."""
+    token = current_session.set(session_id)
+    try:
+        yield
+    finally:
+        current_session.reset(token)
+
+# tool → {calls, tokens, max}: размер observation, которые уходят в scratchpad
+observation_stats: Dict[str, Dict[str, int]] = {}
+
+class _ViewIn(BaseModel):
+    fields: Optional[List[str]] = Field(None, description="Только эти колонки, напр. [\"Цена продажи\", \"Хэшрейт\"]")
+    compact: bool = Field(False, description="true → таблица row|поле|… вместо JSON (короче)")
+
+class _PageIn(BaseModel):
+    offset: int = Field(0, description="Сколько строк пропустить")
+    limit: Optional[int] = Field(None, description="Сколько строк вернуть (по умолчанию все)")
+
+class _ListIn(_PageIn):
+    compact: bool = Field(False, description="true → строки «row|модель» вместо JSON")
 
-class _Empty(BaseModel):  ...
 class _MapIn(BaseModel):
     mapping: Dict[int, int] = Field(..., description="index→row")
 
-class _IdsIn(BaseModel):
+class _IdsIn(_ViewIn, _PageIn):
     indices: List[int]
 
-def list_all_products(_: None = None) -> str:
-    return json.dumps(load_rows(), ensure_ascii=False)
+class _FilterIn(BaseModel):
+    brand: Optional[str] = Field(None, description="Производитель, напр. Bitmain")
+    series: Optional[str] = Field(None, description="Линейка, напр. S19")
+    condition: Optional[str] = Field(None, description="Состояние: новый | бу | восстановленный")
+
+class _FilterPageIn(_FilterIn, _ViewIn, _PageIn):  ...
+
+class _GroupIn(BaseModel):
+    field: str = Field(..., description=f"По чему группировать: {' | '.join(INDEX_FIELDS)}")
+    filters: Dict[str, str] = Field(default_factory=dict,
+                                    description="Уже выбранные значения, напр. {\"brand\": \"Bitmain\"}")
+
+class _RangeIn(_FilterIn, _ViewIn):
+    field: str = Field(..., description=f"Числовое поле: {' | '.join(RANGE_FIELDS)} ($, TH/s, W)")
+    min_value: Optional[float] = Field(None, description="Нижняя граница, напр. 100 (TH/s)")
+    max_value: Optional[float] = Field(None, description="Верхняя граница, напр. 2000 ($)")
+    near: Optional[float] = Field(None, description="«около N» – ±10 %, по близости")
+    order: str = Field("asc", description="asc – дешевле/слабее сначала, desc – наоборот")
+    limit: int = Field(7, description="Сколько строк вернуть")
+
+class _SearchIn(_ViewIn):
+    query: str = Field(..., description="Название как написал клиент, напр. «вотсмайнер m50s»")
+    limit: int = Field(5, description="Сколько кандидатов вернуть")
+
+_enc: Any = None
+
+def count_tokens(text: str) -> int:
+    """Токены gpt-4o (o200k_base); без tiktoken ≈ len/3 для кириллицы."""
+    global _enc
+    if _enc is None and tiktoken is not None:
+        try:
+            _enc = tiktoken.get_encoding("o200k_base")
+        except Exception:
+            _enc = False
+    return len(_enc.encode(text)) if _enc else max(1, len(text) // 3)
+
+def _record(name: str, out: str) -> str:
+    n = count_tokens(out)
+    st = observation_stats.setdefault(name, {"calls": 0, "tokens": 0, "max": 0})
+    st["calls"] += 1
+    st["tokens"] += n
+    st["max"] = max(st["max"], n)
+    log.info("observation %s: %d tokens", name, n)
+    return out
+
+def _observed(fn: Callable[..., Any]) -> Callable[..., Any]:
+    """
+    Считает токены каждого observation инструмента (см. observation_stats).
+    Корутины a<name> пишутся в ту же статистику, что и синхронный <name>.
+    """
+    if inspect.iscoroutinefunction(fn):
+        name = fn.__name__[1:]
+
+        @wraps(fn)
+        async def _awrapper(*args, **kwargs) -> str:
+            return _record(name, await fn(*args, **kwargs))
+        return _awrapper
+
+    @wraps(fn)
+    def _wrapper(*args, **kwargs) -> str:
+        return _record(fn.__name__, fn(*args, **kwargs))
+    return _wrapper
+
+def _page(items: List[Any], offset: int, limit: Optional[int]) -> Tuple[List[Any], Dict[str, int]]:
+    chunk = items[offset: None if limit is None else offset + limit]
+    info = {"total": len(items), "offset": offset}
+    if offset + len(chunk) < len(items):
+        info["next_offset"] = offset + len(chunk)
+    return chunk, info
+
+def _cell(value: Any) -> str:
+    return str(value).replace("|", "/").replace("\n", " ")
 
-def store_mapping(mapping: Dict[int, int]) -> str:
-    session_mapping.clear()
-    session_mapping.update(mapping)
+def _render(rows: Iterable[Tuple[int, Dict[str, Any]]],
+            fields: Optional[List[str]] = None,
+            compact: bool = False,
+            extra: Optional[Tuple[str, Dict[int, Any]]] = None,
+            page: Optional[Dict[str, int]] = None,
+            envelope: bool = True) -> str:
+    """
+    Общий вывод строк каталога.
+    •  fields  – проекция колонок;  extra – доп. колонка (score / value);
+    •  compact – «row|колонка|…» вместо JSON;
+    •  page    – total/next_offset, добавляется только если страница неполная.
+    envelope=False сохраняет старый формат {row: поля} для get_fields_by_index.
+    """
+    rows = [(row, {h: data.get(h, "") for h in fields} if fields else data) for row, data in rows]
+    cut = page if page and "next_offset" in page else None
+
+    if compact:
+        cols = list(fields or dict.fromkeys(h for _, data in rows for h in data))
+        head = ["row", *cols] + ([extra[0]] if extra else [])
+        lines = ["|".join(head)]
+        for row, data in rows:
+            cells = [str(row), *(_cell(data.get(h, "")) for h in cols)]
+            if extra:
+                cells.append(_cell(extra[1].get(row, "")))
+            lines.append("|".join(cells))
+        if cut:
+            lines.append(f"… total={cut['total']} next_offset={cut['next_offset']}")
+        return "\n".join(lines)
+
+    body: Dict[str, Any] = {str(row): data for row, data in rows}
+    if envelope:
+        body = {"rows": body}
+        if extra:
+            body[extra[0] + "s"] = {str(row): v for row, v in extra[1].items()}
+    if cut:
+        body["_page" if not envelope else "page"] = cut
+    return json.dumps(body, ensure_ascii=False)
+
+def _list_out(index: Dict[Any, str], offset: int, limit: Optional[int], compact: bool) -> str:
+    items, info = _page(list(index.items()), offset, limit)
+    if compact:
+        lines = ["row|модель", *(f"{row}|{_cell(model)}" for row, model in items)]
+        if "next_offset" in info:
+            lines.append(f"… total={info['total']} next_offset={info['next_offset']}")
+        return "\n".join(lines)
+    body: Dict[str, Any] = dict(items)
+    if "next_offset" in info:
+        body["_page"] = info
+    return json.dumps(body, ensure_ascii=False)
+
+def _error(msg: str) -> str:
+    return json.dumps({"error": msg}, ensure_ascii=False)
+
+_NO_FILTER = "укажи хотя бы один фильтр: brand / series / condition"
+
+@_observed
+def list_all_products(offset: int = 0, limit: Optional[int] = None, compact: bool = False) -> str:
+    return _list_out(snapshot.rows(), offset, limit, compact)
+
+@_observed
+async def alist_all_products(offset: int = 0, limit: Optional[int] = None, compact: bool = False) -> str:
+    return _list_out(await snapshot.arows(), offset, limit, compact)
+
+def store_mapping(mapping: Dict[int, int], session_id: Optional[str] = None) -> str:
+    store_session_mapping(session_id or current_session.get(), mapping)
+    return "stored"
+
+async def astore_mapping(mapping: Dict[int, int], session_id: Optional[str] = None) -> str:
+    await astore_session_mapping(session_id or current_session.get(), mapping)
     return "stored"
 
-def get_fields_by_index(indices: List[int]) -> str:
-    rows = [session_mapping.get(i, i) for i in indices]
-    res = {str(r): load_row(r) for r in rows}
-    return json.dumps(res, ensure_ascii=False)
+@_observed
+def get_fields_by_index(indices: List[int],
+                        fields: Optional[List[str]] = None,
+                        compact: bool = False,
+                        offset: int = 0,
+                        limit: Optional[int] = None,
+                        session_id: Optional[str] = None) -> str:
+    mapping = load_session_mapping(session_id or current_session.get())
+    rows, info = _page(list(dict.fromkeys(mapping.get(i, i) for i in indices)), offset, limit)
+    data = snapshot.rows_many(rows)
+    return _render(((r, data[r]) for r in rows), fields, compact, page=info, envelope=False)
+
+@_observed
+async def aget_fields_by_index(indices: List[int],
+                               fields: Optional[List[str]] = None,
+                               compact: bool = False,
+                               offset: int = 0,
+                               limit: Optional[int] = None,
+                               session_id: Optional[str] = None) -> str:
+    mapping = await aload_session_mapping(session_id or current_session.get())
+    rows, info = _page(list(dict.fromkeys(mapping.get(i, i) for i in indices)), offset, limit)
+    data = await snapshot.arows_many(rows)
+    return _render(((r, data[r]) for r in rows), fields, compact, page=info, envelope=False)
+
+@_observed
+def filter_products(brand: Optional[str] = None,
+                    series: Optional[str] = None,
+                    condition: Optional[str] = None,
+                    fields: Optional[List[str]] = None,
+                    compact: bool = False,
+                    offset: int = 0,
+                    limit: Optional[int] = None) -> str:
+    filters = {"brand": brand, "series": series, "condition": condition}
+    if not any(filters.values()):
+        return _error(_NO_FILTER)
+    version = snapshot.version()
+    rows = filter_rows(version, **filters)
+    if not rows:
+        available = {f: index_values(f, version) for f, v in filters.items() if v}
+        return json.dumps({"rows": {}, "available": available}, ensure_ascii=False)
+    rows, info = _page(rows, offset, limit)
+    data = snapshot.rows_many(rows, version)
+    return _render(((r, data[r]) for r in rows), fields, compact, page=info)
+
+@_observed
+async def afilter_products(brand: Optional[str] = None,
+                           series: Optional[str] = None,
+                           condition: Optional[str] = None,
+                           fields: Optional[List[str]] = None,
+                           compact: bool = False,
+                           offset: int = 0,
+                           limit: Optional[int] = None) -> str:
+    filters = {"brand": brand, "series": series, "condition": condition}
+    if not any(filters.values()):
+        return _error(_NO_FILTER)
+    version = await snapshot.aversion()
+    rows = await afilter_rows(version, **filters)
+    if not rows:
+        available = {f: await aindex_values(f, version) for f, v in filters.items() if v}
+        return json.dumps({"rows": {}, "available": available}, ensure_ascii=False)
+    rows, info = _page(rows, offset, limit)
+    data = await snapshot.arows_many(rows, version)
+    return _render(((r, data[r]) for r in rows), fields, compact, page=info)
+
+@_observed
+def group_counts_tool(field: str, filters: Optional[Dict[str, str]] = None) -> str:
+    try:
+        return json.dumps(group_counts(field, filters), ensure_ascii=False)
+    except ValueError as e:
+        return _error(str(e))
+
+@_observed
+async def agroup_counts_tool(field: str, filters: Optional[Dict[str, str]] = None) -> str:
+    try:
+        return json.dumps(await agroup_counts(field, filters), ensure_ascii=False)
+    except ValueError as e:
+        return _error(str(e))
+
+@_observed
+def range_products(field: str,
+                   min_value: Optional[float] = None,
+                   max_value: Optional[float] = None,
+                   near: Optional[float] = None,
+                   order: str = "asc",
+                   limit: int = 7,
+                   brand: Optional[str] = None,
+                   series: Optional[str] = None,
+                   condition: Optional[str] = None,
+                   fields: Optional[List[str]] = None,
+                   compact: bool = False) -> str:
+    try:
+        version = snapshot.version()
+        found = range_rows(field, min_value, max_value, near, order, limit, version,
+                           brand=brand, series=series, condition=condition)
+    except ValueError as e:
+        return _error(str(e))
+    data = snapshot.rows_many((row for row, _ in found), version)
+    return _render(((row, data[row]) for row, _ in found), fields, compact,
+                   extra=("value", dict(found)))
+
+@_observed
+async def arange_products(field: str,
+                          min_value: Optional[float] = None,
+                          max_value: Optional[float] = None,
+                          near: Optional[float] = None,
+                          order: str = "asc",
+                          limit: int = 7,
+                          brand: Optional[str] = None,
+                          series: Optional[str] = None,
+                          condition: Optional[str] = None,
+                          fields: Optional[List[str]] = None,
+                          compact: bool = False) -> str:
+    try:
+        version = await snapshot.aversion()
+        found = await arange_rows(field, min_value, max_value, near, order, limit, version,
+                                  brand=brand, series=series, condition=condition)
+    except ValueError as e:
+        return _error(str(e))
+    data = await snapshot.arows_many((row for row, _ in found), version)
+    return _render(((row, data[row]) for row, _ in found), fields, compact,
+                   extra=("value", dict(found)))
+
+@_observed
+def search_products(query: str, limit: int = 5,
+                    fields: Optional[List[str]] = None, compact: bool = False) -> str:
+    version = snapshot.version()
+    found = search_rows(query, limit, version=version)
+    data = snapshot.rows_many((row for row, _ in found), version)
+    return _render(((row, data[row]) for row, _ in found), fields, compact,
+                   extra=("score", dict(found)))
+
+@_observed
+async def asearch_products(query: str, limit: int = 5,
+                           fields: Optional[List[str]] = None, compact: bool = False) -> str:
+    version = await snapshot.aversion()
+    found = await asearch_rows(query, limit, version=version)
+    data = await snapshot.arows_many((row for row, _ in found), version)
+    return _render(((row, data[row]) for row, _ in found), fields, compact,
+                   extra=("score", dict(found)))
+
+def observation_report() -> Dict[str, Dict[str, int]]:
+    """Средний / максимальный размер observation каждого инструмента, в токенах."""
+    return {name: {**st, "avg": st["tokens"] // max(st["calls"], 1)}
+            for name, st in observation_stats.items()}
 
-def catalog_tools() -> List[Tool]:
+def catalog_tools(session_id: Optional[str] = None) -> List[Tool]:
+    """
+    Инструменты каталога; store_mapping / get_fields_by_index привязаны к session_id,
+    без него – к сессии текущего вызова (session_scope / current_session).
+    У каждого есть coroutine-реализация (redis.asyncio) – её берут ainvoke/astream.
+    Снапшот каталога подписывается на публикации sync'а (один раз на процесс).
+    """
+    snapshot.subscribe()
     return [
-        StructuredTool.from_function("list_all_products", list_all_products,
-            args_schema=_Empty, description="→ JSON {row:модель}"),
-        StructuredTool.from_function("store_mapping", store_mapping,
+        StructuredTool.from_function(name="list_all_products", func=list_all_products,
+            coroutine=alist_all_products,
+            args_schema=_ListIn, description="{offset?, limit?, compact?} → JSON {row:модель}"),
+        StructuredTool.from_function(name="store_mapping",
+            func=partial(store_mapping, session_id=session_id),
+            coroutine=partial(astore_mapping, session_id=session_id),
             args_schema=_MapIn, description="Сохраняет соответствие index→row"),
-        StructuredTool.from_function("get_fields_by_index", get_fields_by_index,
-            args_schema=_IdsIn, description="indices → JSON полей модели"),
+        StructuredTool.from_function(name="get_fields_by_index",
+            func=partial(get_fields_by_index, session_id=session_id),
+            coroutine=partial(aget_fields_by_index, session_id=session_id),
+            args_schema=_IdsIn,
+            description="{indices, fields?, compact?, offset?, limit?} → JSON полей модели"),
+        StructuredTool.from_function(name="filter_products", func=filter_products,
+            coroutine=afilter_products,
+            args_schema=_FilterPageIn,
+            description="{brand?, series?, condition?, fields?, compact?, offset?, limit?} "
+                        "→ JSON {rows:{row:поля}} только подходящих моделей"),
+        StructuredTool.from_function(name="group_counts", func=group_counts_tool,
+            coroutine=agroup_counts_tool,
+            args_schema=_GroupIn,
+            description="{field, filters?} → JSON {counts:{значение:кол-во}, total} без выгрузки строк"),
+        StructuredTool.from_function(name="range_products", func=range_products,
+            coroutine=arange_products,
+            args_schema=_RangeIn,
+            description="{field: price|hashrate|power, min_value?, max_value?, near?, order?, limit?, brand?…, fields?, compact?} "
+                        "→ JSON {rows, values} – бюджет / «около N TH» / top-N по индексу"),
+        StructuredTool.from_function(name="search_products", func=search_products,
+            coroutine=asearch_products,
+            args_schema=_SearchIn,
+            description="{query, limit?, fields?, compact?} → JSON {rows, scores} – найти модель по названию/сленгу"),
     ]